@@ -1,13 +1,56 @@
 from fastapi import FastAPI, HTTPException, Query, Request, status
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-from app.services.twitter_service import get_tweets_and_build_graph, detect_communities, client, get_network_metrics, get_user_info
+from typing import List, Dict, Any, Optional, Union
+from contextlib import asynccontextmanager
+from datetime import datetime
+from itertools import islice
+import asyncio
+import logging
+import time
+# El registro se configura antes de importar los servicios para no perder sus mensajes de arranque
+from app.services.observability import configure_logging, render_prometheus, stage_timer, HTTP_REQUEST_SECONDS, PROMETHEUS_MEDIA_TYPE
+configure_logging()
+from config import ENV_FILE, CREDENTIALS_DEFINED
+from app.services.twitter_service import analyze_query_async, get_client, verify_client, get_user_info, get_users_info_async, user_cache, cache, analysis_cache, api_flights, analysis_flights, analysis_pool, analysis_raw_response, community_index, graph_to_elements, http_pool_info, scheduler, get_tweet_store, LOUVAIN_RESOLUTION
+from app.services.streaming import iter_analysis_ndjson, NDJSON_MEDIA_TYPE
+from app.services import graph_export
+from app.services.batch_analysis import analyze_queries_async
+from app.services.graph_views import reduce_analysis
+from app.services.tracking import register_tracked_query, refresh_tracked_query, get_tracked_query, remove_tracked_query, tracked_query_summary, tracked_query_summary_async, tracked_queries
 import tweepy
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from tweepy.errors import TooManyRequests
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+# Diagnóstico de la configuración al arrancar (no incluye valores sensibles)
+def log_configuration():
+    if ENV_FILE:
+        logger.info("Variables de entorno cargadas desde: %s", ENV_FILE)
+    else:
+        logger.info("No se encontró el archivo .env")
+    for name, defined in CREDENTIALS_DEFINED.items():
+        logger.info("%s definido: %s", name, "Sí" if defined else "No")
+
+# Arranque y parada de la aplicación. El cliente de Twitter se crea aquí y no al importar
+# los servicios; su verificación (una llamada a la API) corre en segundo plano para no
+# retrasar el arranque del worker
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_configuration()
+    get_client()
+    verification = asyncio.create_task(run_in_threadpool(verify_client))
+    try:
+        yield
+    finally:
+        # Detener los procesos de análisis al apagar el servidor
+        if not verification.done():
+            verification.cancel()
+        analysis_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configurar CORS
 app.add_middleware(
@@ -19,6 +62,20 @@ app.add_middleware(
     expose_headers=["*"]  # Exponer todos los headers en la respuesta
 )
 
+# Duración de cada petición por ruta (la plantilla de la ruta, no la URL concreta)
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                                     route=getattr(route, "path", "unmatched"), status=status_code)
+
 # Manejador de excepciones para errores 429 (Too Many Requests)
 @app.exception_handler(TooManyRequests)
 async def too_many_requests_handler(request: Request, exc: TooManyRequests):
@@ -44,6 +101,35 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 class QueryRequest(BaseModel):
     query: str
     max_tweets: int = 100
+    # Ingesta paginada: presupuesto de páginas y límites de parada anticipada
+    max_pages: Optional[int] = None
+    time_limit: Optional[float] = None
+    max_nodes: Optional[int] = None
+    # Origen de los tweets: "api" o "store" (almacén local), con ventana opcional de fechas
+    source: str = "api"
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    # Parámetros del algoritmo de comunidades
+    resolution: float = LOUVAIN_RESOLUTION
+    # Métricas de influencia adicionales: pagerank, betweenness, closeness, eigenvector
+    influence: Optional[List[str]] = None
+    accuracy: str = "balanced"
+    influence_budget: Optional[float] = None
+    # Grupos de métricas a calcular: influential_nodes, edge_types, connected_components (por defecto todos)
+    metrics: Optional[List[str]] = None
+    # Respuesta en streaming (NDJSON) en lugar de un único JSON
+    stream: bool = False
+    # Formato de la respuesta: json, ndjson o msgpack (columnar); también se elige con la cabecera Accept
+    format: Optional[str] = None
+    # Respuesta original de la API: omitirla o limitarla a algunos campos (p. ej. "meta", "data.id")
+    include_raw: bool = True
+    raw_fields: Optional[List[str]] = None
+    # Vista reducida para grafos grandes: full, topk, kcore o communities (un nodo por comunidad),
+    # con un presupuesto de view_size nodos; community devuelve solo esa comunidad del análisis en caché
+    view: str = "full"
+    view_size: Optional[int] = None
+    core_k: Optional[int] = None
+    community: Optional[int] = None
 
 class GraphResponse(BaseModel):
     nodes: List[Dict[str, Any]]
@@ -58,6 +144,31 @@ class UserInfoResponse(BaseModel):
     error: Optional[str] = None
     raw_response: Optional[Dict[str, Any]] = None
 
+class TrackedQueryRequest(BaseModel):
+    query: str
+    max_tweets: int = 100
+    resolution: float = LOUVAIN_RESOLUTION
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    max_tweets: int = 100
+    max_pages: Optional[int] = None
+    time_limit: Optional[float] = None
+    source: str = "api"
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    resolution: float = LOUVAIN_RESOLUTION
+    influence: Optional[List[str]] = None
+    accuracy: str = "balanced"
+    influence_budget: Optional[float] = None
+    metrics: Optional[List[str]] = None
+    # Incluir nodos y aristas del grafo unión, anotados con las consultas de cada uno
+    include_graph: bool = False
+
+class UsersBatchRequest(BaseModel):
+    usernames: List[str] = []
+    ids: List[Union[int, str]] = []
+
 class NetworkMetricsResponse(BaseModel):
     query: str
     metrics: Dict[str, Any]
@@ -65,101 +176,128 @@ class NetworkMetricsResponse(BaseModel):
     communities: List[Dict[str, Any]]
     raw_response: Optional[Dict[str, Any]] = None
     
-@app.post("/analyze_tweets/", response_model=GraphResponse)
-async def analyze_tweets(query_request: QueryRequest):
-    # Obtener el grafo de usuarios y relaciones
-    graph = get_tweets_and_build_graph(query_request.query, query_request.max_tweets)
+RESPONSE_FORMATS = ("json", "ndjson", "msgpack")
 
-    # Detectar comunidades en el grafo
-    communities = detect_communities(graph)
+# Formato de respuesta pedido: parámetro format, después stream y por último la cabecera Accept
+def response_format(query_request: QueryRequest, request: Request) -> str:
+    if query_request.format:
+        if query_request.format not in RESPONSE_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Formato desconocido: {query_request.format}. Opciones: {', '.join(RESPONSE_FORMATS)}"
+            )
+        selected = query_request.format
+    elif query_request.stream:
+        selected = "ndjson"
+    else:
+        accept = request.headers.get("accept", "")
+        if NDJSON_MEDIA_TYPE in accept:
+            selected = "ndjson"
+        elif any(media_type in accept for media_type in graph_export.MSGPACK_MEDIA_TYPES):
+            selected = "msgpack"
+        else:
+            selected = "json"
+    
+    if selected == "msgpack" and not graph_export.is_available():
+        raise HTTPException(status_code=406, detail="El formato msgpack no está disponible en el servidor")
+    return selected
 
-    # Obtener métricas del grafo
-    metrics = get_network_metrics(graph)
+@app.post("/analyze_tweets/", response_model=GraphResponse)
+async def analyze_tweets(query_request: QueryRequest, request: Request):
+    output_format = response_format(query_request, request)
     
-    # Obtener la respuesta original de la API si existe
-    raw_response = None
-    if hasattr(graph, 'graph') and 'raw_response' in graph.graph:
-        raw_response = graph.graph['raw_response']
-
-    # Extraer nodos y aristas del grafo
-    nodes = []
-    for node in graph.nodes():
-        node_data = graph.nodes[node]
-        nodes.append({
-            "id": node,
-            "name": node_data.get("name", ""),
-            "full_name": node_data.get("full_name", "")
-        })
-        
-    edges = [{"source": u, "target": v, "type": data["type"]} for u, v, data in graph.edges(data=True)]
-
-    # Agregar información de comunidad a cada nodo
-    node_to_community = {}
-    for i, community in enumerate(communities):
-        for node in community:
-            node_to_community[node] = i
-            
-    # Actualizar nodos con información de comunidad
-    for node in nodes:
-        node["community"] = node_to_community.get(node["id"], -1)  # -1 significa sin comunidad
+    # Obtener (o reutilizar de la caché) el análisis completo de la consulta
+    analysis = await analyze_query_async(
+        query_request.query,
+        query_request.max_tweets,
+        max_pages=query_request.max_pages,
+        time_limit=query_request.time_limit,
+        max_nodes=query_request.max_nodes,
+        resolution=query_request.resolution,
+        influence=query_request.influence,
+        accuracy=query_request.accuracy,
+        influence_budget=query_request.influence_budget,
+        source=query_request.source,
+        since=query_request.since,
+        until=query_request.until,
+        metrics=query_request.metrics
+    )
+    
+    # Vista reducida o una sola comunidad, calculadas sobre el análisis ya hecho
+    analysis = reduce_analysis(analysis, query_request.view, query_request.view_size,
+                               query_request.core_k, query_request.community)
 
+    # En NDJSON el grafo se envía por secciones a medida que se serializa
+    if output_format == "ndjson":
+        return StreamingResponse(
+            iter_analysis_ndjson(analysis, query_request.include_raw, query_request.raw_fields),
+            media_type=NDJSON_MEDIA_TYPE
+        )
+    
+    # Exportación binaria columnar (índices enteros y arrays tipados), codificada fuera del event loop
+    if output_format == "msgpack":
+        with stage_timer("serialize"):
+            content = await run_in_threadpool(graph_export.encode_msgpack, analysis,
+                                              query_request.include_raw, query_request.raw_fields)
+        return Response(content=content, media_type=graph_export.MSGPACK_MEDIA_TYPE)
+
+    # Las listas de nodos y aristas solo se construyen para la respuesta JSON
+    with stage_timer("serialize"):
+        nodes, edges = await run_in_threadpool(graph_to_elements, analysis["graph"], analysis["communities"])
     return {
         "nodes": nodes, 
         "edges": edges, 
-        "communities": communities,
-        "metrics": metrics,
-        "raw_response": raw_response
+        "communities": analysis["communities"],
+        "metrics": analysis["metrics"],
+        "raw_response": analysis_raw_response(analysis, query_request.include_raw, query_request.raw_fields)
     }
 
 @app.get("/network_metrics/")
-async def network_metrics(query: str, max_tweets: int = 100):
-    print(f"Recibida solicitud de análisis de red para: '{query}' (max_tweets: {max_tweets})")
+async def network_metrics(query: str, max_tweets: int = 100, max_pages: Optional[int] = None,
+                          time_limit: Optional[float] = None, max_nodes: Optional[int] = None,
+                          resolution: float = LOUVAIN_RESOLUTION, influence: Optional[List[str]] = Query(None),
+                          accuracy: str = "balanced", influence_budget: Optional[float] = None,
+                          include_raw: bool = True, raw_fields: Optional[List[str]] = Query(None),
+                          source: str = "api", since: Optional[datetime] = None, until: Optional[datetime] = None,
+                          metrics: Optional[List[str]] = Query(None)):
+    logger.info("Recibida solicitud de análisis de red para: '%s' (max_tweets: %d)", query, max_tweets)
     
     try:
-        # Obtener el grafo de usuarios y relaciones
-        graph = get_tweets_and_build_graph(query, max_tweets)
-        
-        # Obtener la respuesta original de la API si existe
-        raw_response = None
-        if hasattr(graph, 'graph') and 'raw_response' in graph.graph:
-            raw_response = graph.graph['raw_response']
+        # Obtener (o reutilizar de la caché) el análisis completo de la consulta
+        analysis = await analyze_query_async(query, max_tweets, max_pages=max_pages, time_limit=time_limit,
+                                             max_nodes=max_nodes, resolution=resolution, influence=influence,
+                                             accuracy=accuracy, influence_budget=influence_budget,
+                                             source=source, since=since, until=until, metrics=metrics)
+        graph = analysis["graph"]
+        communities = analysis["communities"]
+        metrics = analysis["metrics"]
+        raw_response = analysis_raw_response(analysis, include_raw, raw_fields)
         
-        # Detectar comunidades en el grafo
-        communities = detect_communities(graph)
+        # Preparar información de comunidades: los nodos influyentes se reparten por comunidad
+        # en una sola pasada con el índice nodo -> comunidad
+        influential_by_community: Dict[int, List[Dict[str, Any]]] = {}
+        if "influential_nodes" in metrics:
+            node_to_community = community_index(communities)
+            for node in metrics["influential_nodes"]:
+                community_id = node_to_community.get(node["id"])
+                if community_id is not None:
+                    influential_by_community.setdefault(community_id, []).append(node)
         
-        # Obtener métricas del grafo
-        metrics = get_network_metrics(graph)
-        
-        # Preparar información de comunidades
         community_info = []
         for i, community in enumerate(communities):
-            # Obtener los nodos de esta comunidad
-            nodes_in_community = [{"id": node, "name": graph.nodes[node].get("name", "")} for node in community]
-            
-            # Ordenar por centralidad si está disponible
-            if "influential_nodes" in metrics:
-                influential_in_community = [node for node in metrics["influential_nodes"] if node["id"] in community]
-                influential_in_community = sorted(influential_in_community, key=lambda x: x["centrality"], reverse=True)
-                
-                if influential_in_community:
-                    community_info.append({
-                        "id": i,
-                        "size": len(community),
-                        "nodes": nodes_in_community[:10],  # Limitar a 10 nodos para no sobrecargar
-                        "top_nodes": influential_in_community[:3]  # Top 3 nodos influyentes
-                    })
-                else:
-                    community_info.append({
-                        "id": i,
-                        "size": len(community),
-                        "nodes": nodes_in_community[:10]
-                    })
-            else:
-                community_info.append({
-                    "id": i,
-                    "size": len(community),
-                    "nodes": nodes_in_community[:10]
-                })
+            # Limitar a 10 nodos para no sobrecargar
+            nodes_in_community = [{"id": node, "name": graph.nodes[node].get("name", "")}
+                                  for node in islice(community, 10)]
+            info = {
+                "id": i,
+                "size": len(community),
+                "nodes": nodes_in_community
+            }
+            # Top 3 nodos influyentes, ordenados por centralidad
+            influential_in_community = influential_by_community.get(i)
+            if influential_in_community:
+                info["top_nodes"] = sorted(influential_in_community, key=lambda x: x["centrality"], reverse=True)[:3]
+            community_info.append(info)
         
         # Ordenar comunidades por tamaño
         community_info.sort(key=lambda x: x["size"], reverse=True)
@@ -183,6 +321,49 @@ async def network_metrics(query: str, max_tweets: int = 100):
             detail=f"Error al procesar la solicitud: {str(e)}"
         )
 
+# Varias consultas sobre un grafo unión: métricas por consulta, solapamiento y usuarios puente
+@app.post("/analyze_batch/")
+async def analyze_batch(request: BatchQueryRequest):
+    return await analyze_queries_async(
+        request.queries, request.max_tweets, max_pages=request.max_pages, time_limit=request.time_limit,
+        resolution=request.resolution, influence=request.influence, accuracy=request.accuracy,
+        influence_budget=request.influence_budget, source=request.source, since=request.since,
+        until=request.until, include_graph=request.include_graph, metrics=request.metrics
+    )
+
+# Consultas seguidas: el grafo y sus comunidades se actualizan con los tweets nuevos
+@app.post("/tracked_queries/")
+async def create_tracked_query(request: TrackedQueryRequest):
+    tracked = await register_tracked_query(request.query, request.max_tweets, request.resolution)
+    return await tracked_query_summary_async(tracked)
+
+@app.get("/tracked_queries/")
+def list_tracked_queries():
+    return [tracked_query_summary(tracked, include_details=False) for tracked in list(tracked_queries.values())]
+
+@app.get("/tracked_queries/{tracked_id}")
+def get_tracked_query_endpoint(tracked_id: str):
+    return tracked_query_summary(get_tracked_query(tracked_id))
+
+@app.post("/tracked_queries/{tracked_id}/refresh")
+async def refresh_tracked_query_endpoint(tracked_id: str):
+    tracked = await refresh_tracked_query(get_tracked_query(tracked_id))
+    return await tracked_query_summary_async(tracked)
+
+@app.delete("/tracked_queries/{tracked_id}")
+def delete_tracked_query(tracked_id: str):
+    get_tracked_query(tracked_id)
+    remove_tracked_query(tracked_id)
+    return {"deleted": tracked_id}
+
+# Consultas guardadas en el almacén local, disponibles para repetir el análisis con source="store"
+@app.get("/tweet_store/")
+def tweet_store_queries():
+    tweet_store = get_tweet_store()
+    if tweet_store is None:
+        raise HTTPException(status_code=404, detail="El almacén local de tweets está desactivado")
+    return {**tweet_store.info(), "stored_queries": tweet_store.queries()}
+
 @app.get("/user-info", response_model=UserInfoResponse)
 @app.head("/user-info")  # Añadir soporte para método HEAD
 def get_user_info_endpoint(request: Request, username: str = Query(None)):
@@ -190,7 +371,7 @@ def get_user_info_endpoint(request: Request, username: str = Query(None)):
     if request.method == "HEAD" or username is None:
         return UserInfoResponse(username="")
     
-    print(f"Recibida solicitud para información de usuario: @{username}")
+    logger.info("Recibida solicitud para información de usuario: @%s", username)
     
     try:
         # Usar la función del servicio de Twitter
@@ -201,14 +382,14 @@ def get_user_info_endpoint(request: Request, username: str = Query(None)):
             if result.get("status_code") == 429:
                 raise TooManyRequests("Twitter API rate limit exceeded")
                 
-            print(f"Error al obtener información para @{username}: {result['error']}")
+            logger.warning("Error al obtener información para @%s: %s", username, result['error'])
             return UserInfoResponse(
                 username=username,
                 error=result["error"],
                 raw_response=result.get("raw_response")
             )
         
-        print(f"Información obtenida con éxito para @{username}")
+        logger.info("Información obtenida con éxito para @%s", username)
         return UserInfoResponse(
             username=username,
             name=result.get("name"),
@@ -224,6 +405,16 @@ def get_user_info_endpoint(request: Request, username: str = Query(None)):
             detail=f"Error al procesar la solicitud: {str(e)}"
         )
 
+# Perfiles de muchos usuarios (p. ej. todos los nodos del grafo) en una sola petición
+@app.post("/user-info/batch")
+async def get_users_info_endpoint(batch: UsersBatchRequest):
+    return await get_users_info_async(usernames=batch.usernames, ids=batch.ids)
+
+# Métricas en formato de texto de Prometheus: etapas del análisis, cachés, cupo de la API y peticiones
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(content=render_prometheus(), media_type=PROMETHEUS_MEDIA_TYPE)
+
 # Endpoint sencillo para verificar la conexión
 @app.get("/health")
 def check_health():
@@ -232,18 +423,32 @@ def check_health():
         "api_status": "unknown"
     }
     
-    # Verificar el estado de la API de Twitter si el cliente está inicializado
-    if client:
-        try:
-            # Intentar una petición simple para verificar la API
-            client.get_user(username="twitter")
-            status["api_status"] = "ok"
-        except TooManyRequests:
-            status["api_status"] = "rate_limited"
-        except Exception as e:
-            status["api_status"] = "error"
-            status["api_error"] = str(e)
+    # Estado de la API a partir del cupo conocido, sin gastar llamadas en comprobarlo
+    if get_client():
+        status["api_status"] = "rate_limited" if scheduler.is_exhausted() else "ok"
     else:
         status["api_status"] = "not_configured"
+    status["rate_limits"] = scheduler.snapshot()
+    
+    # Pool de conexiones HTTP hacia la API (ocupación, conexiones abiertas y libres)
+    status["http_pool"] = http_pool_info()
+    
+    # Estado de la caché (tamaño, aciertos, fallos y expulsiones)
+    status["cache"] = cache.info()
+    status["analysis_cache"] = analysis_cache.info()
+    status["user_cache"] = user_cache.info()
+    
+    # Llamadas idénticas simultáneas agrupadas en una sola ejecución
+    status["coalescing"] = {
+        "twitter": api_flights.info(),
+        "analysis": analysis_flights.info()
+    }
+    
+    # Pool de procesos del análisis (análisis en curso, enviados al pool, tiempos agotados)
+    status["analysis_pool"] = analysis_pool.info()
+    
+    # Almacén local de tweets
+    tweet_store = get_tweet_store()
+    status["tweet_store"] = tweet_store.info() if tweet_store is not None else None
     
     return status
@@ -0,0 +1,230 @@
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import networkx as nx
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+# Añadir la ruta raíz del backend al path de Python
+backend_dir = Path(__file__).parent.parent.parent.absolute()
+if str(backend_dir) not in sys.path:
+    sys.path.append(str(backend_dir))
+
+from config import ANALYSIS_WORKERS, ANALYSIS_POOL_MIN_EDGES, ANALYSIS_TIMEOUT
+from app.services.observability import observe_stages
+
+
+class AnalysisTimeout(Exception):
+    """El análisis superó su tiempo máximo."""
+
+
+# Comprobación cooperativa del tiempo máximo entre etapas del análisis
+def check_deadline(deadline: Optional[float], stage: str):
+    if deadline is not None and time.time() >= deadline:
+        raise AnalysisTimeout(f"Tiempo de análisis agotado antes de: {stage}")
+
+
+def pack_graph(G: nx.DiGraph) -> Dict[str, Any]:
+    """Serialización compacta del grafo para enviarlo a otro proceso.
+
+    Los atributos de los nodos van en listas paralelas y cada arista es una
+    tupla de enteros: índices de origen y destino, peso, código del tipo
+    dominante y pares (código, recuento) por tipo de interacción. Los
+    nombres de los tipos se envían una sola vez en ``types``.
+    """
+    node_ids = list(G.nodes())
+    position = {node: i for i, node in enumerate(node_ids)}
+    type_code: Dict[str, int] = {}
+
+    edges = []
+    for u, v, data in G.edges(data=True):
+        dominant = data.get("type", "unknown")
+        counts = data.get("counts") or {dominant: 1}
+        packed_counts = tuple((type_code.setdefault(edge_type, len(type_code)), count)
+                              for edge_type, count in counts.items())
+        edges.append((position[u], position[v], data.get("weight", 1),
+                      type_code.setdefault(dominant, len(type_code)), packed_counts))
+
+    return {
+        "nodes": node_ids,
+        "names": [G.nodes[node].get("name", "") for node in node_ids],
+        "full_names": [G.nodes[node].get("full_name", "") for node in node_ids],
+        "types": list(type_code),
+        "edges": edges,
+        "graph": {"ingestion": G.graph["ingestion"]} if "ingestion" in G.graph else {}
+    }
+
+
+def unpack_graph(packed: Dict[str, Any]) -> nx.DiGraph:
+    # Reconstruye el grafo con los nodos y las aristas en el mismo orden que el original
+    nodes = packed["nodes"]
+    types = packed["types"]
+
+    G = nx.DiGraph()
+    G.graph.update(packed["graph"])
+    G.add_nodes_from(
+        (node, {"name": name, "full_name": full_name})
+        for node, name, full_name in zip(nodes, packed["names"], packed["full_names"])
+    )
+    G.add_edges_from(
+        (nodes[source], nodes[target], {
+            "weight": weight,
+            "type": types[code],
+            "counts": {types[edge_type]: count for edge_type, count in counts}
+        })
+        for source, target, weight, code, counts in packed["edges"]
+    )
+    return G
+
+
+def _analyze_packed(packed: Dict[str, Any], options: Dict[str, Any], deadline: float):
+    # Punto de entrada en el proceso del pool; los tiempos por etapa vuelven con el resultado
+    from app.services.twitter_service import analyze_graph
+
+    check_deadline(deadline, "reconstrucción del grafo")
+    timings: Dict[str, float] = {}
+    return analyze_graph(unpack_graph(packed), options, deadline, timings), timings
+
+
+class AnalysisPool:
+    """Ejecuta el análisis de los grafos grandes en un pool de procesos.
+
+    Louvain y las métricas son código Python que retiene el GIL; en otro
+    proceso no bloquean al resto de peticiones y varios análisis usan
+    varios núcleos. Los grafos con menos de ``min_edges`` aristas (o todos,
+    con ``workers=0``) se analizan en el propio proceso, donde enviar el
+    grafo costaría más que analizarlo; ``run_async`` lo hace en el pool de
+    hilos para no detener el event loop. Cada análisis tiene ``timeout``
+    segundos: pasado ese tiempo se responde 504 y el trabajo se cancela si
+    aún no había empezado o se detiene en la siguiente etapa si ya corría.
+    """
+
+    def __init__(self, workers: int = ANALYSIS_WORKERS, timeout: float = ANALYSIS_TIMEOUT,
+                 min_edges: int = ANALYSIS_POOL_MIN_EDGES):
+        self.workers = workers
+        self.timeout = timeout
+        self.min_edges = min_edges
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.running = 0
+        self.stats = {"inline": 0, "offloaded": 0, "timeouts": 0, "cancelled": 0, "failures": 0}
+
+    def _incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Los procesos se crean con el primer análisis grande, no al importar el módulo
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        # Un proceso murió (p. ej. por memoria): el siguiente análisis crea un pool nuevo
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def should_offload(self, G: nx.Graph) -> bool:
+        return self.workers > 0 and G.number_of_edges() >= self.min_edges
+
+    def _timeout_error(self) -> HTTPException:
+        self._incr("timeouts")
+        return HTTPException(status_code=504,
+                             detail=f"El análisis superó el tiempo máximo de {self.timeout:g}s")
+
+    def _run_inline(self, G: nx.Graph, options: Dict[str, Any], analyze: Callable, deadline: float):
+        self._incr("inline")
+        timings: Dict[str, float] = {}
+        try:
+            return analyze(G, options, deadline, timings)
+        except AnalysisTimeout:
+            raise self._timeout_error()
+        finally:
+            observe_stages(timings)
+
+    def _finish(self, result):
+        # Resultado del pool: (análisis, duración de cada etapa en el proceso hijo)
+        result, timings = result
+        observe_stages(timings)
+        return result
+
+    def run(self, G: nx.Graph, options: Dict[str, Any], analyze: Callable):
+        """Devuelve ``analyze(G, options, deadline, timings)``, en el pool si el grafo es grande.
+
+        Las duraciones que ``analyze`` anota en ``timings`` se registran en
+        las métricas de etapas del proceso principal.
+        """
+        deadline = time.time() + self.timeout
+        if not self.should_offload(G):
+            return self._run_inline(G, options, analyze, deadline)
+
+        executor = self._get_executor()
+        self._incr("offloaded")
+        future = executor.submit(_analyze_packed, pack_graph(G), options, deadline)
+        with self._lock:
+            self.running += 1
+        try:
+            return self._finish(future.result(timeout=self.timeout))
+        except (FutureTimeoutError, AnalysisTimeout):
+            future.cancel()
+            raise self._timeout_error()
+        except BrokenProcessPool:
+            self._incr("failures")
+            self._discard_executor(executor)
+            raise HTTPException(status_code=503, detail="El proceso de análisis terminó de forma inesperada")
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    async def run_async(self, G: nx.Graph, options: Dict[str, Any], analyze: Callable):
+        deadline = time.time() + self.timeout
+        if not self.should_offload(G):
+            # Aunque no compense enviarlo a otro proceso, el análisis no corre en el event loop
+            return await run_in_threadpool(self._run_inline, G, options, analyze, deadline)
+
+        executor = self._get_executor()
+        self._incr("offloaded")
+        future = executor.submit(_analyze_packed, pack_graph(G), options, deadline)
+        with self._lock:
+            self.running += 1
+        try:
+            return self._finish(await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout))
+        except (asyncio.TimeoutError, AnalysisTimeout):
+            future.cancel()
+            raise self._timeout_error()
+        except asyncio.CancelledError:
+            future.cancel()
+            self._incr("cancelled")
+            raise
+        except BrokenProcessPool:
+            self._incr("failures")
+            self._discard_executor(executor)
+            raise HTTPException(status_code=503, detail="El proceso de análisis terminó de forma inesperada")
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "min_edges": self.min_edges,
+                "timeout": self.timeout,
+                "running": self.running,
+                **self.stats
+            }
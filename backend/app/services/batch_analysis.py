@@ -0,0 +1,258 @@
+import asyncio
+import logging
+from datetime import datetime
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import networkx as nx
+import tweepy
+from fastapi import HTTPException
+
+from app.services import twitter_service as ts
+from app.services.cache import MISSING
+from app.services.observability import observe_graph, stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Máximo de consultas por lote y de usuarios puente devueltos
+MAX_BATCH_QUERIES = 10
+MAX_BRIDGING_USERS = 20
+
+
+class QueryView:
+    """Parte del grafo unión que aporta una consulta: sus tweets, nodos y aristas."""
+
+    def __init__(self, query: str, ingestion: Dict[str, Any]):
+        self.query = query
+        self.ingestion = ingestion
+        self.tweets: Set[Any] = set()
+        self.nodes: Set[Any] = set()
+        self.edges: Set[Tuple[Any, Any]] = set()
+
+    def subgraph(self, G: nx.DiGraph) -> nx.DiGraph:
+        # Vista de solo lectura sobre el grafo unión, sin copiar nodos ni aristas
+        return nx.subgraph_view(G, filter_node=self.nodes.__contains__,
+                                filter_edge=lambda u, v: (u, v) in self.edges)
+
+
+async def _fetch_query(query: str, max_tweets: int, max_pages: Optional[int], time_limit: Optional[float],
+                       source: str, since: Optional[datetime], until: Optional[datetime]):
+    max_pages, time_limit = ts._ingestion_limits(max_tweets, max_pages, time_limit)
+    ingestion = {"source": source}
+    responses = []
+    try:
+        if source == "store":
+            pages = ts.iter_stored_pages_async(query, max_tweets, max_pages, ingestion, since, until)
+        else:
+            pages = ts.iter_search_pages_async(query, max_tweets, max_pages, time_limit, ingestion)
+        async for response in pages:
+            if response and hasattr(response, 'data') and response.data:
+                responses.append(response)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        # Un fallo en una consulta no invalida el resto del lote
+        logger.error("Error al buscar tweets para '%s': %s", query, e)
+        ingestion["error"] = str(e)
+    return responses, ingestion
+
+
+def build_union_graph(queries: List[str], fetched) -> Tuple[nx.DiGraph, List[QueryView]]:
+    """Construye un único grafo con los tweets de todas las consultas.
+
+    Cada tweet se procesa una sola vez aunque lo devuelvan varias
+    consultas: los tweets se agrupan según el conjunto de consultas que los
+    devolvieron y cada grupo pasa por ``process_tweets``, que informa de las
+    aristas a las que contribuye. Así cada consulta sabe qué parte del grafo
+    unión es suya sin volver a procesar nada.
+    """
+    views = [QueryView(query, ingestion) for query, (_, ingestion) in zip(queries, fetched)]
+
+    tweets = {}
+    tweet_queries: Dict[Any, Set[int]] = {}
+    users = {}
+    included_tweets = []
+    for i, (responses, _) in enumerate(fetched):
+        for response in responses:
+            for user in response.includes.get('users', []):
+                users[user.id] = user
+            included_tweets.extend(response.includes.get('tweets', []))
+            for tweet in response.data:
+                tweets.setdefault(tweet.id, tweet)
+                tweet_queries.setdefault(tweet.id, set()).add(i)
+                views[i].tweets.add(tweet.id)
+
+    # Índice compartido: las referencias se resuelven también entre tweets de distintas consultas
+    index = ts.GraphIndex()
+    index.add_users(users.values())
+    index.add_tweets(included_tweets)
+    index.add_tweets(tweets.values())
+
+    groups: Dict[frozenset, List[Any]] = {}
+    for tweet_id, tweet in tweets.items():
+        groups.setdefault(frozenset(tweet_queries[tweet_id]), []).append(tweet)
+
+    # Cada grupo solo aporta sus tweets: usuarios y referencias ya están en el índice compartido
+    G = nx.DiGraph()
+    for group, group_tweets in groups.items():
+        interactions = set()
+        ts.process_tweets(tweepy.Response(group_tweets, {}, [], {}), G, index, interactions, index_response=False)
+        for i in group:
+            views[i].edges |= interactions
+
+    for view in views:
+        view.nodes = {node for edge in view.edges for node in edge}
+        view.nodes.update(tweets[tweet_id].author_id for tweet_id in view.tweets
+                          if tweets[tweet_id].author_id in G)
+
+    G.graph['ingestion'] = {
+        "source": views[0].ingestion.get("source") if views else None,
+        "pages": sum(view.ingestion.get("pages", 0) for view in views),
+        "tweets": sum(view.ingestion.get("tweets", 0) for view in views),
+        "unique_tweets": len(tweets)
+    }
+    return G, views
+
+
+def _strength(G: nx.DiGraph, node) -> int:
+    return (sum(data.get('weight', 1) for data in G.succ[node].values())
+            + sum(data.get('weight', 1) for data in G.pred[node].values()))
+
+
+def _query_summary(G: nx.DiGraph, view: QueryView, node_to_community: Dict[Any, int],
+                   include: Optional[List[str]] = None) -> Dict[str, Any]:
+    metrics = ts.get_network_metrics(view.subgraph(G), include=include)
+    if "error" not in metrics:
+        metrics["ingestion"] = view.ingestion
+
+    # Reparto de los nodos de la consulta entre las comunidades del grafo unión
+    distribution: Dict[int, int] = {}
+    for node in view.nodes:
+        community = node_to_community.get(node, -1)
+        distribution[community] = distribution.get(community, 0) + 1
+    communities = [{"community": community, "nodes": count}
+                   for community, count in sorted(distribution.items(), key=lambda x: x[1], reverse=True)]
+
+    return {
+        "query": view.query,
+        "num_tweets": len(view.tweets),
+        "metrics": metrics,
+        "communities": communities[:10]
+    }
+
+
+def _overlap(views: List[QueryView]) -> List[Dict[str, Any]]:
+    overlap = []
+    for a, b in combinations(views, 2):
+        shared = len(a.nodes & b.nodes)
+        union = len(a.nodes | b.nodes)
+        overlap.append({
+            "queries": [a.query, b.query],
+            "shared_users": shared,
+            "jaccard": round(shared / union, 4) if union else 0.0,
+            "shared_tweets": len(a.tweets & b.tweets),
+            "shared_interactions": len(a.edges & b.edges)
+        })
+    return overlap
+
+
+def _bridging_users(G: nx.DiGraph, views: List[QueryView]) -> List[Dict[str, Any]]:
+    # Usuarios presentes en dos o más consultas, por número de consultas y grado ponderado
+    memberships: Dict[Any, List[str]] = {}
+    for view in views:
+        for node in view.nodes:
+            memberships.setdefault(node, []).append(view.query)
+
+    bridges = [
+        {
+            "id": node,
+            "name": G.nodes[node].get("name", ""),
+            "queries": queries,
+            "weighted_degree": _strength(G, node)
+        }
+        for node, queries in memberships.items() if len(queries) > 1
+    ]
+    bridges.sort(key=lambda x: (len(x["queries"]), x["weighted_degree"]), reverse=True)
+    return bridges[:MAX_BRIDGING_USERS]
+
+
+def _finish_batch(G: nx.DiGraph, views: List[QueryView], communities: List[List[Any]],
+                  metrics: Dict[str, Any], include_graph: bool,
+                  include_metrics: Optional[List[str]] = None) -> Dict[str, Any]:
+    node_to_community = ts.community_index(communities)
+    result = {
+        "queries": [view.query for view in views],
+        "union": {
+            "metrics": metrics,
+            "num_communities": len(communities)
+        },
+        "per_query": [_query_summary(G, view, node_to_community, include_metrics) for view in views],
+        "overlap": _overlap(views),
+        "bridging_users": _bridging_users(G, views)
+    }
+
+    if include_graph:
+        # Grafo unión con las consultas en las que aparece cada nodo y cada arista
+        nodes, edges = ts.graph_to_elements(G, communities)
+        for node in nodes:
+            node["queries"] = [i for i, view in enumerate(views) if node["id"] in view.nodes]
+        for edge in edges:
+            edge["queries"] = [i for i, view in enumerate(views) if (edge["source"], edge["target"]) in view.edges]
+        result.update({"nodes": nodes, "edges": edges, "communities": communities})
+
+    return result
+
+
+async def analyze_queries_async(queries: List[str], max_tweets: int = 100, max_pages: Optional[int] = None,
+                                time_limit: Optional[float] = None, resolution: float = ts.LOUVAIN_RESOLUTION,
+                                influence: Optional[List[str]] = None, accuracy: str = "balanced",
+                                influence_budget: Optional[float] = None, source: str = "api",
+                                since: Optional[datetime] = None, until: Optional[datetime] = None,
+                                include_graph: bool = False, metrics: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Analiza varias consultas sobre un grafo unión compartido.
+
+    Las consultas se descargan a la vez (el planificador de cupo reparte
+    las llamadas), se construye un solo grafo y se ejecuta un solo Louvain.
+    Para cada consulta se devuelven métricas de su vista del grafo unión
+    (las aristas compartidas conservan el peso total de la unión) y su
+    reparto entre comunidades; entre consultas, el solapamiento por
+    pares y los usuarios puente presentes en varias de ellas.
+    """
+    queries = list(dict.fromkeys(query.strip() for query in queries if query.strip()))
+    if not queries:
+        raise HTTPException(status_code=400, detail="Se necesita al menos una consulta")
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_BATCH_QUERIES} consultas por lote")
+
+    options = ts._analysis_options(resolution, influence, accuracy, influence_budget, metrics)
+    source = ts._ingestion_source(source)
+    key = "batch:" + "|".join(
+        ts._analysis_key(query, max_tweets, max_pages, time_limit, None, options, source, since, until)
+        for query in queries
+    ) + f":{include_graph}"
+
+    cached = ts._cached_analysis(key)
+    if cached is not MISSING:
+        return cached
+
+    async def run():
+        cached = ts._cached_analysis(key, log=False)
+        if cached is not MISSING:
+            return cached
+        logger.info("Iniciando análisis por lotes de %d consultas (max_tweets: %d, origen: %s)",
+                    len(queries), max_tweets, source)
+        with stage_timer("fetch"):
+            fetched = await asyncio.gather(*[
+                _fetch_query(query, max_tweets, max_pages, time_limit, source, since, until) for query in queries
+            ])
+        with stage_timer("build"):
+            G, views = build_union_graph(queries, fetched)
+        observe_graph(G)
+        communities, metrics = await ts.analysis_pool.run_async(G, options, ts.analyze_graph)
+        result = _finish_batch(G, views, communities, metrics, include_graph, options["metrics"])
+        # No guardar lotes incompletos por errores al descargar alguna consulta
+        if not any('error' in view.ingestion for view in views):
+            ts.analysis_cache.set(key, result, ttl=ts.ANALYSIS_CACHE_DURATION)
+        return result
+
+    return await ts.analysis_flights.do_async(key, run)
@@ -0,0 +1,482 @@
+import io
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import networkx as nx
+
+from tweepy.mixins import DataMapping
+
+# Añadir la ruta raíz del backend al path de Python
+backend_dir = Path(__file__).parent.parent.parent.absolute()
+if str(backend_dir) not in sys.path:
+    sys.path.append(str(backend_dir))
+
+from config import CACHE_BACKEND, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_SQLITE_PATH, REDIS_URL, SQLITE_BUSY_TIMEOUT
+
+# Valor centinela para distinguir "no está en caché" de un resultado None
+MISSING = object()
+
+
+# Pickler que sabe serializar los modelos de tweepy (Tweet, User, Media...).
+# Sus __getattr__ dinámicos rompen el pickle por defecto, así que se
+# reconstruyen a partir de su diccionario de datos original.
+class _CachePickler(pickle.Pickler):
+    def reducer_override(self, obj):
+        if isinstance(obj, DataMapping):
+            return type(obj), (obj.data,)
+        return NotImplemented
+
+
+def serialize(value: Any) -> bytes:
+    buffer = io.BytesIO()
+    _CachePickler(buffer, pickle.HIGHEST_PROTOCOL).dump(value)
+    return buffer.getvalue()
+
+
+def deserialize(payload: bytes) -> Any:
+    return pickle.loads(payload)
+
+
+# Elementos de cada colección que se miden al estimar su tamaño; el resto se extrapola
+SIZE_SAMPLE = 32
+# Profundidad máxima que se recorre; más abajo se usa sys.getsizeof
+SIZE_MAX_DEPTH = 8
+
+
+def _sampled_size(items, count: int, measure, depth: int, seen: set) -> int:
+    total = sampled = 0
+    for item in items:
+        if sampled >= SIZE_SAMPLE:
+            break
+        total += measure(item, depth, seen)
+        sampled += 1
+    return total * count // sampled if sampled else 0
+
+
+def _item_size(item, depth: int, seen: set) -> int:
+    key, value = item
+    # Las claves de texto se repiten entre registros y pickle las guarda una sola vez
+    key_size = 2 if isinstance(key, str) else _estimate(key, depth, seen)
+    return key_size + _estimate(value, depth, seen)
+
+
+def _estimate(value: Any, depth: int, seen: set) -> int:
+    # Tamaños similares a los de pickle para los valores simples
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, int):
+        return 5
+    if isinstance(value, float):
+        return 9
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value) + 3
+    if depth >= SIZE_MAX_DEPTH:
+        return sys.getsizeof(value)
+    # Un objeto compartido (p. ej. la respuesta original en el análisis y en el grafo) cuenta una vez.
+    # Las tuplas no: las que generan los iteradores son temporales y su id se reutiliza
+    if not isinstance(value, tuple):
+        if id(value) in seen:
+            return 2
+        seen.add(id(value))
+    depth += 1
+    if isinstance(value, DataMapping):
+        return _estimate(value.data, depth, seen)
+    if isinstance(value, nx.Graph):
+        # Un nodo o una arista cuestan su id y sus atributos; el total se extrapola de una muestra
+        return (_sampled_size(value.nodes(data=True), value.number_of_nodes(), _estimate, depth, seen)
+                + _sampled_size(value.edges(data=True), value.number_of_edges(), _estimate, depth, seen)
+                + _estimate(value.graph, depth, seen))
+    if isinstance(value, dict):
+        return 2 + _sampled_size(value.items(), len(value), _item_size, depth, seen)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return 2 + _sampled_size(value, len(value), _estimate, depth, seen)
+    if hasattr(value, "__dict__"):
+        return _estimate(vars(value), depth, seen)
+    return sys.getsizeof(value)
+
+
+def approximate_size(value: Any) -> int:
+    """Tamaño aproximado (del orden del valor serializado) sin serializarlo.
+
+    Recorre la estructura midiendo como mucho ``SIZE_SAMPLE`` elementos de
+    cada colección y extrapolando al resto; un grafo se estima por su número
+    de nodos y aristas. El coste no crece con el tamaño del valor, así que
+    puede llamarse en cada ``set`` sin bloquear el event loop.
+    """
+    return _estimate(value, 0, set())
+
+
+class CacheStats:
+    """Contadores de aciertos, fallos y expulsiones de una caché."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def incr(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class CacheBackend:
+    """Interfaz común de los backends de caché.
+
+    ``get`` devuelve ``MISSING`` cuando la clave no existe o ha expirado.
+    Las entradas se limitan por número (``max_entries``) y por tamaño
+    aproximado en bytes (``max_bytes``); al superarse se expulsan las
+    menos usadas recientemente.
+    """
+
+    name = "base"
+
+    def __init__(self, max_entries: Optional[int] = CACHE_MAX_ENTRIES,
+                 max_bytes: Optional[int] = CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def size_bytes(self) -> int:
+        raise NotImplementedError
+
+    def info(self) -> Dict[str, Any]:
+        info = {
+            "backend": self.name,
+            "entries": len(self),
+            "bytes": self.size_bytes(),
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes
+        }
+        info.update(self.stats.as_dict())
+        return info
+
+    def _over_limit(self, entries: int, size: int) -> bool:
+        if self.max_entries is not None and entries > self.max_entries:
+            return True
+        if self.max_bytes is not None and size > self.max_bytes:
+            return True
+        return False
+
+
+class MemoryCache(CacheBackend):
+    """Caché en proceso con expulsión LRU sobre un OrderedDict."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: Optional[int] = CACHE_MAX_ENTRIES,
+                 max_bytes: Optional[int] = CACHE_MAX_BYTES):
+        super().__init__(max_entries, max_bytes)
+        self._lock = threading.RLock()
+        # clave -> (expira_en, tamaño, valor)
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.incr("misses")
+                return MISSING
+
+            expires_at, _, value = entry
+            if expires_at is not None and time.time() >= expires_at:
+                self._remove(key)
+                self.stats.incr("expirations")
+                self.stats.incr("misses")
+                return MISSING
+
+            self._entries.move_to_end(key)
+            self.stats.incr("hits")
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        size = approximate_size(value)
+        expires_at = time.time() + ttl if ttl else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, size, value)
+            self._bytes += size
+            self.stats.incr("sets")
+            self._evict()
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict(self):
+        # Solo las menos usadas (al principio del OrderedDict), en O(1) cada una; las entradas
+        # expiradas se descartan al leerlas o cuando les toca salir por LRU
+        while self._entries and self._over_limit(len(self._entries), self._bytes):
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.stats.incr("evictions")
+
+
+class SQLiteCache(CacheBackend):
+    """Caché en disco sobre SQLite; sobrevive a reinicios y la comparten los procesos del mismo fichero."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = CACHE_SQLITE_PATH, table: str = "cache",
+                 max_entries: Optional[int] = CACHE_MAX_ENTRIES,
+                 max_bytes: Optional[int] = CACHE_MAX_BYTES):
+        super().__init__(max_entries, max_bytes)
+        self.path = path
+        self.table = table
+        self._lock = threading.RLock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Varios workers pueden compartir el fichero: WAL deja leer mientras otro escribe
+        # y las escrituras simultáneas esperan el bloqueo hasta SQLITE_BUSY_TIMEOUT segundos
+        self._conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed_at)"
+            )
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats.incr("misses")
+                return MISSING
+
+            payload, expires_at = row
+            now = time.time()
+            if expires_at is not None and now >= expires_at:
+                with self._conn:
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.stats.incr("expirations")
+                self.stats.incr("misses")
+                return MISSING
+
+            with self._conn:
+                self._conn.execute(
+                    f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+
+        self.stats.incr("hits")
+        return deserialize(payload)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        payload = serialize(value)
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), expires_at, now)
+            )
+            self.stats.incr("sets")
+            self._evict(now)
+
+    def delete(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()[0]
+
+    def _evict(self, now: float):
+        expired = self._conn.execute(
+            f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+        ).rowcount
+        if expired:
+            self.stats.incr("expirations", expired)
+
+        entries, size = self._conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+        ).fetchone()
+        while entries and self._over_limit(entries, size):
+            key, entry_size = self._conn.execute(
+                f"SELECT key, size FROM {self.table} ORDER BY accessed_at LIMIT 1"
+            ).fetchone()
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            entries -= 1
+            size -= entry_size
+            self.stats.incr("evictions")
+
+
+class RedisCache(CacheBackend):
+    """Caché sobre el protocolo de Redis.
+
+    Acepta cualquier cliente compatible con redis-py (``client``), lo que
+    permite usar un sustituto local como fakeredis en pruebas. El TTL lo
+    aplica Redis; el orden LRU se mantiene en un sorted set con la marca
+    de tiempo del último acceso y los tamaños en un hash.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = "cache", client=None,
+                 max_entries: Optional[int] = CACHE_MAX_ENTRIES,
+                 max_bytes: Optional[int] = CACHE_MAX_BYTES):
+        super().__init__(max_entries, max_bytes)
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("El backend de caché 'redis' requiere el paquete redis (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._index_key = f"{prefix}:__lru__"
+        self._sizes_key = f"{prefix}:__sizes__"
+        self._lock = threading.RLock()
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get(self, key: str) -> Any:
+        payload = self.client.get(self._key(key))
+        if payload is None:
+            # La entrada pudo expirar en Redis: limpiar el índice LRU
+            with self._lock:
+                if self.client.zscore(self._index_key, key) is not None:
+                    self._forget(key)
+                    self.stats.incr("expirations")
+            self.stats.incr("misses")
+            return MISSING
+
+        self.client.zadd(self._index_key, {key: time.time()})
+        self.stats.incr("hits")
+        return deserialize(payload)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        payload = serialize(value)
+        with self._lock:
+            if ttl:
+                self.client.set(self._key(key), payload, px=int(ttl * 1000))
+            else:
+                self.client.set(self._key(key), payload)
+            self.client.zadd(self._index_key, {key: time.time()})
+            self.client.hset(self._sizes_key, key, len(payload))
+            self.stats.incr("sets")
+            self._evict()
+
+    def delete(self, key: str):
+        with self._lock:
+            self.client.delete(self._key(key))
+            self._forget(key)
+
+    def clear(self):
+        with self._lock:
+            keys = [k.decode() if isinstance(k, bytes) else k
+                    for k in self.client.zrange(self._index_key, 0, -1)]
+            for key in keys:
+                self.client.delete(self._key(key))
+            self.client.delete(self._index_key, self._sizes_key)
+
+    def __len__(self) -> int:
+        return int(self.client.zcard(self._index_key))
+
+    def size_bytes(self) -> int:
+        return sum(int(size) for size in self.client.hvals(self._sizes_key))
+
+    def _forget(self, key: str):
+        self.client.zrem(self._index_key, key)
+        self.client.hdel(self._sizes_key, key)
+
+    def _evict(self):
+        entries = len(self)
+        size = self.size_bytes()
+        while entries and self._over_limit(entries, size):
+            oldest = self.client.zrange(self._index_key, 0, 0)
+            if not oldest:
+                break
+            key = oldest[0].decode() if isinstance(oldest[0], bytes) else oldest[0]
+            entry_size = int(self.client.hget(self._sizes_key, key) or 0)
+            self.client.delete(self._key(key))
+            self._forget(key)
+            entries -= 1
+            size -= entry_size
+            self.stats.incr("evictions")
+
+
+def create_cache(namespace: str, backend: Optional[str] = None, **kwargs) -> CacheBackend:
+    """Crea el backend de caché configurado (``CACHE_BACKEND``) para un espacio de nombres."""
+    backend = (backend or CACHE_BACKEND).lower()
+
+    if backend == "memory":
+        return MemoryCache(**kwargs)
+    if backend == "sqlite":
+        return SQLiteCache(table=namespace, **kwargs)
+    if backend == "redis":
+        return RedisCache(prefix=namespace, **kwargs)
+
+    raise ValueError(f"Backend de caché desconocido: {backend}")
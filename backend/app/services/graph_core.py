@@ -0,0 +1,157 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import networkx as nx
+
+# NumPy y SciPy son opcionales: sin ellos las métricas se calculan con NetworkX
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import connected_components as sparse_connected_components
+except ImportError:
+    csr_matrix = None
+    sparse_connected_components = None
+
+
+def is_available() -> bool:
+    return np is not None
+
+
+class CompactGraph:
+    """Representación compacta (CSR) del grafo dirigido de interacciones.
+
+    Los ids de usuario se remapean a enteros consecutivos en el orden de
+    ``G.nodes``; la adyacencia de salida se guarda en arrays CSR
+    (``indptr``, ``indices``, ``weights``) y cada arista lleva el código de
+    su tipo dominante (``type_codes``) y el número de interacciones de cada
+    tipo (``type_counts``, una columna por tipo de ``type_names``).
+    """
+
+    def __init__(self, node_ids: List[Any], indptr, indices, weights, type_codes,
+                 type_counts, type_names: List[str]):
+        self.node_ids = node_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.type_codes = type_codes
+        self.type_counts = type_counts
+        self.type_names = type_names
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    @classmethod
+    def from_networkx(cls, G: nx.Graph) -> "CompactGraph":
+        if np is None:
+            raise RuntimeError("El motor compacto de grafos requiere numpy")
+
+        node_ids = list(G.nodes())
+        position = {node: i for i, node in enumerate(node_ids)}
+        n = len(node_ids)
+
+        # Los tipos se codifican en orden de primera aparición para que los
+        # histogramas conserven el mismo orden que la versión de NetworkX
+        type_names: List[str] = []
+        type_code: Dict[str, int] = {}
+
+        sources = []
+        targets = []
+        weights = []
+        codes = []
+        counts_rows = []
+        for u, v, data in G.edges(data=True):
+            counts = data.get("counts") or {data.get("type", "unknown"): 1}
+            row = []
+            for edge_type, count in counts.items():
+                if edge_type not in type_code:
+                    type_code[edge_type] = len(type_names)
+                    type_names.append(edge_type)
+                row.append((type_code[edge_type], count))
+            dominant = data.get("type", "unknown")
+            if dominant not in type_code:
+                type_code[dominant] = len(type_names)
+                type_names.append(dominant)
+
+            sources.append(position[u])
+            targets.append(position[v])
+            weights.append(data.get("weight", 1))
+            codes.append(type_code[dominant])
+            counts_rows.append(row)
+
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.int64)
+        codes = np.asarray(codes, dtype=np.int8)
+
+        type_counts = np.zeros((len(sources), max(1, len(type_names))), dtype=np.int32)
+        for edge, row in enumerate(counts_rows):
+            for code, count in row:
+                type_counts[edge, code] = count
+
+        # Ordenar por nodo origen para construir el CSR
+        order = np.argsort(sources, kind="stable")
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+
+        return cls(node_ids, indptr, targets[order], weights[order], codes[order],
+                   type_counts[order], type_names)
+
+    def sources(self):
+        # Nodo origen de cada arista, expandido desde indptr
+        return np.repeat(np.arange(self.num_nodes, dtype=np.int64), np.diff(self.indptr))
+
+    def strength_and_degree(self) -> Tuple[Any, Any]:
+        """Grado ponderado y número de vecinos en la proyección no dirigida.
+
+        Reproduce ``to_weighted_undirected(G).degree`` (con y sin pesos),
+        incluido el doble conteo de los bucles.
+        """
+        n = self.num_nodes
+        sources = self.sources()
+        targets = self.indices
+
+        strength = (np.bincount(sources, weights=self.weights, minlength=n)
+                    + np.bincount(targets, weights=self.weights, minlength=n)).astype(np.int64)
+
+        # Pares no dirigidos únicos: u-v y v-u cuentan como un solo vecino
+        low = np.minimum(sources, targets)
+        high = np.maximum(sources, targets)
+        pairs = np.unique(low * n + high)
+        low, high = pairs // n, pairs % n
+        degree = np.bincount(low, minlength=n) + np.bincount(high, minlength=n)
+
+        return strength, degree
+
+    def top_by_strength(self, k: int = 10) -> List[Tuple[Any, int, int]]:
+        strength, degree = self.strength_and_degree()
+        # argsort estable sobre -strength: mismo desempate que sorted(..., reverse=True)
+        order = np.argsort(-strength, kind="stable")[:k]
+        return [(self.node_ids[i], strength[i].item(), degree[i].item()) for i in order]
+
+    def edge_type_histogram(self) -> Dict[str, int]:
+        totals = self.type_counts.sum(axis=0)
+        return {name: totals[code].item() for code, name in enumerate(self.type_names)
+                if totals[code] > 0}
+
+    def connected_components(self) -> Optional[Tuple[int, int]]:
+        """Número de componentes débilmente conexas y tamaño de la mayor.
+
+        Devuelve None si SciPy no está disponible.
+        """
+        if sparse_connected_components is None:
+            return None
+
+        n = self.num_nodes
+        adjacency = csr_matrix(
+            (np.ones(self.num_edges, dtype=np.int8), self.indices, self.indptr), shape=(n, n)
+        )
+        count, labels = sparse_connected_components(adjacency, directed=True, connection="weak")
+        return int(count), int(np.bincount(labels).max())
@@ -0,0 +1,169 @@
+import sys
+from array import array
+from typing import Any, Dict, List, Optional
+
+# MessagePack es opcional: sin él solo están disponibles JSON y NDJSON
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from app.services.twitter_service import analysis_raw_response, community_index
+
+# Tipos MIME aceptados para la exportación binaria
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/msgpack", "application/vnd.msgpack")
+
+# Versión del formato columnar
+EXPORT_VERSION = 1
+
+# Tipos de los arrays (little-endian) y su código en el módulo array
+ARRAY_TYPECODES = {"int64": "q", "int32": "i", "uint32": "I", "uint8": "B", "float64": "d"}
+
+
+def is_available() -> bool:
+    return msgpack is not None
+
+
+def _typed(values: List[Any], dtype: str) -> Dict[str, Any]:
+    data = array(ARRAY_TYPECODES[dtype], values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return {"dtype": dtype, "data": data.tobytes()}
+
+
+def _untyped(column: Any) -> List[Any]:
+    if not isinstance(column, dict):
+        return column
+    data = array(ARRAY_TYPECODES[column["dtype"]])
+    data.frombytes(column["data"])
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data.tolist()
+
+
+def _numeric_column(values: List[Any]) -> Any:
+    # Enteros o reales como array tipado; cualquier otra cosa (p. ej. ids de texto) como lista
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        if all(-2**63 <= value < 2**63 for value in values):
+            return _typed(values, "int64")
+    elif all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        return _typed(values, "float64")
+    return list(values)
+
+
+def to_columnar(analysis: Dict[str, Any], include_raw: bool = True,
+                raw_fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Representación columnar de un análisis.
+
+    Los nodos se referencian por su posición en ``nodes.id``; las aristas
+    son arrays tipados de índices de origen y destino, peso y código de tipo
+    (posición en ``edge_types``), con una columna de recuentos por tipo.
+    Las comunidades se guardan como en un CSR: ``nodes`` con los índices de
+    todos los miembros y ``offsets`` con el inicio de cada comunidad.
+    """
+    graph = analysis["graph"]
+    communities = analysis["communities"]
+
+    node_ids = list(graph.nodes())
+    position = {node: i for i, node in enumerate(node_ids)}
+    node_to_community = community_index(communities)
+
+    edge_types: List[str] = []
+    type_code: Dict[str, int] = {}
+    sources, targets, weights, codes, edge_counts = [], [], [], [], []
+    for u, v, data in graph.edges(data=True):
+        counts = data.get("counts", {data["type"]: 1})
+        for edge_type in (data["type"], *counts):
+            if edge_type not in type_code:
+                type_code[edge_type] = len(edge_types)
+                edge_types.append(edge_type)
+        sources.append(position[u])
+        targets.append(position[v])
+        weights.append(data.get("weight", 1))
+        codes.append(type_code[data["type"]])
+        edge_counts.append(counts)
+
+    community_nodes, offsets = [], [0]
+    for community in communities:
+        community_nodes.extend(position[node] for node in community)
+        offsets.append(len(community_nodes))
+
+    return {
+        "version": EXPORT_VERSION,
+        "nodes": {
+            "id": _numeric_column(node_ids),
+            "name": [graph.nodes[node].get("name", "") for node in node_ids],
+            "full_name": [graph.nodes[node].get("full_name", "") for node in node_ids],
+            "community": _typed([node_to_community.get(node, -1) for node in node_ids], "int32")
+        },
+        "edge_types": edge_types,
+        "edges": {
+            "source": _typed(sources, "uint32"),
+            "target": _typed(targets, "uint32"),
+            "weight": _numeric_column(weights),
+            "type": _typed(codes, "uint8" if len(edge_types) <= 256 else "uint32"),
+            "counts": {edge_type: _typed([counts.get(edge_type, 0) for counts in edge_counts], "int32")
+                       for edge_type in edge_types}
+        },
+        "communities": {
+            "nodes": _typed(community_nodes, "uint32"),
+            "offsets": _typed(offsets, "uint32")
+        },
+        "metrics": analysis["metrics"],
+        "raw_response": analysis_raw_response(analysis, include_raw, raw_fields)
+    }
+
+
+def from_columnar(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Reconstruye nodos, aristas y comunidades con la forma de la respuesta JSON de /analyze_tweets/."""
+    nodes = payload["nodes"]
+    node_ids = _untyped(nodes["id"])
+    node_communities = _untyped(nodes["community"])
+
+    edges = payload["edges"]
+    edge_types = payload["edge_types"]
+    counts_columns = {edge_type: _untyped(column) for edge_type, column in edges["counts"].items()}
+    sources = _untyped(edges["source"])
+
+    community_nodes = _untyped(payload["communities"]["nodes"])
+    offsets = _untyped(payload["communities"]["offsets"])
+
+    return {
+        "nodes": [
+            {"id": node_id, "name": name, "full_name": full_name, "community": community}
+            for node_id, name, full_name, community in zip(node_ids, nodes["name"], nodes["full_name"],
+                                                           node_communities)
+        ],
+        "edges": [
+            {
+                "source": node_ids[source],
+                "target": node_ids[target],
+                "type": edge_types[code],
+                "weight": weight,
+                "counts": {edge_type: column[i] for edge_type, column in counts_columns.items() if column[i]}
+            }
+            for i, (source, target, weight, code) in enumerate(zip(
+                sources, _untyped(edges["target"]), _untyped(edges["weight"]), _untyped(edges["type"])
+            ))
+        ],
+        "communities": [
+            [node_ids[index] for index in community_nodes[start:end]]
+            for start, end in zip(offsets, offsets[1:])
+        ],
+        "metrics": payload["metrics"],
+        "raw_response": payload["raw_response"]
+    }
+
+
+def encode_msgpack(analysis: Dict[str, Any], include_raw: bool = True,
+                   raw_fields: Optional[List[str]] = None) -> bytes:
+    if msgpack is None:
+        raise RuntimeError("La exportación msgpack requiere el paquete msgpack (pip install msgpack)")
+    return msgpack.packb(to_columnar(analysis, include_raw, raw_fields), use_bin_type=True)
+
+
+def decode_msgpack(content: bytes) -> Dict[str, Any]:
+    if msgpack is None:
+        raise RuntimeError("La exportación msgpack requiere el paquete msgpack (pip install msgpack)")
+    return from_columnar(msgpack.unpackb(content, raw=False, strict_map_key=False))
@@ -0,0 +1,178 @@
+import heapq
+from typing import Any, Dict, Optional, Set, Tuple
+
+import networkx as nx
+from fastapi import HTTPException
+
+from app.services.twitter_service import community_index, dominant_edge_type, to_weighted_undirected
+
+# Vistas reducidas del grafo: completo, los k nodos con más peso, un k-core o
+# una supergráfica con un nodo por comunidad
+VIEW_MODES = ("full", "topk", "kcore", "communities")
+
+# Presupuesto de nodos por defecto de las vistas reducidas
+DEFAULT_VIEW_SIZE = 500
+
+# Miembros más conectados que se muestran de cada comunidad en la supergráfica
+MAX_TOP_MEMBERS = 5
+
+
+def _strength(G: nx.Graph) -> Dict[Any, float]:
+    # Grado ponderado (entrante + saliente en el grafo dirigido)
+    return dict(G.degree(weight="weight"))
+
+
+def top_k_nodes(G: nx.Graph, k: int) -> Set[Any]:
+    strength = _strength(G)
+    return {node for node, _ in heapq.nlargest(k, strength.items(), key=lambda item: item[1])}
+
+
+def k_core_nodes(G: nx.Graph, max_nodes: int, k: Optional[int] = None) -> Tuple[Set[Any], Optional[int]]:
+    """Nodos del k-core de la proyección no dirigida y el k usado.
+
+    Sin ``k`` se elige el menor k cuyo núcleo cabe en ``max_nodes`` nodos,
+    es decir, el núcleo más grande que respeta el presupuesto (o el más
+    interno, si ni siquiera ese cabe).
+    """
+    U = to_weighted_undirected(G)
+    if U is G:
+        U = G.copy()
+    U.remove_edges_from(list(nx.selfloop_edges(U)))
+    core = nx.core_number(U)
+    if not core:
+        return set(), k
+
+    if k is None:
+        # Tamaño del núcleo de cada k: nodos con número de núcleo >= k
+        sizes: Dict[int, int] = {}
+        for number in core.values():
+            sizes[number] = sizes.get(number, 0) + 1
+        k = max(sizes)
+        remaining = 0
+        for number in sorted(sizes, reverse=True):
+            if remaining + sizes[number] > max_nodes:
+                break
+            remaining += sizes[number]
+            k = number
+    return {node for node, number in core.items() if number >= k}, k
+
+
+def _restricted(analysis: Dict[str, Any], nodes: Set[Any]) -> Dict[str, Any]:
+    # Subgrafo inducido; las comunidades conservan su posición (y por tanto su id)
+    graph = analysis["graph"].subgraph(nodes)
+    communities = [[node for node in community if node in nodes] for community in analysis["communities"]]
+    return {**analysis, "graph": graph, "communities": communities}
+
+
+def community_supergraph(analysis: Dict[str, Any], max_nodes: int) -> Dict[str, Any]:
+    """Un nodo por comunidad y una arista por par de comunidades que interactúan.
+
+    Las aristas suman pesos y recuentos por tipo de las interacciones entre
+    miembros de las dos comunidades; las internas se acumulan en
+    ``internal_weight``. Con más de ``max_nodes`` comunidades solo se
+    conservan las más grandes.
+    """
+    G = analysis["graph"]
+    communities = analysis["communities"]
+    node_to_community = community_index(communities)
+    strength = _strength(G)
+
+    kept = set(heapq.nlargest(max_nodes, range(len(communities)), key=lambda i: len(communities[i])))
+    internal = {i: 0 for i in kept}
+
+    S = nx.DiGraph()
+    for i in sorted(kept):
+        S.add_node(i, name=f"Comunidad {i}", full_name="")
+
+    for u, v, data in G.edges(data=True):
+        cu, cv = node_to_community.get(u, -1), node_to_community.get(v, -1)
+        if cu not in kept or cv not in kept:
+            continue
+        weight = data.get("weight", 1)
+        if cu == cv:
+            internal[cu] += weight
+            continue
+        counts = data.get("counts", {data["type"]: 1})
+        if S.has_edge(cu, cv):
+            edge = S[cu][cv]
+            edge["weight"] += weight
+            for edge_type, count in counts.items():
+                edge["counts"][edge_type] = edge["counts"].get(edge_type, 0) + count
+        else:
+            S.add_edge(cu, cv, weight=weight, counts=dict(counts))
+    for _, _, data in S.edges(data=True):
+        data["type"] = dominant_edge_type(data["counts"])
+
+    details = []
+    for i in sorted(kept):
+        top = heapq.nlargest(MAX_TOP_MEMBERS, communities[i], key=lambda node: strength.get(node, 0))
+        details.append({
+            "id": i,
+            "size": len(communities[i]),
+            "internal_weight": internal[i],
+            "top_members": [{"id": node, "name": G.nodes[node].get("name", ""), "weighted_degree": strength[node]}
+                            for node in top]
+        })
+
+    return {
+        **analysis,
+        "graph": S,
+        # Cada supernodo forma su propia comunidad, con el mismo id que la original
+        "communities": [[i] if i in kept else [] for i in range(len(communities))],
+        "view_details": {"communities": details, "omitted_communities": len(communities) - len(kept)}
+    }
+
+
+def reduce_analysis(analysis: Dict[str, Any], view: str = "full", view_size: Optional[int] = None,
+                    core_k: Optional[int] = None, community: Optional[int] = None) -> Dict[str, Any]:
+    """Vista reducida de un análisis ya calculado, con la misma forma que el análisis.
+
+    ``community`` limita el grafo a esa comunidad (profundizar desde la
+    supergráfica sin volver a descargar ni analizar) y ``view`` reduce el
+    resultado a un presupuesto de ``view_size`` nodos. Los ids de comunidad
+    no cambian entre vistas. Las métricas son las del grafo completo, con
+    la descripción de la vista en ``metrics["view"]``. El análisis original
+    (compartido en la caché) no se modifica.
+    """
+    if view not in VIEW_MODES:
+        raise HTTPException(status_code=400, detail=f"Vista desconocida: {view}. Opciones: {', '.join(VIEW_MODES)}")
+    if view_size is not None and view_size < 1:
+        raise HTTPException(status_code=400, detail="view_size debe ser al menos 1")
+    if view == "full" and community is None:
+        return analysis
+
+    graph = analysis["graph"]
+    reduced = analysis
+    if community is not None:
+        if view == "communities":
+            raise HTTPException(status_code=400, detail="La vista por comunidades no admite el parámetro community")
+        if not 0 <= community < len(analysis["communities"]):
+            raise HTTPException(status_code=404, detail=f"No existe la comunidad {community}")
+        reduced = _restricted(reduced, set(analysis["communities"][community]))
+
+    size = view_size or DEFAULT_VIEW_SIZE
+    if view == "topk":
+        reduced = _restricted(reduced, top_k_nodes(reduced["graph"], size))
+    elif view == "kcore":
+        nodes, core_k = k_core_nodes(reduced["graph"], size, core_k)
+        reduced = _restricted(reduced, nodes)
+    elif view == "communities":
+        reduced = community_supergraph(reduced, size)
+
+    view_info = {
+        "mode": view,
+        "community": community,
+        "view_size": size if view != "full" else None,
+        "total_nodes": graph.number_of_nodes(),
+        "total_edges": graph.number_of_edges(),
+        "num_nodes": reduced["graph"].number_of_nodes(),
+        "num_edges": reduced["graph"].number_of_edges()
+    }
+    if view == "kcore":
+        view_info["core_k"] = core_k
+    view_info.update(reduced.pop("view_details", {}))
+
+    return {
+        **reduced,
+        "metrics": {**analysis["metrics"], "view": view_info}
+    }
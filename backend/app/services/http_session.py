@@ -0,0 +1,247 @@
+import contextlib
+import contextvars
+import json
+import logging
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# httpx es opcional: sin él (o sin el paquete h2) las llamadas usan HTTP/1.1 con requests
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Añadir la ruta raíz del backend al path de Python
+backend_dir = Path(__file__).parent.parent.parent.absolute()
+if str(backend_dir) not in sys.path:
+    sys.path.append(str(backend_dir))
+
+from config import (TWITTER_HTTP_POOL_SIZE, TWITTER_HTTP_POOL_BLOCK, TWITTER_HTTP_KEEPALIVE,
+                    TWITTER_HTTP_CONNECT_TIMEOUT, TWITTER_HTTP_READ_TIMEOUT, TWITTER_HTTP2)
+
+logger = logging.getLogger(__name__)
+
+# Tiempos máximos (conexión, lectura) que sustituyen a los de la sesión dentro de request_timeout
+_timeout_override: contextvars.ContextVar = contextvars.ContextVar("twitter_http_timeout", default=None)
+
+
+@contextlib.contextmanager
+def request_timeout(connect: Optional[float] = None, read: Optional[float] = None):
+    """Cambia los tiempos máximos de las llamadas hechas dentro del bloque.
+
+    El cambio es por contexto (hilo o tarea): no afecta a las llamadas
+    concurrentes de otras peticiones. Un valor None conserva el de la sesión.
+    """
+    token = _timeout_override.set((connect, read))
+    try:
+        yield
+    finally:
+        _timeout_override.reset(token)
+
+
+def available_http2() -> bool:
+    if httpx is None:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class PooledSession(requests.Session):
+    """Sesión de requests con un pool de conexiones acotado y tiempos máximos por llamada.
+
+    Todas las llamadas a la API comparten hasta ``pool_size`` conexiones
+    persistentes (keep-alive). Con ``block`` las llamadas que no encuentran
+    conexión libre esperan a que se libere una; sin él se abre una conexión
+    de más que se cierra al terminar. ``overflow`` en ``info()`` cuenta las
+    llamadas iniciadas con todas las conexiones ocupadas: si crece, el pool
+    se queda corto para la concurrencia real.
+    """
+
+    http2 = False
+
+    def __init__(self, pool_size: int = TWITTER_HTTP_POOL_SIZE, block: bool = TWITTER_HTTP_POOL_BLOCK,
+                 keepalive: bool = TWITTER_HTTP_KEEPALIVE, connect_timeout: float = TWITTER_HTTP_CONNECT_TIMEOUT,
+                 read_timeout: float = TWITTER_HTTP_READ_TIMEOUT):
+        super().__init__()
+        self.pool_size = max(1, pool_size)
+        self.block = block
+        self.keepalive = keepalive
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.adapter = HTTPAdapter(pool_maxsize=self.pool_size, pool_block=block)
+        self.mount("https://", self.adapter)
+        self.mount("http://", self.adapter)
+        if not keepalive:
+            self.headers["Connection"] = "close"
+
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.stats = {"requests": 0, "overflow": 0, "errors": 0}
+
+    def current_timeout(self, explicit=None) -> Tuple[float, float]:
+        if explicit is not None:
+            return explicit if isinstance(explicit, tuple) else (explicit, explicit)
+        connect, read = self.timeout
+        override = _timeout_override.get()
+        if override is not None:
+            connect = connect if override[0] is None else override[0]
+            read = read if override[1] is None else override[1]
+        return connect, read
+
+    def _begin(self):
+        with self._lock:
+            if self.in_flight >= self.pool_size:
+                self.stats["overflow"] += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.stats["requests"] += 1
+
+    def _end(self, failed: bool):
+        with self._lock:
+            self.in_flight -= 1
+            if failed:
+                self.stats["errors"] += 1
+
+    def request(self, method, url, *args, timeout=None, **kwargs):
+        self._begin()
+        failed = True
+        try:
+            response = super().request(method, url, *args, timeout=self.current_timeout(timeout), **kwargs)
+            failed = False
+            return response
+        finally:
+            self._end(failed)
+
+    def _connections(self) -> Tuple[int, int]:
+        # Conexiones abiertas desde el inicio y conexiones libres en el pool de cada host
+        opened = idle = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            idle += sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0
+        return opened, idle
+
+    def info(self) -> Dict[str, Any]:
+        opened, idle = self._connections()
+        with self._lock:
+            in_flight = self.in_flight
+            info = {
+                "http2": self.http2,
+                "max_connections": self.pool_size,
+                "block": self.block,
+                "keepalive": self.keepalive,
+                "timeouts": {"connect": self.timeout[0], "read": self.timeout[1]},
+                "in_flight": in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "utilization": round(in_flight / self.pool_size, 4),
+                **self.stats
+            }
+        info["connections_opened"] = opened
+        info["idle_connections"] = idle
+        return info
+
+
+class _HTTPXResponse:
+    """Respuesta de httpx con la parte de la interfaz de requests que usa tweepy."""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.reason = response.reason_phrase
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def content(self) -> bytes:
+        return self._response.content
+
+    @property
+    def text(self) -> str:
+        return self._response.text
+
+    def json(self, **kwargs):
+        try:
+            return self._response.json(**kwargs)
+        except json.JSONDecodeError as e:
+            # tweepy espera la excepción de requests
+            raise requests.JSONDecodeError(e.msg, e.doc, e.pos) from e
+
+    def close(self):
+        self._response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class HTTP2Session(PooledSession):
+    """Sesión que envía las llamadas por HTTP/2 con httpx.
+
+    Las llamadas comparten unas pocas conexiones multiplexadas (hasta
+    ``pool_size``). Las que llevan autenticación de requests (OAuth 1.0a,
+    p. ej. ``get_me``) siguen por el pool HTTP/1.1 de la clase base. Los
+    errores de red se traducen a los de requests para que el resto del
+    servicio los trate igual.
+    """
+
+    http2 = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        connect, read = self.timeout
+        self.http2_client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=self.pool_size,
+                                max_keepalive_connections=self.pool_size if self.keepalive else 0),
+            timeout=httpx.Timeout(read, connect=connect)
+        )
+
+    def request(self, method, url, params=None, json=None, headers=None, auth=None, timeout=None, **kwargs):
+        # Solo las llamadas sencillas de tweepy (parámetros, JSON y cabeceras) van por httpx
+        if auth is not None or any(value is not None for value in kwargs.values()):
+            return super().request(method, url, params=params, json=json, headers=headers, auth=auth,
+                                   timeout=timeout, **kwargs)
+
+        connect, read = self.current_timeout(timeout)
+        self._begin()
+        failed = True
+        try:
+            response = self.http2_client.request(method, url, params=params, json=json, headers=headers,
+                                                 timeout=httpx.Timeout(read, connect=connect))
+            failed = False
+        except httpx.ConnectTimeout as e:
+            raise requests.ConnectTimeout(str(e)) from e
+        except httpx.TimeoutException as e:
+            raise requests.ReadTimeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(str(e)) from e
+        finally:
+            self._end(failed)
+        return _HTTPXResponse(response)
+
+    def close(self):
+        self.http2_client.close()
+        super().close()
+
+
+def create_session(http2: bool = TWITTER_HTTP2, **kwargs) -> PooledSession:
+    """Sesión HTTP para el cliente de Twitter según la configuración."""
+    if http2:
+        if available_http2():
+            return HTTP2Session(**kwargs)
+        logger.warning("TWITTER_HTTP2 activado pero httpx[http2] no está instalado; se usa HTTP/1.1")
+    return PooledSession(**kwargs)
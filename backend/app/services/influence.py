@@ -0,0 +1,224 @@
+import random
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import networkx as nx
+
+# Añadir la ruta raíz del backend al path de Python
+backend_dir = Path(__file__).parent.parent.parent.absolute()
+if str(backend_dir) not in sys.path:
+    sys.path.append(str(backend_dir))
+
+from config import INFLUENCE_TIME_BUDGET
+
+# Métricas de influencia disponibles
+METHODS = ("pagerank", "betweenness", "closeness", "eigenvector")
+
+# Niveles de precisión: tolerancia de las iteraciones y número de fuentes muestreadas
+ACCURACY_LEVELS = {
+    "fast": {"tol": 1e-4, "samples": 32},
+    "balanced": {"tol": 1e-6, "samples": 128},
+    "exact": {"tol": 1e-9, "samples": None}  # None = todas las fuentes
+}
+
+PAGERANK_ALPHA = 0.85
+MAX_ITERATIONS = 200
+
+
+def _adjacency(U: nx.Graph) -> Dict[Any, Dict[Any, float]]:
+    return {node: {nbr: data.get("weight", 1) for nbr, data in nbrs.items()} for node, nbrs in U.adjacency()}
+
+
+def _sample_sources(nodes: List[Any], samples: Optional[int], seed: int) -> List[Any]:
+    if samples is None or samples >= len(nodes):
+        return list(nodes)
+    return random.Random(seed).sample(nodes, samples)
+
+
+def pagerank(G: nx.Graph, tol: float, deadline: float) -> Dict[str, Any]:
+    """PageRank ponderado por iteración de potencias sobre el grafo dirigido."""
+    nodes = list(G.nodes())
+    n = len(nodes)
+    out_strength = {node: 0.0 for node in nodes}
+    incoming = {node: [] for node in nodes}
+    for u, v, data in G.edges(data=True):
+        weight = data.get("weight", 1)
+        out_strength[u] += weight
+        incoming[v].append((u, weight))
+    dangling = [node for node in nodes if out_strength[node] == 0]
+
+    rank = dict.fromkeys(nodes, 1.0 / n)
+    iterations = 0
+    converged = False
+    while iterations < MAX_ITERATIONS and time.monotonic() < deadline:
+        iterations += 1
+        dangling_mass = PAGERANK_ALPHA * sum(rank[node] for node in dangling) / n
+        base = (1.0 - PAGERANK_ALPHA) / n + dangling_mass
+        new_rank = {
+            node: base + PAGERANK_ALPHA * sum(rank[u] * w / out_strength[u] for u, w in incoming[node])
+            for node in nodes
+        }
+        error = sum(abs(new_rank[node] - rank[node]) for node in nodes)
+        rank = new_rank
+        if error < n * tol:
+            converged = True
+            break
+
+    return {"scores": rank, "method": "pagerank_power_iteration", "iterations": iterations,
+            "converged": converged}
+
+
+def approximate_betweenness(U: nx.Graph, samples: Optional[int], deadline: float,
+                            seed: int) -> Dict[str, Any]:
+    """Intermediación aproximada (Brandes) con k fuentes muestreadas."""
+    nodes = list(U.nodes())
+    n = len(nodes)
+    adjacency = {node: list(nbrs) for node, nbrs in U.adjacency()}
+    betweenness = dict.fromkeys(nodes, 0.0)
+
+    processed = 0
+    for source in _sample_sources(nodes, samples, seed):
+        if time.monotonic() >= deadline:
+            break
+        processed += 1
+
+        # BFS desde la fuente contando caminos mínimos
+        stack = []
+        predecessors = {source: []}
+        sigma = {source: 1}
+        distance = {source: 0}
+        queue = deque([source])
+        while queue:
+            v = queue.popleft()
+            stack.append(v)
+            for w in adjacency[v]:
+                if w not in distance:
+                    distance[w] = distance[v] + 1
+                    sigma[w] = 0
+                    predecessors[w] = []
+                    queue.append(w)
+                if distance[w] == distance[v] + 1:
+                    sigma[w] += sigma[v]
+                    predecessors[w].append(v)
+
+        # Acumulación de dependencias en orden inverso
+        delta = dict.fromkeys(stack, 0.0)
+        while stack:
+            w = stack.pop()
+            for v in predecessors[w]:
+                delta[v] += sigma[v] / sigma[w] * (1 + delta[w])
+            if w != source:
+                betweenness[w] += delta[w]
+
+    # Extrapolar a todas las fuentes y normalizar como networkx (grafo no dirigido)
+    if processed and n > 2:
+        scale = (n / processed) / ((n - 1) * (n - 2))
+        betweenness = {node: value * scale for node, value in betweenness.items()}
+
+    return {"scores": betweenness, "method": "brandes_sampled_sources", "samples": processed,
+            "converged": processed == n}
+
+
+def harmonic_closeness(U: nx.Graph, samples: Optional[int], deadline: float,
+                       seed: int) -> Dict[str, Any]:
+    """Cercanía armónica sobre la componente conexa mayor, con fuentes muestreadas."""
+    largest = max(nx.connected_components(U), key=len)
+    nodes = list(largest)
+    n = len(nodes)
+    adjacency = {node: [nbr for nbr in U[node] if nbr != node] for node in nodes}
+    closeness = dict.fromkeys(nodes, 0.0)
+
+    processed = 0
+    for source in _sample_sources(nodes, samples, seed):
+        if time.monotonic() >= deadline:
+            break
+        processed += 1
+
+        distance = {source: 0}
+        queue = deque([source])
+        while queue:
+            v = queue.popleft()
+            for w in adjacency[v]:
+                if w not in distance:
+                    distance[w] = distance[v] + 1
+                    closeness[w] += 1.0 / distance[w]
+                    queue.append(w)
+
+    # Estimación de la suma sobre todas las fuentes, normalizada a [0, 1]
+    if processed and n > 1:
+        scale = (n / processed) / (n - 1)
+        closeness = {node: value * scale for node, value in closeness.items()}
+
+    return {"scores": closeness, "method": "harmonic_largest_component", "samples": processed,
+            "component_size": n, "converged": processed == n}
+
+
+def eigenvector(U: nx.Graph, tol: float, deadline: float) -> Dict[str, Any]:
+    """Centralidad de vector propio ponderada por iteración de potencias."""
+    adjacency = _adjacency(U)
+    nodes = list(adjacency)
+    n = len(nodes)
+
+    x = dict.fromkeys(nodes, 1.0 / n)
+    iterations = 0
+    converged = False
+    while iterations < MAX_ITERATIONS and time.monotonic() < deadline:
+        iterations += 1
+        # Se suma x (A + I) para evitar oscilaciones en grafos bipartitos, como networkx
+        new_x = {node: x[node] + sum(x[nbr] * w for nbr, w in adjacency[node].items()) for node in nodes}
+        norm = sum(value * value for value in new_x.values()) ** 0.5 or 1.0
+        new_x = {node: value / norm for node, value in new_x.items()}
+        error = sum(abs(new_x[node] - x[node]) for node in nodes)
+        x = new_x
+        if error < n * tol:
+            converged = True
+            break
+
+    return {"scores": x, "method": "eigenvector_power_iteration", "iterations": iterations,
+            "converged": converged}
+
+
+def compute_influence(G: nx.Graph, U: nx.Graph, methods: Iterable[str], accuracy: str = "balanced",
+                      time_budget: Optional[float] = None, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    """Calcula las métricas de influencia pedidas.
+
+    ``G`` es el grafo dirigido de interacciones (para PageRank) y ``U`` su
+    proyección no dirigida ponderada. Cada métrica dispone de
+    ``time_budget`` segundos; si se agota, devuelve la mejor estimación
+    disponible con ``converged`` a False. El resultado incluye, por
+    métrica, las puntuaciones y el método y precisión empleados.
+    """
+    if accuracy not in ACCURACY_LEVELS:
+        raise ValueError(f"Precisión desconocida: {accuracy}. Opciones: {', '.join(ACCURACY_LEVELS)}")
+    unknown = [method for method in methods if method not in METHODS]
+    if unknown:
+        raise ValueError(f"Métricas de influencia desconocidas: {', '.join(unknown)}. Opciones: {', '.join(METHODS)}")
+
+    level = ACCURACY_LEVELS[accuracy]
+    time_budget = INFLUENCE_TIME_BUDGET if time_budget is None else time_budget
+
+    results = {}
+    if len(G) == 0:
+        return results
+
+    for method in methods:
+        start = time.monotonic()
+        deadline = start + time_budget
+
+        if method == "pagerank":
+            result = pagerank(G, level["tol"], deadline)
+        elif method == "betweenness":
+            result = approximate_betweenness(U, level["samples"], deadline, seed)
+        elif method == "closeness":
+            result = harmonic_closeness(U, level["samples"], deadline, seed)
+        else:
+            result = eigenvector(U, level["tol"], deadline)
+
+        result["accuracy"] = accuracy
+        result["elapsed"] = round(time.monotonic() - start, 4)
+        results[method] = result
+
+    return results
@@ -0,0 +1,239 @@
+import atexit
+import contextlib
+import logging
+import logging.handlers
+import math
+import queue
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Añadir la ruta raíz del backend al path de Python
+backend_dir = Path(__file__).parent.parent.parent.absolute()
+if str(backend_dir) not in sys.path:
+    sys.path.append(str(backend_dir))
+
+from config import LOG_LEVEL, LOG_SAMPLE_RATE
+
+# Tipo MIME del formato de texto de Prometheus
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Límites de los histogramas de duración (segundos) y de tamaño del grafo
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)
+
+
+# --- Registro (logging) ---
+
+class SamplingFilter(logging.Filter):
+    """Deja pasar solo una fracción ``rate`` de los mensajes por debajo de WARNING."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: str = LOG_LEVEL, sample_rate: float = LOG_SAMPLE_RATE):
+    """Configura el logger ``app`` con nivel, muestreo y escritura en segundo plano.
+
+    Los mensajes se encolan y un hilo aparte los formatea y escribe en
+    stderr, de modo que registrar no bloquea el event loop ni las
+    peticiones. Se puede llamar varias veces; solo la primera tiene efecto.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    logger = logging.getLogger("app")
+    logger.setLevel(level)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+# --- Métricas (formato de texto de Prometheus) ---
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Métrica con etiquetas. ``collect`` (opcional) calcula los valores al exportar."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 collect: Optional[Callable[[], Dict[Tuple[Any, ...], float]]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[Any, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[Any, ...]:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        values = self.collect() if self.collect is not None else self._snapshot()
+        for key, value in values.items():
+            if value is not None:
+                yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+    def _snapshot(self) -> Dict[Tuple[Any, ...], Any]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+_registry: List[Metric] = []
+_registry_lock = threading.Lock()
+
+
+def register(metric: Metric) -> Metric:
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+
+def render_prometheus() -> str:
+    """Todas las métricas registradas en el formato de texto de Prometheus."""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        try:
+            lines.extend(metric.render())
+        except Exception as e:
+            # Un colector que falla no debe romper la exportación del resto
+            logging.getLogger(__name__).warning("No se pudo exportar %s: %s", metric.name, e)
+    return "\n".join(lines) + "\n"
+
+
+# Métricas del análisis y de la API de Twitter
+STAGE_SECONDS = register(Histogram(
+    "sna_stage_duration_seconds", "Duración de cada etapa del análisis (fetch, build, communities, metrics, serialize)",
+    ["stage"]
+))
+GRAPH_NODES = register(Histogram("sna_graph_nodes", "Nodos de los grafos analizados", buckets=SIZE_BUCKETS))
+GRAPH_EDGES = register(Histogram("sna_graph_edges", "Aristas de los grafos analizados", buckets=SIZE_BUCKETS))
+API_CALLS = register(Counter("sna_twitter_api_calls_total", "Llamadas a la API de Twitter", ["endpoint"]))
+API_RETRIES = register(Counter("sna_twitter_api_retries_total", "Reintentos tras un 429 de la API de Twitter",
+                               ["endpoint"]))
+HTTP_REQUEST_SECONDS = register(Histogram(
+    "sna_http_request_duration_seconds", "Duración de las peticiones HTTP al backend", ["method", "route", "status"]
+))
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def observe_stages(timings: Dict[str, float]):
+    for stage, seconds in timings.items():
+        observe_stage(stage, seconds)
+
+
+@contextlib.contextmanager
+def stage_timer(stage: str, timings: Optional[Dict[str, float]] = None):
+    """Mide una etapa; con ``timings`` acumula la duración ahí en lugar de registrarla."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if timings is None:
+            observe_stage(stage, elapsed)
+        else:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def observe_graph(G):
+    GRAPH_NODES.observe(G.number_of_nodes())
+    GRAPH_EDGES.observe(G.number_of_edges())
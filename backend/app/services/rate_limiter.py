@@ -0,0 +1,528 @@
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import re
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException
+
+# Añadir la ruta raíz del backend al path de Python
+backend_dir = Path(__file__).parent.parent.parent.absolute()
+if str(backend_dir) not in sys.path:
+    sys.path.append(str(backend_dir))
+
+from config import RATE_LIMIT_MAX_WAIT, RATE_LIMIT_RESERVE, RATE_LIMIT_BACKEND, CACHE_SQLITE_PATH, REDIS_URL
+from config import SQLITE_BUSY_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Segundos tras los que se descarta una reserva de cupo no liberada en un almacén compartido
+# (el worker que la hizo pudo caer). Cada reserva caduca por separado, aunque siga habiendo tráfico
+IN_FLIGHT_TTL = 120
+
+# Espera máxima entre comprobaciones cuando el cupo que queda está reservado por llamadas en
+# curso: las de este proceso avisan al terminar, las de otros workers solo se ven al volver a mirar
+IN_FLIGHT_POLL = 1.0
+
+# Prioridad de la petición en curso: "interactive" (usuarios del dashboard) o "background"
+current_priority = contextvars.ContextVar("current_priority", default="interactive")
+
+
+# Normaliza la ruta de la API para agrupar el cupo por endpoint y no por recurso
+def endpoint_for_route(route: str) -> str:
+    route = re.sub(r"/by/username/[^/]+", "/by/username/:username", route)
+    # Los ids numéricos se sustituyen salvo el prefijo de versión (/2)
+    return re.sub(r"(?<!^)/\d+(?=/|$)", "/:id", route)
+
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+# Identificador del proceso que reserva cupo; se calcula en cada llamada para que los
+# workers creados con fork no hereden el del proceso padre
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class EndpointQuota:
+    def __init__(self, limit: Optional[int] = None, remaining: Optional[int] = None,
+                 reset: Optional[float] = None, reservations: Optional[Dict[str, List[float]]] = None,
+                 touched: Optional[float] = None):
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset  # epoch en segundos
+        # Llamadas en curso: proceso -> instante de cada reserva, de la más antigua a la más reciente
+        self.reservations = reservations or {}
+        self.touched = touched  # última modificación
+
+    @property
+    def in_flight(self) -> int:
+        return sum(len(times) for times in self.reservations.values())
+
+    def reserve(self, owner: str, now: float):
+        self.reservations.setdefault(owner, []).append(now)
+
+    def release(self, owner: str):
+        times = self.reservations.get(owner)
+        if times:
+            times.pop(0)
+            if not times:
+                del self.reservations[owner]
+
+    def expire(self, now: float, ttl: float = IN_FLIGHT_TTL):
+        for owner in list(self.reservations):
+            times = [t for t in self.reservations[owner] if now - t <= ttl]
+            if times:
+                self.reservations[owner] = times
+            else:
+                del self.reservations[owner]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"limit": self.limit, "remaining": self.remaining, "reset": self.reset,
+                "reservations": {owner: list(times) for owner, times in self.reservations.items()},
+                "touched": self.touched}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EndpointQuota":
+        return cls(data.get("limit"), data.get("remaining"), data.get("reset"),
+                   data.get("reservations"), data.get("touched"))
+
+
+class QuotaStore:
+    """Almacén del cupo de cada endpoint.
+
+    ``modify`` carga el cupo de un endpoint, le aplica una función y lo
+    guarda de forma atómica, también entre procesos en los almacenes
+    compartidos. Así varios workers de uvicorn reservan unidades sobre el
+    mismo cupo en lugar de gastar cada uno el suyo.
+    """
+
+    name = "base"
+    shared = False
+
+    def modify(self, endpoint: str, func: Callable[[EndpointQuota], T]) -> T:
+        raise NotImplementedError
+
+    def load_all(self) -> Dict[str, EndpointQuota]:
+        raise NotImplementedError
+
+    def load(self, endpoint: str) -> Optional[EndpointQuota]:
+        return self.load_all().get(endpoint)
+
+    def clear(self):
+        raise NotImplementedError
+
+    def _touch(self, quota: EndpointQuota, now: float):
+        # Un proceso que cae con llamadas en curso no las libera: en los almacenes
+        # compartidos cada reserva con más de IN_FLIGHT_TTL segundos se descarta
+        if self.shared:
+            quota.expire(now)
+        quota.touched = now
+
+
+class MemoryQuotaStore(QuotaStore):
+    """Cupo en memoria del proceso."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._quotas: Dict[str, EndpointQuota] = {}
+
+    def modify(self, endpoint: str, func: Callable[[EndpointQuota], T]) -> T:
+        with self._lock:
+            quota = self._quotas.get(endpoint)
+            if quota is None:
+                quota = self._quotas[endpoint] = EndpointQuota()
+            self._touch(quota, time.time())
+            return func(quota)
+
+    def load_all(self) -> Dict[str, EndpointQuota]:
+        with self._lock:
+            return {endpoint: EndpointQuota(**quota.as_dict()) for endpoint, quota in self._quotas.items()}
+
+    def clear(self):
+        with self._lock:
+            self._quotas.clear()
+
+
+class SQLiteQuotaStore(QuotaStore):
+    """Cupo compartido por los procesos que abren el mismo fichero SQLite.
+
+    Cada modificación es una transacción ``BEGIN IMMEDIATE``, que toma el
+    bloqueo de escritura del fichero antes de leer el cupo.
+    """
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, path: str = CACHE_SQLITE_PATH, table: str = "rate_limits"):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT, check_same_thread=False,
+                                     isolation_level=None)
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "endpoint TEXT PRIMARY KEY, quota_limit INTEGER, remaining INTEGER, reset REAL, "
+                "in_flight INTEGER NOT NULL DEFAULT 0, touched REAL, reservations TEXT)"
+            )
+            # Ficheros creados antes de guardar las reservas por proceso
+            columns = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            if "reservations" not in columns:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN reservations TEXT")
+
+    def _row_to_quota(self, row) -> EndpointQuota:
+        limit, remaining, reset, reservations, touched = row
+        return EndpointQuota(limit, remaining, reset, json.loads(reservations) if reservations else None, touched)
+
+    def modify(self, endpoint: str, func: Callable[[EndpointQuota], T]) -> T:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT quota_limit, remaining, reset, reservations, touched FROM {self.table} "
+                    "WHERE endpoint = ?",
+                    (endpoint,)
+                ).fetchone()
+                quota = self._row_to_quota(row) if row else EndpointQuota()
+                self._touch(quota, time.time())
+                result = func(quota)
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} "
+                    "(endpoint, quota_limit, remaining, reset, in_flight, touched, reservations) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (endpoint, quota.limit, quota.remaining, quota.reset, quota.in_flight, quota.touched,
+                     json.dumps(quota.reservations))
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return result
+
+    def load_all(self) -> Dict[str, EndpointQuota]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT endpoint, quota_limit, remaining, reset, reservations, touched FROM {self.table}"
+            ).fetchall()
+        return {row[0]: self._row_to_quota(row[1:]) for row in rows}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+
+class RedisQuotaStore(QuotaStore):
+    """Cupo compartido en Redis (o un sustituto compatible con redis-py, ``client``).
+
+    El cupo de cada endpoint es un hash; las modificaciones usan
+    transacciones optimistas (WATCH/MULTI) que se repiten si otro proceso
+    cambia el mismo endpoint a la vez.
+    """
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = "quota", client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("El cupo compartido en Redis requiere el paquete redis (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._index_key = f"{prefix}:__endpoints__"
+
+    def _key(self, endpoint: str) -> str:
+        return f"{self.prefix}:{endpoint}"
+
+    @staticmethod
+    def _decode(data: Dict[Any, Any]) -> EndpointQuota:
+        values = {(k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+                  for k, v in data.items()}
+
+        def number(name: str, cast):
+            # Los valores None se guardan como cadena vacía
+            return cast(values[name]) if values.get(name) not in (None, "") else None
+
+        reservations = values.get("reservations")
+        return EndpointQuota(number("limit", int), number("remaining", int), number("reset", float),
+                             json.loads(reservations) if reservations else None, number("touched", float))
+
+    def modify(self, endpoint: str, func: Callable[[EndpointQuota], T]) -> T:
+        key = self._key(endpoint)
+        outcome = {}
+
+        def transaction(pipe):
+            quota = self._decode(pipe.hgetall(key))
+            self._touch(quota, time.time())
+            outcome["result"] = func(quota)
+            pipe.multi()
+            values = quota.as_dict()
+            values["reservations"] = json.dumps(values["reservations"])
+            pipe.hset(key, mapping={name: "" if value is None else value for name, value in values.items()})
+            pipe.sadd(self._index_key, endpoint)
+
+        self.client.transaction(transaction, key)
+        return outcome["result"]
+
+    def load_all(self) -> Dict[str, EndpointQuota]:
+        quotas = {}
+        for endpoint in self.client.smembers(self._index_key):
+            endpoint = endpoint.decode() if isinstance(endpoint, bytes) else endpoint
+            quotas[endpoint] = self._decode(self.client.hgetall(self._key(endpoint)))
+        return quotas
+
+    def clear(self):
+        for endpoint in self.client.smembers(self._index_key):
+            endpoint = endpoint.decode() if isinstance(endpoint, bytes) else endpoint
+            self.client.delete(self._key(endpoint))
+        self.client.delete(self._index_key)
+
+
+def create_quota_store(backend: Optional[str] = None, **kwargs) -> QuotaStore:
+    """Crea el almacén de cupo configurado (``RATE_LIMIT_BACKEND``)."""
+    backend = (backend or RATE_LIMIT_BACKEND).lower()
+
+    if backend == "memory":
+        return MemoryQuotaStore(**kwargs)
+    if backend == "sqlite":
+        return SQLiteQuotaStore(**kwargs)
+    if backend == "redis":
+        return RedisQuotaStore(**kwargs)
+
+    raise ValueError(f"Backend de cupo desconocido: {backend}")
+
+
+class RateLimitScheduler:
+    """Planifica las llamadas a la API según el cupo de cada endpoint.
+
+    El cupo (``x-rate-limit-limit``, ``x-rate-limit-remaining`` y
+    ``x-rate-limit-reset``) se aprende de las cabeceras de cada respuesta.
+    Antes de cada llamada ``acquire`` reserva una unidad; si no queda cupo
+    espera a que la ventana se reinicie (hasta ``max_wait`` segundos) o
+    responde 429 sin llegar a llamar a Twitter. Si el cupo que queda solo
+    está ocupado por llamadas en curso, espera a que alguna termine
+    (``release``) en lugar de esperar al reinicio. Las peticiones en segundo
+    plano no pueden consumir las últimas ``reserve`` unidades de cupo. Con
+    un almacén compartido (``store``) el cupo y las llamadas en curso son
+    los de todos los workers.
+    """
+
+    def __init__(self, max_wait: float = RATE_LIMIT_MAX_WAIT, reserve: int = RATE_LIMIT_RESERVE,
+                 store: Optional[QuotaStore] = None, owner: Optional[str] = None):
+        self.max_wait = max_wait
+        self.reserve = reserve
+        self.store = store if store is not None else create_quota_store()
+        # Proceso al que se anotan las reservas (por defecto, el actual)
+        self._owner = owner
+        self._lock = threading.Lock()
+        self.throttled = 0
+        # Aviso de cambio de cupo (llamada liberada o cabeceras nuevas) para las llamadas en espera
+        self._changed = threading.Condition()
+        self._generation = 0
+        self._async_waiters: List[asyncio.Future] = []
+
+    @property
+    def owner(self) -> str:
+        return self._owner or worker_id()
+
+    def update(self, endpoint: str, headers) -> None:
+        if not headers or "x-rate-limit-remaining" not in headers:
+            return
+
+        try:
+            remaining = int(headers["x-rate-limit-remaining"])
+            limit = headers.get("x-rate-limit-limit")
+            limit = int(limit) if limit is not None else None
+            reset = headers.get("x-rate-limit-reset")
+            reset = float(reset) if reset is not None else None
+        except (TypeError, ValueError):
+            return
+
+        def apply(quota: EndpointQuota):
+            quota.remaining = remaining
+            if limit is not None:
+                quota.limit = limit
+            if reset is not None:
+                quota.reset = reset
+
+        self.store.modify(endpoint, apply)
+        self._notify()
+
+    def _notify(self):
+        with self._changed:
+            self._generation += 1
+            self._changed.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for waiter in waiters:
+            try:
+                waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # El event loop de esa llamada ya se cerró
+                pass
+
+    def _plan(self, endpoint: str, priority: str) -> Tuple[float, str]:
+        # Devuelve (0, "") si la llamada puede salir ya (y la reserva) o los segundos a esperar y
+        # el motivo: "in_flight" si el cupo lo ocupan llamadas en curso, "window" si está agotado
+        floor = self.reserve if priority == "background" else 0
+        owner = self.owner
+
+        def plan(quota: EndpointQuota) -> Tuple[float, str]:
+            now = time.time()
+            # La ventana se reinició: el cupo vuelve al límite
+            if quota.reset is not None and now >= quota.reset:
+                quota.remaining = quota.limit
+                quota.reset = None
+
+            if quota.remaining is None:
+                quota.reserve(owner, now)
+                return 0.0, ""
+
+            if quota.remaining - quota.in_flight > floor:
+                quota.reserve(owner, now)
+                return 0.0, ""
+
+            if quota.reset is None:
+                # Sin fecha de reinicio conocida: dejar pasar y que la API decida
+                quota.reserve(owner, now)
+                return 0.0, ""
+
+            until_reset = quota.reset - now + 1
+            if quota.remaining > floor:
+                # Queda cupo, pero reservado por llamadas en curso: basta con que termine alguna
+                return min(IN_FLIGHT_POLL, until_reset), "in_flight"
+            return until_reset, "window"
+
+        return self.store.modify(endpoint, plan)
+
+    def _wait_or_raise(self, endpoint: str, wait: float, reason: str, waited: float, counted: bool) -> bool:
+        # Devuelve True si la llamada ya cuenta como retenida
+        if reason == "window" and waited + wait > self.max_wait:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Twitter API rate limit exhausted for {endpoint}. Resets in {int(wait)}s"
+            )
+        if reason == "in_flight" and waited >= self.max_wait:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Twitter API rate limit for {endpoint} is held by calls in flight"
+            )
+        if not counted:
+            with self._lock:
+                self.throttled += 1
+        if reason == "window":
+            logger.warning("Cupo agotado para %s. Esperando %.1fs hasta el reinicio de la ventana", endpoint, wait)
+        else:
+            logger.debug("Cupo de %s reservado por llamadas en curso. Esperando a que termine alguna", endpoint)
+        return True
+
+    def acquire(self, endpoint: str, priority: Optional[str] = None):
+        priority = priority or current_priority.get()
+        waited = 0.0
+        counted = False
+        while True:
+            generation = self._generation
+            wait, reason = self._plan(endpoint, priority)
+            if wait <= 0:
+                return
+            counted = self._wait_or_raise(endpoint, wait, reason, waited, counted)
+            start = time.monotonic()
+            if reason == "in_flight":
+                # Despertar en cuanto se libere una llamada (o cambie el cupo) desde el plan
+                with self._changed:
+                    self._changed.wait_for(lambda: self._generation != generation, timeout=wait)
+            else:
+                time.sleep(wait)
+            waited += time.monotonic() - start
+
+    async def acquire_async(self, endpoint: str, priority: Optional[str] = None):
+        priority = priority or current_priority.get()
+        loop = asyncio.get_running_loop()
+        waited = 0.0
+        counted = False
+        while True:
+            generation = self._generation
+            wait, reason = self._plan(endpoint, priority)
+            if wait <= 0:
+                return
+            counted = self._wait_or_raise(endpoint, wait, reason, waited, counted)
+            start = time.monotonic()
+            if reason == "in_flight":
+                with self._changed:
+                    if self._generation != generation:
+                        continue
+                    waiter = loop.create_future()
+                    self._async_waiters.append(waiter)
+                try:
+                    await asyncio.wait_for(waiter, wait)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(wait)
+            waited += time.monotonic() - start
+
+    def release(self, endpoint: str):
+        owner = self.owner
+
+        def release(quota: EndpointQuota):
+            quota.release(owner)
+
+        self.store.modify(endpoint, release)
+        self._notify()
+
+    def retry_after(self, endpoint: str) -> Optional[float]:
+        # Segundos hasta el reinicio de la ventana tras un 429, si se conoce
+        quota = self.store.load(endpoint)
+        if quota is None or quota.reset is None:
+            return None
+        return max(0.0, quota.reset - time.time())
+
+    @contextlib.contextmanager
+    def priority(self, priority: str):
+        token = current_priority.set(priority)
+        try:
+            yield
+        finally:
+            current_priority.reset(token)
+
+    def is_exhausted(self) -> bool:
+        now = time.time()
+        return any(q.remaining == 0 and q.reset is not None and q.reset > now
+                   for q in self.store.load_all().values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        endpoints = {
+            endpoint: {
+                "limit": q.limit,
+                "remaining": q.remaining,
+                "reset_in": max(0, int(q.reset - now)) if q.reset is not None else None,
+                "in_flight": q.in_flight
+            }
+            for endpoint, q in self.store.load_all().items()
+        }
+        with self._lock:
+            throttled = self.throttled
+        return {"endpoints": endpoints, "throttled": throttled, "backend": self.store.name}
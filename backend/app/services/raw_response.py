@@ -0,0 +1,152 @@
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from tweepy.mixins import DataMapping
+
+# Secciones de primer nivel de una respuesta de la API v2
+RAW_SECTIONS = ("includes", "meta", "errors", "data")
+
+
+# Función auxiliar para convertir objetos de tweepy a diccionarios
+def object_to_dict(obj):
+    # Los modelos de la API v2 (Tweet, User, Media...) usan __slots__ y guardan
+    # el JSON original en .data: se serializa ese diccionario completo
+    if isinstance(obj, DataMapping):
+        return object_to_dict(obj.data)
+    if hasattr(obj, '_json'):
+        return obj._json
+    elif hasattr(obj, '__dict__'):
+        return {k: object_to_dict(v) for k, v in obj.__dict__.items()
+                if not k.startswith('_') and not callable(v)}
+    elif isinstance(obj, (list, tuple)):
+        return [object_to_dict(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {k: object_to_dict(v) for k, v in obj.items()}
+    elif isinstance(obj, (str, int, float, bool, type(None))):
+        return obj
+    else:
+        # Para tipos que no se pueden convertir, usar su representación de cadena
+        return str(obj)
+
+
+def _has_sections(response) -> bool:
+    return hasattr(response, 'data') or hasattr(response, 'includes') or hasattr(response, 'meta')
+
+
+# Convierte una sola sección de la respuesta (data, includes, meta o errors)
+def convert_response_section(response, section: str) -> Any:
+    if section == "data":
+        if isinstance(response.data, list):
+            return [object_to_dict(item) for item in response.data]
+        return object_to_dict(response.data) if response.data else {}
+    if section == "includes":
+        includes = getattr(response, 'includes', None) or {}
+        return {key: [object_to_dict(item) for item in items] for key, items in includes.items()}
+    if section == "meta":
+        meta = getattr(response, 'meta', None)
+        return object_to_dict(meta) if meta else {}
+    if section == "errors":
+        errors = getattr(response, 'errors', None)
+        return [object_to_dict(error) for error in errors] if errors else []
+    raise ValueError(f"Sección desconocida: {section}")
+
+
+# Función para convertir la respuesta de tweepy a un formato serializable
+def convert_tweepy_response_to_dict(response):
+    if response is None:
+        return None
+
+    # Para respuestas simples o casos no cubiertos, intentar la conversión completa
+    if not _has_sections(response):
+        try:
+            return object_to_dict(response)
+        except Exception as e:
+            return {
+                "error": "No se pudo serializar la respuesta completa",
+                "error_detail": str(e),
+                "response_str": str(response)
+            }
+
+    return {section: convert_response_section(response, section) for section in RAW_SECTIONS
+            if section != "data" or hasattr(response, 'data')}
+
+
+def _field_tree(fields: Iterable[str]) -> Dict[str, Any]:
+    # "data.id", "data.text" -> {"data": {"id": True, "text": True}}
+    tree: Dict[str, Any] = {}
+    for field in fields:
+        node = tree
+        parts = [part for part in field.split(".") if part]
+        for i, part in enumerate(parts):
+            if i == len(parts) - 1:
+                node[part] = True
+            else:
+                child = node.get(part)
+                if child is True:
+                    break  # Ya se pidió el campo completo
+                node = node.setdefault(part, {})
+    return tree
+
+
+def _project(value: Any, tree: Any) -> Any:
+    if tree is True:
+        return value
+    if isinstance(value, list):
+        return [_project(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: _project(value[key], subtree) for key, subtree in tree.items() if key in value}
+    return value
+
+
+class RawResponse:
+    """Respuesta original de la API serializada bajo demanda.
+
+    Guarda el objeto de tweepy y solo lo convierte a diccionario cuando se
+    pide, sección a sección: una proyección como ``["meta",
+    "data.id"]`` convierte únicamente ``meta`` y ``data``. Las secciones
+    convertidas y las proyecciones se memorizan en el propio objeto, que
+    vive en la caché del análisis junto al resto del resultado. Al
+    serializarlo (cachés SQLite o Redis) solo se guarda la respuesta: cada
+    lectura crea un objeto nuevo y la memoria se reconstruye bajo demanda.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self._sections: Dict[str, Any] = {}
+        self._projections: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"response": self.response}
+
+    def __setstate__(self, state):
+        self.__init__(state["response"])
+
+    def _section(self, section: str) -> Any:
+        if section not in self._sections:
+            self._sections[section] = convert_response_section(self.response, section)
+        return self._sections[section]
+
+    def to_dict(self, fields: Optional[Iterable[str]] = None) -> Any:
+        """Respuesta completa o, con ``fields``, solo los campos pedidos (rutas con puntos)."""
+        if self.response is None:
+            return None
+        if not _has_sections(self.response):
+            return convert_tweepy_response_to_dict(self.response)
+
+        key = tuple(sorted(set(fields))) if fields else ()
+        with self._lock:
+            if key not in self._projections:
+                if key:
+                    tree = _field_tree(key)
+                    sections = [section for section in RAW_SECTIONS if section in tree]
+                    self._projections[key] = {
+                        section: _project(self._section(section), tree[section]) for section in sections
+                        if section != "data" or hasattr(self.response, 'data')
+                    }
+                else:
+                    self._projections[key] = {
+                        section: self._section(section) for section in RAW_SECTIONS
+                        if section != "data" or hasattr(self.response, 'data')
+                    }
+            return self._projections[key]
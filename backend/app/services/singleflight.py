@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.services.observability import Counter, Gauge, register
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # Tarea del líder si la llamada se inició con do_async
+        self.task: Optional[asyncio.Task] = None
+        # Futuros de las llamadas asíncronas que esperan a un líder de otro hilo o event loop
+        self.waiters: List[asyncio.Future] = []
+
+
+def _resolve(waiter: asyncio.Future, result: Any, error: Optional[BaseException]):
+    if waiter.done():
+        return
+    if error is not None:
+        waiter.set_exception(error)
+    else:
+        waiter.set_result(result)
+
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes idénticas en una sola ejecución.
+
+    Mientras hay una llamada en curso para una clave, el resto de llamadas
+    con la misma clave esperan su resultado (o su excepción) en lugar de
+    repetir el trabajo. Las llamadas desde hilos (``do``) y desde el event
+    loop (``do_async``) comparten el mismo registro: una llamada síncrona
+    espera a una asíncrona en curso con la misma clave y al revés.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        _flights[name] = self
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, call, None, e)
+            raise
+        self._finish(key, call, result, None)
+        return result
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                call.task = asyncio.ensure_future(fn())
+                self.executions += 1
+                call.task.add_done_callback(lambda task: self._finish_task(key, call, task))
+                pending = call.task
+            elif call.task is not None and call.task.get_loop() is loop:
+                self.coalesced += 1
+                pending = call.task
+            else:
+                # El líder es síncrono (o de otro event loop): se espera sin bloquear este loop
+                self.coalesced += 1
+                pending = loop.create_future()
+                call.waiters.append(pending)
+
+        # shield: si se cancela una de las peticiones, las demás siguen esperando el resultado
+        return await asyncio.shield(pending)
+
+    def _finish_task(self, key: str, call: _Call, task: asyncio.Task):
+        if task.cancelled():
+            self._finish(key, call, None, asyncio.CancelledError())
+        else:
+            self._finish(key, call, None if task.exception() else task.result(), task.exception())
+
+    def _finish(self, key: str, call: _Call, result: Any, error: Optional[BaseException]):
+        # Quitar la llamada del registro y recoger sus esperas en la misma sección crítica:
+        # ninguna llamada nueva puede apuntarse a una llamada ya terminada
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            call.result = result
+            call.error = error
+            waiters, call.waiters = call.waiters, []
+        call.done.set()
+        for waiter in waiters:
+            try:
+                waiter.get_loop().call_soon_threadsafe(_resolve, waiter, result, error)
+            except RuntimeError:
+                # El event loop de esa llamada ya se cerró
+                pass
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls)
+            }
+
+
+# Grupos de llamadas por nombre, para exportar sus contadores a Prometheus
+_flights: "weakref.WeakValueDictionary[str, SingleFlight]" = weakref.WeakValueDictionary()
+
+
+def _flight_values(field: str):
+    def collect():
+        return {(name,): flight.info()[field] for name, flight in list(_flights.items())}
+    return collect
+
+
+register(Counter("sna_singleflight_calls_total", "Llamadas recibidas por cada grupo de llamadas idénticas",
+                 ["flight"], collect=_flight_values("calls")))
+register(Counter("sna_singleflight_executions_total", "Llamadas ejecutadas (no agrupadas con otra en curso)",
+                 ["flight"], collect=_flight_values("executions")))
+register(Counter("sna_singleflight_coalesced_total", "Llamadas que esperaron el resultado de otra idéntica",
+                 ["flight"], collect=_flight_values("coalesced")))
+register(Gauge("sna_singleflight_in_flight", "Llamadas distintas en curso", ["flight"],
+               collect=_flight_values("in_flight")))
@@ -0,0 +1,62 @@
+import json
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from app.services.twitter_service import analysis_raw_response, community_index, iter_edge_elements, iter_node_elements
+
+# Tipo MIME de las respuestas en streaming (un objeto JSON por línea)
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Elementos (nodos, aristas o comunidades) por línea del stream
+STREAM_CHUNK_SIZE = 1000
+
+
+def _line(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+
+
+def _chunks(section: str, items: Iterable[Any], chunk_size: int) -> Iterator[bytes]:
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield _line({"section": section, "items": chunk})
+
+
+def iter_analysis_ndjson(analysis: Dict[str, Any], include_raw: bool = True, raw_fields: Optional[List[str]] = None,
+                         chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Serializa un análisis como NDJSON, sección a sección.
+
+    Primero una línea ``meta`` con los tamaños, después los nodos, las
+    aristas y las comunidades en líneas de hasta ``chunk_size`` elementos,
+    y por último las métricas, la respuesta original (si se pide, con la
+    proyección de ``raw_fields``) y una línea ``end``.
+    Los nodos y aristas se generan desde el grafo a medida que se envían,
+    sin construir la lista completa ni el JSON entero en memoria.
+    """
+    graph = analysis["graph"]
+    communities = analysis["communities"]
+
+    yield _line({
+        "section": "meta",
+        "num_nodes": graph.number_of_nodes(),
+        "num_edges": graph.number_of_edges(),
+        "num_communities": len(communities),
+        "chunk_size": chunk_size
+    })
+
+    try:
+        yield from _chunks("nodes", iter_node_elements(graph, community_index(communities)), chunk_size)
+        yield from _chunks("edges", iter_edge_elements(graph), chunk_size)
+        yield from _chunks("communities", (list(community) for community in communities), chunk_size)
+        yield _line({"section": "metrics", "data": analysis["metrics"]})
+        raw_response = analysis_raw_response(analysis, include_raw, raw_fields)
+        if raw_response is not None:
+            yield _line({"section": "raw_response", "data": raw_response})
+    except Exception as e:
+        # Las cabeceras ya se enviaron: el error se comunica dentro del propio stream
+        yield _line({"section": "error", "message": str(e)})
+        return
+
+    yield _line({"section": "end"})
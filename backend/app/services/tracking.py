@@ -0,0 +1,371 @@
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import networkx as nx
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+# Añadir la ruta raíz del backend al path de Python
+backend_dir = Path(__file__).parent.parent.parent.absolute()
+if str(backend_dir) not in sys.path:
+    sys.path.append(str(backend_dir))
+
+from config import TRACKING_FULL_REFRESH_FRACTION, TRACKING_FULL_REFRESH_EVERY, TRACKING_MAX_QUERIES
+from app.services import twitter_service as ts
+from app.services.singleflight import SingleFlight
+
+
+class TrackedQuery:
+    """Consulta de larga duración cuyo grafo se actualiza en el sitio.
+
+    Además del grafo y sus índices guarda la partición en comunidades y los
+    totales que necesita Louvain (grado ponderado de cada nodo y de cada
+    comunidad), de modo que un refresco solo reevalúa los nodos afectados
+    por los tweets nuevos. ``gaps`` son los tramos de tweets nuevos que un
+    refresco no llegó a leer por el límite de ``max_tweets``: el id desde el
+    que se buscaba y el ``next_token`` con el que continuar; los refrescos
+    siguientes los recorren antes de darlos por leídos. ``lock`` protege el grafo, la partición y los
+    totales: el refresco los modifica con él tomado y los resúmenes los leen
+    igual.
+    """
+
+    def __init__(self, query: str, max_tweets: int, resolution: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.query = query
+        self.max_tweets = max_tweets
+        self.resolution = resolution
+
+        self.graph = nx.DiGraph()
+        self.index = ts.GraphIndex()
+        self.newest_id: Optional[str] = None
+        self.gaps: List[Dict[str, str]] = []
+
+        self.partition: Dict[Any, int] = {}
+        self.strength: Dict[Any, float] = {}
+        self.community_totals: Dict[int, float] = {}
+        self.total_strength = 0.0
+        self.next_community_id = 0
+
+        self.created_at = time.time()
+        self.refreshed_at: Optional[float] = None
+        self.refreshes = 0
+        self.refreshes_since_full = 0
+        self.last_refresh: Dict[str, Any] = {}
+        self.lock = threading.RLock()
+
+    def new_community_id(self) -> int:
+        community_id = self.next_community_id
+        self.next_community_id += 1
+        return community_id
+
+
+# Registro en memoria de las consultas seguidas
+tracked_queries: Dict[str, TrackedQuery] = {}
+_registry_lock = threading.Lock()
+
+# Un único refresco a la vez por consulta seguida
+tracking_flights = SingleFlight("tracking")
+
+
+# Vecinos de un nodo en la proyección no dirigida con el peso de ambos sentidos
+def _neighbor_weights(G: nx.DiGraph, node) -> Dict[Any, float]:
+    weights: Dict[Any, float] = {}
+    for neighbors in (G.succ[node], G.pred[node]):
+        for nbr, data in neighbors.items():
+            if nbr != node:
+                weights[nbr] = weights.get(nbr, 0) + data.get("weight", 1)
+    return weights
+
+
+def _node_strength(G: nx.DiGraph, node) -> float:
+    # Igual que to_weighted_undirected(G).degree(weight="weight"): los bucles cuentan doble
+    return (sum(data.get("weight", 1) for data in G.succ[node].values())
+            + sum(data.get("weight", 1) for data in G.pred[node].values()))
+
+
+def _apply_changes(tracked: TrackedQuery, touched: set):
+    # Actualiza grados y totales por comunidad; los nodos nuevos empiezan en su propia comunidad
+    for node in touched:
+        strength = _node_strength(tracked.graph, node)
+        delta = strength - tracked.strength.get(node, 0)
+        tracked.strength[node] = strength
+        tracked.total_strength += delta
+
+        if node not in tracked.partition:
+            tracked.partition[node] = tracked.new_community_id()
+        community_id = tracked.partition[node]
+        tracked.community_totals[community_id] = tracked.community_totals.get(community_id, 0) + delta
+
+
+def _local_moves(tracked: TrackedQuery, touched: set) -> int:
+    """Fase de movimientos locales de Louvain restringida a los nodos afectados.
+
+    Cada nodo de la cola se mueve a la comunidad vecina con mayor ganancia de
+    modularidad; si cambia, sus vecinos vuelven a la cola. Como cada
+    movimiento aumenta la modularidad, el proceso termina.
+    """
+    G = tracked.graph
+    partition = tracked.partition
+    totals = tracked.community_totals
+    m2 = tracked.total_strength
+    if m2 <= 0:
+        return 0
+
+    queue = deque(touched)
+    queued = set(touched)
+    moved = 0
+    while queue:
+        node = queue.popleft()
+        queued.discard(node)
+
+        strength = tracked.strength.get(node, 0)
+        current = partition[node]
+        neighbors = _neighbor_weights(G, node)
+        links = {}
+        for nbr, weight in neighbors.items():
+            community_id = partition[nbr]
+            links[community_id] = links.get(community_id, 0) + weight
+
+        # Sacar el nodo de su comunidad y elegir la de mayor ganancia
+        totals[current] -= strength
+        best = current
+        best_gain = links.get(current, 0) - tracked.resolution * totals[current] * strength / m2
+        for community_id, weight in links.items():
+            gain = weight - tracked.resolution * totals.get(community_id, 0) * strength / m2
+            if gain > best_gain:
+                best, best_gain = community_id, gain
+        totals[best] = totals.get(best, 0) + strength
+
+        if best != current:
+            partition[node] = best
+            moved += 1
+            if totals[current] == 0:
+                del totals[current]
+            for nbr in neighbors:
+                if nbr not in queued:
+                    queue.append(nbr)
+                    queued.add(nbr)
+
+    return moved
+
+
+def _stable_labels(tracked: TrackedQuery, new_partition: Dict[Any, int]) -> Dict[Any, int]:
+    """Renombra las comunidades nuevas con el id anterior con el que más nodos comparten."""
+    members: Dict[int, List[Any]] = {}
+    for node, label in new_partition.items():
+        members.setdefault(label, []).append(node)
+
+    candidates = []
+    for label, nodes in members.items():
+        overlap = Counter(tracked.partition[node] for node in nodes if node in tracked.partition)
+        for old_id, count in overlap.items():
+            candidates.append((count, label, old_id))
+    candidates.sort(key=lambda x: x[0], reverse=True)
+
+    mapping: Dict[int, int] = {}
+    used = set()
+    for _, label, old_id in candidates:
+        if label not in mapping and old_id not in used:
+            mapping[label] = old_id
+            used.add(old_id)
+    for label in members:
+        if label not in mapping:
+            mapping[label] = tracked.new_community_id()
+
+    return {node: mapping[label] for node, label in new_partition.items()}
+
+
+def _full_partition(tracked: TrackedQuery):
+    # Louvain completo arrancando desde la partición actual (arranque en caliente)
+    try:
+        import community as community_louvain
+        partition = community_louvain.best_partition(
+            ts.to_weighted_undirected(tracked.graph),
+            partition=dict(tracked.partition) or None,
+            weight="weight",
+            resolution=tracked.resolution
+        )
+    except ImportError:
+        partition = {}
+        for label, component in enumerate(nx.weakly_connected_components(tracked.graph)):
+            for node in component:
+                partition[node] = label
+
+    tracked.partition = _stable_labels(tracked, partition)
+    tracked.community_totals = {}
+    for node, community_id in tracked.partition.items():
+        tracked.community_totals[community_id] = (tracked.community_totals.get(community_id, 0)
+                                                  + tracked.strength.get(node, 0))
+
+
+def _update_communities(tracked: TrackedQuery, touched: set) -> Dict[str, Any]:
+    _apply_changes(tracked, touched)
+
+    full = (
+        tracked.refreshes == 0
+        or tracked.refreshes_since_full >= TRACKING_FULL_REFRESH_EVERY
+        or len(touched) > TRACKING_FULL_REFRESH_FRACTION * max(1, tracked.graph.number_of_nodes())
+    )
+    if full:
+        _full_partition(tracked)
+        tracked.refreshes_since_full = 0
+        return {"mode": "full", "moved_nodes": None}
+
+    tracked.refreshes_since_full += 1
+    if not touched:
+        return {"mode": "unchanged", "moved_nodes": 0}
+    return {"mode": "local", "moved_nodes": _local_moves(tracked, touched)}
+
+
+async def refresh_tracked_query(tracked: TrackedQuery) -> TrackedQuery:
+    """Incorpora los tweets nuevos desde el último refresco y actualiza las comunidades."""
+
+    def apply(responses: List[Any], ingestion: Dict[str, Any], start: float):
+        # Construir el grafo y repartir comunidades (Louvain) es trabajo de CPU: se hace en un hilo
+        with tracked.lock:
+            touched = set()
+            for response in responses:
+                touched |= ts.process_tweets(response, tracked.graph, tracked.index)
+            if touched:
+                # Los pesos cambian aunque no cambie el número de nodos ni aristas
+                ts.clear_metrics_cache(tracked.graph)
+
+            if ingestion.get("newest_id"):
+                tracked.newest_id = ingestion["newest_id"]
+            tracked.gaps = ingestion["gaps"]
+
+            update = _update_communities(tracked, touched)
+            tracked.refreshes += 1
+            tracked.refreshed_at = time.time()
+            tracked.last_refresh = {
+                "new_tweets": ingestion.get("tweets", 0),
+                "backlog_tweets": ingestion["backlog_tweets"],
+                "pending_gaps": len(tracked.gaps),
+                "touched_nodes": len(touched),
+                "elapsed": round(time.monotonic() - start, 4),
+                **update
+            }
+        return tracked
+
+    async def fetch(responses: List[Any], ingestion: Dict[str, Any], max_tweets: int,
+                    since_id: Optional[str], next_token: Optional[str] = None) -> Optional[Dict[str, str]]:
+        # Lee las páginas posteriores a since_id; si el límite corta la paginación devuelve el tramo pendiente
+        max_pages, time_limit = ts._ingestion_limits(max_tweets, None, None)
+        async for response in ts.iter_search_pages_async(tracked.query, max_tweets, max_pages, time_limit,
+                                                         ingestion, since_id=since_id, next_token=next_token):
+            if response and response.data:
+                responses.append(response)
+        if since_id is not None and ingestion.get("next_token") and ingestion.get("stop_reason") != "exhausted":
+            return {"since_id": since_id, "next_token": ingestion["next_token"]}
+        return None
+
+    async def run():
+        start = time.monotonic()
+        ingestion = {}
+        responses = []
+
+        # Los refrescos son trabajo en segundo plano: no consumen el cupo reservado a usuarios
+        with ts.scheduler.priority("background"):
+            # Primero las novedades; el primer refresco es una muestra y no deja tramos pendientes
+            new_gap = await fetch(responses, ingestion, tracked.max_tweets, tracked.newest_id)
+
+            # Después los tramos pendientes (el que acaba de quedar cortado el último), del más
+            # antiguo al más reciente y con su propio presupuesto
+            pending = tracked.gaps + ([new_gap] if new_gap is not None else [])
+            gaps = []
+            backlog = 0
+            for gap in pending:
+                budget = tracked.max_tweets - backlog
+                if budget <= 0:
+                    gaps.append(gap)
+                    continue
+                gap_ingestion = {}
+                remaining = await fetch(responses, gap_ingestion, budget, gap["since_id"], gap["next_token"])
+                backlog += gap_ingestion["tweets"]
+                if remaining is not None:
+                    gaps.append(remaining)
+        ingestion["backlog_tweets"] = backlog
+        ingestion["gaps"] = gaps
+
+        return await run_in_threadpool(apply, responses, ingestion, start)
+
+    return await tracking_flights.do_async(tracked.id, run)
+
+
+async def register_tracked_query(query: str, max_tweets: int = 100,
+                                 resolution: float = ts.LOUVAIN_RESOLUTION) -> TrackedQuery:
+    with _registry_lock:
+        if len(tracked_queries) >= TRACKING_MAX_QUERIES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Se alcanzó el máximo de consultas seguidas ({TRACKING_MAX_QUERIES})"
+            )
+        tracked = TrackedQuery(query, max_tweets, resolution)
+        tracked_queries[tracked.id] = tracked
+
+    try:
+        return await refresh_tracked_query(tracked)
+    except Exception:
+        remove_tracked_query(tracked.id)
+        raise
+
+
+def get_tracked_query(tracked_id: str) -> TrackedQuery:
+    tracked = tracked_queries.get(tracked_id)
+    if tracked is None:
+        raise HTTPException(status_code=404, detail=f"Consulta seguida no encontrada: {tracked_id}")
+    return tracked
+
+
+def remove_tracked_query(tracked_id: str):
+    with _registry_lock:
+        tracked_queries.pop(tracked_id, None)
+
+
+def tracked_query_summary(tracked: TrackedQuery, include_details: bool = True) -> Dict[str, Any]:
+    """Resumen de una consulta seguida.
+
+    Recorre el grafo y calcula métricas: desde código asíncrono hay que
+    llamarla con ``tracked_query_summary_async``.
+    """
+    with tracked.lock:
+        summary = {
+            "id": tracked.id,
+            "query": tracked.query,
+            "max_tweets": tracked.max_tweets,
+            "created_at": tracked.created_at,
+            "refreshed_at": tracked.refreshed_at,
+            "refreshes": tracked.refreshes,
+            "newest_id": tracked.newest_id,
+            "num_nodes": tracked.graph.number_of_nodes(),
+            "num_edges": tracked.graph.number_of_edges(),
+            "last_refresh": tracked.last_refresh
+        }
+        if not include_details:
+            return summary
+
+        members: Dict[int, List[Any]] = {}
+        for node, community_id in tracked.partition.items():
+            members.setdefault(community_id, []).append(node)
+        communities = [
+            {
+                "id": community_id,
+                "size": len(nodes),
+                "nodes": [{"id": node, "name": tracked.graph.nodes[node].get("name", "")} for node in nodes[:10]]
+            }
+            for community_id, nodes in members.items()
+        ]
+        communities.sort(key=lambda x: x["size"], reverse=True)
+
+        summary["communities"] = communities
+        summary["metrics"] = ts.get_network_metrics(tracked.graph)
+    return summary
+
+
+async def tracked_query_summary_async(tracked: TrackedQuery, include_details: bool = True) -> Dict[str, Any]:
+    return await run_in_threadpool(tracked_query_summary, tracked, include_details)
@@ -0,0 +1,218 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import tweepy
+
+# Añadir la ruta raíz del backend al path de Python
+backend_dir = Path(__file__).parent.parent.parent.absolute()
+if str(backend_dir) not in sys.path:
+    sys.path.append(str(backend_dir))
+
+from config import TWEET_STORE_PATH, SQLITE_BUSY_TIMEOUT
+
+# Máximo de parámetros por consulta IN (...) de SQLite
+SQLITE_MAX_PARAMS = 500
+
+
+def _timestamp(value) -> Optional[float]:
+    # created_at llega como datetime (tweepy) o como cadena ISO 8601
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return value.timestamp()
+
+
+def _chunked(values: List[Any], size: int = SQLITE_MAX_PARAMS) -> Iterable[List[Any]]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+class TweetStore:
+    """Almacén local de tweets, usuarios y referencias sobre SQLite.
+
+    ``record`` guarda cada página devuelta por la API: los tweets y sus
+    referencias solo se añaden (un tweet ya guardado no se modifica), los
+    usuarios se actualizan con su último perfil y ``query_tweets`` anota
+    qué consulta devolvió cada tweet. ``load_page`` reconstruye páginas con
+    la misma forma que ``search_recent_tweets`` (del más reciente al más
+    antiguo, con los usuarios en ``includes``), de modo que el grafo se
+    construye con el mismo código que en la ingesta en vivo.
+    """
+
+    def __init__(self, path: str = TWEET_STORE_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Todos los workers añaden páginas al mismo fichero (WAL y espera del bloqueo, como la caché)
+        self._conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS tweets ("
+                "id INTEGER PRIMARY KEY, author_id INTEGER, created_at REAL, "
+                "data TEXT NOT NULL, fetched_at REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS tweets_created_at ON tweets (created_at);"
+                "CREATE TABLE IF NOT EXISTS users ("
+                "id INTEGER PRIMARY KEY, username TEXT, data TEXT NOT NULL, fetched_at REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS users_username ON users (username);"
+                "CREATE TABLE IF NOT EXISTS tweet_references ("
+                "tweet_id INTEGER NOT NULL, type TEXT NOT NULL, referenced_id INTEGER NOT NULL, "
+                "PRIMARY KEY (tweet_id, type, referenced_id));"
+                "CREATE TABLE IF NOT EXISTS query_tweets ("
+                "query TEXT NOT NULL, tweet_id INTEGER NOT NULL, fetched_at REAL NOT NULL, "
+                "PRIMARY KEY (query, tweet_id));"
+            )
+
+    def record(self, query: str, response) -> int:
+        """Guarda una página de resultados de ``query``; devuelve el número de tweets."""
+        data = getattr(response, "data", None) or []
+        includes = getattr(response, "includes", None) or {}
+        if not data:
+            return 0
+
+        now = time.time()
+        tweets = list(data) + list(includes.get("tweets", []))
+        tweet_rows = [
+            (int(tweet.id), int(tweet.author_id) if tweet.author_id is not None else None,
+             _timestamp(getattr(tweet, "created_at", None)), json.dumps(tweet.data, default=str), now)
+            for tweet in tweets
+        ]
+        reference_rows = [
+            (int(tweet.id), ref.type, int(ref.id))
+            for tweet in tweets for ref in tweet.referenced_tweets or []
+        ]
+        user_rows = [
+            (int(user.id), user.username, json.dumps(user.data, default=str), now)
+            for user in includes.get("users", [])
+        ]
+        # Solo los tweets de la página son resultados de la consulta; los de includes son referenciados
+        query_rows = [(query, int(tweet.id), now) for tweet in data]
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO tweets (id, author_id, created_at, data, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)", tweet_rows
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO tweet_references (tweet_id, type, referenced_id) VALUES (?, ?, ?)",
+                reference_rows
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO users (id, username, data, fetched_at) VALUES (?, ?, ?, ?)",
+                user_rows
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO query_tweets (query, tweet_id, fetched_at) VALUES (?, ?, ?)",
+                query_rows
+            )
+        return len(data)
+
+    def _select_in(self, sql: str, values: List[Any]) -> List[Any]:
+        rows = []
+        for chunk in _chunked(values):
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(self._conn.execute(sql.format(placeholders), chunk).fetchall())
+        return rows
+
+    def load_page(self, query: str, limit: int, before_id: Optional[int] = None,
+                  since: Optional[float] = None, until: Optional[float] = None) -> tweepy.Response:
+        """Página de hasta ``limit`` tweets guardados para ``query``, anteriores a ``before_id``.
+
+        ``since`` y ``until`` (epoch en segundos) filtran por fecha de
+        creación del tweet. Como en la API, ``meta.next_token`` indica que
+        hay más resultados.
+        """
+        sql = ("SELECT t.id, t.data FROM query_tweets q JOIN tweets t ON t.id = q.tweet_id "
+               "WHERE q.query = ?")
+        params: List[Any] = [query]
+        if before_id is not None:
+            sql += " AND t.id < ?"
+            params.append(before_id)
+        if since is not None:
+            sql += " AND t.created_at >= ?"
+            params.append(since)
+        if until is not None:
+            sql += " AND t.created_at < ?"
+            params.append(until)
+        sql += " ORDER BY t.id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            if not rows:
+                return tweepy.Response(None, {}, [], {"result_count": 0})
+
+            tweets = [json.loads(data) for _, data in rows]
+            tweet_ids = [tweet_id for tweet_id, _ in rows]
+
+            # Tweets referenciados y sus autores, como en la expansión referenced_tweets.id.author_id
+            referenced_ids = [row[0] for row in self._select_in(
+                "SELECT DISTINCT referenced_id FROM tweet_references WHERE tweet_id IN ({})", tweet_ids
+            )]
+            referenced = [json.loads(row[0]) for row in self._select_in(
+                "SELECT data FROM tweets WHERE id IN ({})", referenced_ids
+            )]
+
+            author_ids = {int(tweet["author_id"]) for tweet in tweets + referenced if tweet.get("author_id")}
+            usernames = {
+                mention["username"]
+                for tweet in tweets
+                for mention in (tweet.get("entities") or {}).get("mentions", [])
+                if mention.get("username")
+            }
+            users = {}
+            for user_id, data in self._select_in("SELECT id, data FROM users WHERE id IN ({})", list(author_ids)):
+                users[user_id] = data
+            for user_id, data in self._select_in("SELECT id, data FROM users WHERE username IN ({})",
+                                                 list(usernames)):
+                users[user_id] = data
+
+        includes = {"users": [tweepy.User(json.loads(data)) for data in users.values()]}
+        if referenced:
+            includes["tweets"] = [tweepy.Tweet(tweet) for tweet in referenced]
+        meta = {
+            "result_count": len(tweets),
+            "newest_id": str(tweet_ids[0]),
+            "oldest_id": str(tweet_ids[-1])
+        }
+        if has_more:
+            meta["next_token"] = str(tweet_ids[-1])
+        return tweepy.Response([tweepy.Tweet(tweet) for tweet in tweets], includes, [], meta)
+
+    def queries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT q.query, COUNT(*), MIN(q.fetched_at), MAX(q.fetched_at), MIN(t.created_at), "
+                "MAX(t.created_at) FROM query_tweets q JOIN tweets t ON t.id = q.tweet_id "
+                "GROUP BY q.query ORDER BY MAX(q.fetched_at) DESC"
+            ).fetchall()
+        return [
+            {"query": query, "tweets": tweets, "first_fetched": first_fetched, "last_fetched": last_fetched,
+             "oldest_created": oldest, "newest_created": newest}
+            for query, tweets, first_fetched, last_fetched, oldest, newest in rows
+        ]
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {
+                table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("tweets", "users", "tweet_references")
+            }
+            counts["queries"] = self._conn.execute("SELECT COUNT(DISTINCT query) FROM query_tweets").fetchone()[0]
+        return {"path": self.path, **counts}
@@ -1,6 +1,6 @@
 import tweepy
 import networkx as nx
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Iterator, Tuple, Optional
 from fastapi import HTTPException
 import os
 from tweepy.errors import Forbidden, TweepyException, TooManyRequests
@@ -9,7 +9,14 @@ from pathlib import Path
 import time
 import random
 import json
-from datetime import datetime, timedelta
+import asyncio
+import functools
+import logging
+import threading
+import weakref
+import contextvars
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # Añadir la ruta raíz del backend al path de Python
 backend_dir = Path(__file__).parent.parent.parent.absolute()
@@ -17,7 +24,8 @@ if str(backend_dir) not in sys.path:
     sys.path.append(str(backend_dir))
 
 # Importar configuración
-from config import TWITTER_API_KEY, TWITTER_API_SECRET, BEARER_TOKEN, TWITTER_ACCESS_TOKEN, TWITTER_ACCESS_SECRET
+from config import TWITTER_API_KEY, TWITTER_API_SECRET, BEARER_TOKEN, TWITTER_ACCESS_TOKEN, TWITTER_ACCESS_SECRET, TWITTER_IO_WORKERS
+from config import GRAPH_ENGINE, COMPACT_GRAPH_MIN_EDGES, INFLUENCE_TIME_BUDGET, TWEET_STORE_ENABLED
 
 # Configuración de la API de Twitter
 consumer_key = TWITTER_API_KEY
@@ -26,317 +34,991 @@ bearer_token = BEARER_TOKEN
 access_token = TWITTER_ACCESS_TOKEN
 access_secret = TWITTER_ACCESS_SECRET
 
-# Sistema de caché simple
-cache = {}
+from app.services.cache import create_cache, MISSING
+from app.services.singleflight import SingleFlight
+from app.services.rate_limiter import RateLimitScheduler, endpoint_for_route
+from app.services import influence as influence_metrics
+from app.services.analysis_pool import AnalysisPool, check_deadline
+from app.services.raw_response import RawResponse, convert_tweepy_response_to_dict
+from app.services.tweet_store import TweetStore
+from app.services import http_session
+from app.services import observability
+from app.services.observability import Counter, Gauge, observe_stages, observe_graph, stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Sistema de caché acotado (backend configurable con CACHE_BACKEND)
+cache = create_cache("twitter")
 CACHE_DURATION = 3600  # 1 hora en segundos
 
+# Caché de resultados de análisis (grafo, comunidades y métricas ya calculados)
+analysis_cache = create_cache("analysis")
+ANALYSIS_CACHE_DURATION = CACHE_DURATION
+
+# Deduplicación de llamadas idénticas en curso (a la API y al análisis)
+api_flights = SingleFlight("twitter")
+analysis_flights = SingleFlight("analysis")
+
+# Pool de procesos para detectar comunidades y calcular métricas de grafos grandes
+analysis_pool = AnalysisPool()
+
+# Perfiles de usuario vistos en búsquedas o consultados por lotes, por id y por username
+user_cache = create_cache("users")
+
+# Almacén local de los tweets descargados: como el cliente, se abre en el primer uso para que
+# importar este módulo no cree ni abra la base de datos. ``tweet_store`` se puede sustituir directamente
+tweet_store = None
+_tweet_store_initialized = False
+_tweet_store_lock = threading.Lock()
+
+def get_tweet_store() -> Optional[TweetStore]:
+    """Almacén local de tweets, abierto la primera vez que se pide; None si está desactivado."""
+    global tweet_store, _tweet_store_initialized
+    if tweet_store is not None or _tweet_store_initialized:
+        return tweet_store
+    
+    with _tweet_store_lock:
+        if tweet_store is not None or _tweet_store_initialized:
+            return tweet_store
+        if TWEET_STORE_ENABLED:
+            try:
+                tweet_store = TweetStore()
+            except Exception as e:
+                logger.error("Error al abrir el almacén local de tweets: %s", e)
+        _tweet_store_initialized = True
+    return tweet_store
+
+# Origen de los tweets: la API de Twitter o el almacén local
+INGESTION_SOURCES = ("api", "store")
+
+# Parámetros por defecto del algoritmo de Louvain
+LOUVAIN_RESOLUTION = 1.0
+LOUVAIN_RANDOM_STATE = None
+
 # Configuración de reintentos
 MAX_RETRIES = 3
 INITIAL_BACKOFF = 2  # segundos
 
-# Inicialización del cliente de Twitter
+# Tiempo máximo (segundos) de conexión y de lectura de la verificación del cliente al arrancar
+VERIFY_TIMEOUT = 5
+
+# Planificador del cupo de la API a partir de las cabeceras x-rate-limit-*
+scheduler = RateLimitScheduler()
+
+# Pool acotado de hilos para las llamadas bloqueantes a la API desde código asíncrono
+io_executor = ThreadPoolExecutor(max_workers=TWITTER_IO_WORKERS, thread_name_prefix="twitter-io")
+
+# Métricas de /metrics calculadas al exportar a partir del estado de cachés, cupo y pools
+CACHES = {"twitter": cache, "analysis": analysis_cache, "users": user_cache}
+
+def _cache_requests() -> Dict[Tuple[str, str], int]:
+    values = {}
+    for name, backend in CACHES.items():
+        values[(name, "hit")] = backend.stats.hits
+        values[(name, "miss")] = backend.stats.misses
+    return values
+
+def _quota_values(field: str):
+    return lambda: {(endpoint,): quota[field]
+                    for endpoint, quota in scheduler.snapshot()["endpoints"].items()}
+
+observability.register(Counter("sna_cache_requests_total", "Consultas a las cachés por resultado",
+                               ["cache", "result"], collect=_cache_requests))
+observability.register(Counter("sna_cache_evictions_total", "Entradas expulsadas de las cachés", ["cache"],
+                               collect=lambda: {(name,): c.stats.evictions for name, c in CACHES.items()}))
+observability.register(Gauge("sna_twitter_quota_remaining", "Cupo restante de la API por endpoint", ["endpoint"],
+                             collect=_quota_values("remaining")))
+observability.register(Gauge("sna_twitter_quota_limit", "Cupo total de la ventana por endpoint", ["endpoint"],
+                             collect=_quota_values("limit")))
+observability.register(Gauge("sna_twitter_quota_reset_seconds", "Segundos hasta el reinicio de la ventana",
+                             ["endpoint"], collect=_quota_values("reset_in")))
+observability.register(Gauge("sna_twitter_quota_in_flight", "Llamadas en curso por endpoint", ["endpoint"],
+                             collect=_quota_values("in_flight")))
+observability.register(Counter("sna_twitter_throttled_total", "Llamadas retenidas por falta de cupo",
+                               collect=lambda: {(): scheduler.snapshot()["throttled"]}))
+
+def http_pool_info() -> Optional[Dict[str, Any]]:
+    # Estado del pool de conexiones del cliente (None si aún no se ha creado o no es el de tweepy)
+    session = getattr(client, "session", None)
+    return session.info() if isinstance(session, http_session.PooledSession) else None
+
+def _http_pool_values(field: str):
+    def collect():
+        info = http_pool_info()
+        return {(): info[field]} if info else {}
+    return collect
+
+observability.register(Gauge("sna_twitter_http_in_flight", "Llamadas HTTP en curso a la API de Twitter",
+                             collect=_http_pool_values("in_flight")))
+observability.register(Gauge("sna_twitter_http_pool_size", "Conexiones máximas del pool HTTP de la API de Twitter",
+                             collect=_http_pool_values("max_connections")))
+observability.register(Gauge("sna_twitter_http_idle_connections", "Conexiones libres en el pool HTTP",
+                             collect=_http_pool_values("idle_connections")))
+observability.register(Counter("sna_twitter_http_requests_total", "Llamadas HTTP a la API de Twitter",
+                               collect=_http_pool_values("requests")))
+observability.register(Counter("sna_twitter_http_connections_opened_total", "Conexiones HTTP abiertas",
+                               collect=_http_pool_values("connections_opened")))
+observability.register(Counter("sna_twitter_http_pool_overflow_total",
+                               "Llamadas HTTP iniciadas con el pool de conexiones lleno",
+                               collect=_http_pool_values("overflow")))
+observability.register(Gauge("sna_analysis_running", "Análisis en curso en el pool de procesos",
+                             collect=lambda: {(): analysis_pool.info()["running"]}))
+
+# Configuración de paginación
+PAGE_SIZE = 100  # API v2 permite máximo 100 tweets por página
+MIN_PAGE_SIZE = 10  # API v2 exige al menos 10 tweets por página
+MAX_PAGES = 50
+PAGINATION_TIME_LIMIT = 60  # segundos
+
+# Cliente de tweepy que informa al planificador del cupo de cada respuesta. Sus llamadas
+# comparten la sesión HTTP con pool de conexiones, keep-alive y tiempos máximos (http_session)
+class TwitterClient(tweepy.Client):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session.close()
+        self.session = http_session.create_session()
+    
+    def request(self, method, route, params=None, json=None, user_auth=False):
+        endpoint = endpoint_for_route(route)
+        try:
+            response = super().request(method, route, params=params, json=json, user_auth=user_auth)
+        except TooManyRequests as e:
+            scheduler.update(endpoint, e.response.headers)
+            raise
+        scheduler.update(endpoint, response.headers)
+        return response
+
+# Cliente de Twitter: se crea en el primer uso (o en el arranque de la aplicación) para que
+# importar este módulo no necesite credenciales ni red. ``client`` se puede sustituir
+# directamente (p. ej. por el cliente sin red de los benchmarks)
 client = None
+_client_initialized = False
+_client_lock = threading.Lock()
+
+def _has_user_credentials() -> bool:
+    return bool(consumer_key and consumer_secret and access_token and access_secret)
 
-# Autenticación con Tweepy
-try:
-    # Asegurarnos de que tenemos el bearer token
-    if not bearer_token:
-        print("ERROR: No se ha encontrado el Bearer Token para la API de Twitter")
-    else:
+def get_client() -> Optional[tweepy.Client]:
+    """Cliente de Twitter, creado la primera vez que se pide; None sin credenciales."""
+    global client, _client_initialized
+    if client is not None or _client_initialized:
+        return client
+    
+    with _client_lock:
+        if client is not None or _client_initialized:
+            return client
         try:
-            # Inicializar cliente con el bearer token para la API v2
-            print("Intentando inicializar cliente de Twitter V2 con Bearer Token...")
-            client = tweepy.Client(bearer_token=bearer_token)
-            
-            # Opcional: verificar usuario propio si tenemos credenciales completas
-            if consumer_key and consumer_secret and access_token and access_secret:
-                client = tweepy.Client(
+            # Asegurarnos de que tenemos el bearer token
+            if not bearer_token:
+                logger.error("No se ha encontrado el Bearer Token para la API de Twitter")
+            elif _has_user_credentials():
+                logger.info("Inicializando cliente de Twitter V2 con credenciales completas")
+                client = TwitterClient(
                     bearer_token=bearer_token,
                     consumer_key=consumer_key, 
                     consumer_secret=consumer_secret,
                     access_token=access_token, 
                     access_token_secret=access_secret
                 )
-                try:
-                    test_response = client.get_me()
-                    if test_response and hasattr(test_response, 'data'):
-                        print(f"Cliente V2 con credenciales completas funciona correctamente. Conectado como: @{test_response.data.username}")
-                except Exception as e:
-                    print(f"Error al verificar cliente V2: {str(e)}")
-                
+            else:
+                # Inicializar cliente con el bearer token para la API v2
+                logger.info("Inicializando cliente de Twitter V2 con Bearer Token")
+                client = TwitterClient(bearer_token=bearer_token)
         except Exception as e:
-            print(f"Error al inicializar cliente de Twitter: {str(e)}")
-except Exception as e:
-    print(f"Error crítico al configurar la API de Twitter: {str(e)}")
+            logger.error("Error al inicializar cliente de Twitter: %s", e)
+        _client_initialized = True
+    return client
+
+def verify_client():
+    """Comprueba las credenciales completas con ``get_me`` (una llamada a la API).
+
+    No se hace al importar el módulo: la aplicación la lanza en segundo
+    plano al arrancar, sin retrasar el inicio del servidor.
+    """
+    current = get_client()
+    if current is None or not _has_user_credentials():
+        return
+    try:
+        with http_session.request_timeout(connect=VERIFY_TIMEOUT, read=VERIFY_TIMEOUT):
+            test_response = current.get_me()
+        if test_response and hasattr(test_response, 'data'):
+            logger.info("Cliente V2 con credenciales completas funciona correctamente. Conectado como: @%s",
+                        test_response.data.username)
+    except Exception as e:
+        logger.warning("Error al verificar cliente V2: %s", e)
+
+# Calcula la espera antes del siguiente reintento o lanza 429 si se agotaron
+def _backoff_delay(retries: int, backoff: float, error: Exception, endpoint: Optional[str]) -> float:
+    if retries == MAX_RETRIES:
+        logger.error("Error después de %d reintentos: %s", retries, error)
+        raise HTTPException(
+            status_code=429, 
+            detail=f"Twitter API rate limit exceeded. Please try again later. Retries: {retries}"
+        )
+    
+    observability.API_RETRIES.inc(endpoint=endpoint or "")
+    
+    # Si conocemos el reinicio de la ventana, el planificador espera lo justo en el siguiente intento
+    if endpoint and scheduler.retry_after(endpoint) is not None:
+        logger.warning("Rate limit hit. Reintento %d/%d al reiniciarse la ventana de %s",
+                       retries + 1, MAX_RETRIES, endpoint)
+        return 0
+    
+    # Backoff exponencial con jitter
+    sleep_time = backoff + (random.randint(0, 1000) / 1000.0)
+    logger.warning("Rate limit hit. Reintento %d/%d después de %.2fs", retries + 1, MAX_RETRIES, sleep_time)
+    return sleep_time
+
+# Llamada a la API reservando antes turno en el planificador de cupo
+def _call_with_quota(endpoint: Optional[str], func, args, kwargs):
+    observability.API_CALLS.inc(endpoint=endpoint or "")
+    if not endpoint:
+        return func(*args, **kwargs)
+    
+    scheduler.acquire(endpoint)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        scheduler.release(endpoint)
+
+async def _call_with_quota_async(endpoint: Optional[str], func, args, kwargs):
+    observability.API_CALLS.inc(endpoint=endpoint or "")
+    if endpoint:
+        await scheduler.acquire_async(endpoint)
+    try:
+        # La llamada de tweepy es bloqueante: se delega al pool de E/S, con el contexto de la
+        # tarea (p. ej. los tiempos máximos de http_session.request_timeout)
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(io_executor, functools.partial(context.run, func, *args, **kwargs))
+    finally:
+        if endpoint:
+            scheduler.release(endpoint)
 
 # Funcion Decorador para caché y reintentos
-def with_retry_and_cache(cache_key: str, cache_duration: int = CACHE_DURATION):
+def with_retry_and_cache(cache_key: str, cache_duration: int = CACHE_DURATION, endpoint: Optional[str] = None):
+    """Añade caché y reintentos con backoff a una llamada a la API de Twitter.
+
+    La función decorada se puede llamar de forma síncrona o, desde código
+    asíncrono, con ``await func.run_async(...)``: la llamada bloqueante de
+    tweepy se ejecuta en ``io_executor`` y las esperas del backoff usan
+    ``asyncio.sleep``, de modo que el event loop sigue atendiendo peticiones.
+    Las llamadas concurrentes con la misma clave comparten una única
+    petición a la API (``api_flights``), y cada intento pide turno al
+    planificador de cupo (``scheduler``) para el ``endpoint`` indicado.
+    """
     def decorator(func):
-        def wrapper(*args, **kwargs):
-            # Construir clave de caché basada en los argumentos
-            key = f"{cache_key}:{str(args)}:{str(kwargs)}"
-            
-            # Verificar caché
-            if key in cache:
-                cache_time, cache_data = cache[key]
-                if datetime.now() - cache_time < timedelta(seconds=cache_duration):
-                    print(f"Usando resultado en caché para: {key}")
-                    return cache_data
+        def fetch(key, args, kwargs, use_cache):
+            # Otra llamada pudo completar la misma petición mientras esperábamos
+            cache_data = cache.get(key) if use_cache else MISSING
+            if cache_data is not MISSING:
+                return cache_data
             
-            # Si no está en caché o ha expirado, hacer la llamada a la API
             retries = 0
             backoff = INITIAL_BACKOFF
             
             while retries <= MAX_RETRIES:
                 try:
-                    result = func(*args, **kwargs)
+                    result = _call_with_quota(endpoint, func, args, kwargs)
                     
                     # Guardar en caché
-                    cache[key] = (datetime.now(), result)
+                    if use_cache:
+                        cache.set(key, result, ttl=cache_duration)
                     return result
                     
                 except TooManyRequests as e:
-                    if retries == MAX_RETRIES:
-                        print(f"Error después de {retries} reintentos: {str(e)}")
-                        raise HTTPException(
-                            status_code=429, 
-                            detail=f"Twitter API rate limit exceeded. Please try again later. Retries: {retries}"
-                        )
+                    time.sleep(_backoff_delay(retries, backoff, e, endpoint))
+                    backoff *= 2
+                    retries += 1
                     
-                    # Backoff exponencial con jitter
-                    sleep_time = backoff + (random.randint(0, 1000) / 1000.0)
-                    print(f"Rate limit hit. Reintento {retries + 1}/{MAX_RETRIES} después de {sleep_time:.2f}s")
-                    time.sleep(sleep_time)
+                except Exception as e:
+                    logger.error("Error no recuperable: %s", e)
+                    raise
+            
+            raise HTTPException(status_code=500, detail="Maximum retries exceeded")
+        
+        async def fetch_async(key, args, kwargs, use_cache):
+            cache_data = cache.get(key) if use_cache else MISSING
+            if cache_data is not MISSING:
+                return cache_data
+            
+            retries = 0
+            backoff = INITIAL_BACKOFF
+            
+            while retries <= MAX_RETRIES:
+                try:
+                    result = await _call_with_quota_async(endpoint, func, args, kwargs)
+                    
+                    if use_cache:
+                        cache.set(key, result, ttl=cache_duration)
+                    return result
+                    
+                except TooManyRequests as e:
+                    await asyncio.sleep(_backoff_delay(retries, backoff, e, endpoint))
                     backoff *= 2
                     retries += 1
                     
                 except Exception as e:
-                    print(f"Error no recuperable: {str(e)}")
+                    logger.error("Error no recuperable: %s", e)
                     raise
             
             raise HTTPException(status_code=500, detail="Maximum retries exceeded")
         
+        @functools.wraps(func)
+        def wrapper(*args, use_cache: bool = True, **kwargs):
+            # Construir clave de caché basada en los argumentos
+            key = f"{cache_key}:{str(args)}:{str(kwargs)}"
+            
+            # Verificar caché (use_cache=False fuerza una consulta nueva a la API)
+            cache_data = cache.get(key) if use_cache else MISSING
+            if cache_data is not MISSING:
+                logger.debug("Usando resultado en caché para: %s", key)
+                return cache_data
+            
+            # Si no está en caché o ha expirado, hacer (o esperar) la llamada a la API
+            return api_flights.do(key, lambda: fetch(key, args, kwargs, use_cache))
+        
+        async def run_async(*args, use_cache: bool = True, **kwargs):
+            key = f"{cache_key}:{str(args)}:{str(kwargs)}"
+            
+            cache_data = cache.get(key) if use_cache else MISSING
+            if cache_data is not MISSING:
+                logger.debug("Usando resultado en caché para: %s", key)
+                return cache_data
+            
+            return await api_flights.do_async(key, lambda: fetch_async(key, args, kwargs, use_cache))
+        
+        wrapper.run_async = run_async
         return wrapper
     
     return decorator
 
-# Función para convertir la respuesta de tweepy a un formato serializable
-def convert_tweepy_response_to_dict(response):
-    if response is None:
-        return None
-    
-    # Función auxiliar para convertir objetos a diccionarios
-    def object_to_dict(obj):
-        if hasattr(obj, '_json'):
-            return obj._json
-        elif hasattr(obj, '__dict__'):
-            return {k: object_to_dict(v) for k, v in obj.__dict__.items() 
-                   if not k.startswith('_') and not callable(v)}
-        elif isinstance(obj, (list, tuple)):
-            return [object_to_dict(item) for item in obj]
-        elif isinstance(obj, dict):
-            return {k: object_to_dict(v) for k, v in obj.items()}
-        elif isinstance(obj, (str, int, float, bool, type(None))):
-            return obj
-        else:
-            # Para tipos que no se pueden convertir, usar su representación de cadena
-            return str(obj)
-            
-    # Crear diccionario base
-    result = {
-        "includes": {},
-        "meta": {},
-        "errors": []
-    }
-    
-    # Extraer datos principales si existen
-    if hasattr(response, 'data'):
-        if isinstance(response.data, list):
-            result["data"] = [object_to_dict(item) for item in response.data]
-        else:
-            result["data"] = object_to_dict(response.data) if response.data else {}
-    
-    # Extraer includes si existen
-    if hasattr(response, 'includes'):
-        for key, items in response.includes.items():
-            result["includes"][key] = [object_to_dict(item) for item in items]
-    
-    # Extraer meta si existe
-    if hasattr(response, 'meta') and response.meta:
-        result["meta"] = object_to_dict(response.meta)
-    
-    # Extraer errores si existen
-    if hasattr(response, 'errors') and response.errors:
-        result["errors"] = [object_to_dict(error) for error in response.errors]
-    
-    # Para respuestas simples o casos no cubiertos, intentar la conversión completa
-    if not (hasattr(response, 'data') or hasattr(response, 'includes') or hasattr(response, 'meta')):
-        try:
-            return object_to_dict(response)
-        except Exception as e:
-            return {
-                "error": "No se pudo serializar la respuesta completa",
-                "error_detail": str(e),
-                "response_str": str(response)
-            }
-        
-    return result
-
 # Función para buscar tweets
-@with_retry_and_cache("search_tweets")
-def search_tweets(query: str, max_tweets: int = 50):
-    if not client:
+@with_retry_and_cache("search_tweets", endpoint="/2/tweets/search/recent")
+def search_tweets(query: str, max_tweets: int = 50, next_token: Optional[str] = None,
+                  since_id: Optional[str] = None):
+    twitter_client = get_client()
+    if not twitter_client:
         raise HTTPException(status_code=500, detail="Cliente de Twitter no inicializado")
         
-    return client.search_recent_tweets(
+    response = twitter_client.search_recent_tweets(
         query=query, 
         max_results=max_tweets,
+        next_token=next_token,
+        since_id=since_id,
         tweet_fields=['author_id', 'context_annotations', 'created_at', 
                      'entities', 'public_metrics', 'referenced_tweets'],
         user_fields=['username', 'name', 'description', 'public_metrics'],
         expansions=['author_id', 'referenced_tweets.id', 
                    'referenced_tweets.id.author_id', 'entities.mentions.username']
     )
+    
+    # Los usuarios de includes sirven después para las consultas de perfiles por lotes
+    if response and response.includes:
+        remember_users(response.includes.get('users', []))
+    
+    # Guardar la página en el almacén local para poder repetir el análisis sin la API
+    store = get_tweet_store()
+    if store is not None:
+        try:
+            store.record(query, response)
+        except Exception as e:
+            logger.warning("Error al guardar tweets en el almacén local: %s", e)
+    
+    return response
 
-# Función para obtener tweets y construir el grafo de relaciones
-def get_tweets_and_build_graph(query: str, max_tweets: int = 50) -> nx.Graph:
-    print(f"Iniciando búsqueda y construcción de grafo para consulta: '{query}' (max_tweets: {max_tweets})")
+# Tamaño de la siguiente página o None si se agotó el presupuesto de ingesta
+def _next_page_size(ingestion: Dict[str, Any], max_tweets: int, max_pages: int,
+                    time_limit: Optional[float], start: float) -> Optional[int]:
+    remaining = max_tweets - ingestion["tweets"]
+    if remaining <= 0:
+        ingestion["stop_reason"] = "max_tweets"
+        return None
+    if ingestion["pages"] >= max_pages:
+        ingestion["stop_reason"] = "max_pages"
+        return None
+    if time_limit is not None and ingestion["pages"] > 0 and time.monotonic() - start >= time_limit:
+        ingestion["stop_reason"] = "time_limit"
+        return None
+
+    page_size = min(PAGE_SIZE, remaining)
+    if ingestion["pages"] > 0:
+        page_size = max(MIN_PAGE_SIZE, page_size)
+    return page_size
+
+# Registra una página recibida y devuelve el next_token para la siguiente
+def _record_page(ingestion: Dict[str, Any], response) -> Optional[str]:
+    ingestion["pages"] += 1
+    if response and hasattr(response, 'data') and response.data:
+        ingestion["tweets"] += len(response.data)
+
+    meta = getattr(response, 'meta', None) or {}
+    # Los resultados llegan del más reciente al más antiguo: el primero marca el newest_id
+    if ingestion.get("newest_id") is None:
+        ingestion["newest_id"] = meta.get('newest_id')
+    ingestion["next_token"] = meta.get('next_token')
+    if not ingestion["next_token"]:
+        ingestion["stop_reason"] = "exhausted"
+    return ingestion["next_token"]
+
+# Tamaño y next_token de cada página de una ingesta. Quien itera registra cada respuesta
+# con _record_page antes de pedir la siguiente, de la que se toma el next_token
+def _page_requests(ingestion: Dict[str, Any], max_tweets: int, max_pages: int,
+                   time_limit: Optional[float], next_token: Optional[str] = None):
+    ingestion.update({"pages": 0, "tweets": 0, "next_token": None, "newest_id": None, "stop_reason": None})
+
+    start = time.monotonic()
+
+    while True:
+        page_size = _next_page_size(ingestion, max_tweets, max_pages, time_limit, start)
+        if page_size is None:
+            return
+
+        yield page_size, next_token
+
+        next_token = ingestion["next_token"]
+        if not next_token:
+            return
+
+# Generador que recorre las páginas de resultados siguiendo el next_token
+def iter_search_pages(query: str, max_tweets: int, max_pages: int = MAX_PAGES,
+                      time_limit: Optional[float] = PAGINATION_TIME_LIMIT,
+                      ingestion: Optional[Dict[str, Any]] = None, since_id: Optional[str] = None,
+                      next_token: Optional[str] = None):
+    """Devuelve una a una las páginas de search_tweets hasta agotar el presupuesto.
+
+    El diccionario ``ingestion`` (si se pasa) se actualiza con el número de
+    páginas y tweets leídos, el último ``next_token``, el id del tweet más
+    reciente y el motivo de parada. Con ``since_id`` solo se piden tweets
+    posteriores a ese id; con ``next_token`` se continúa una paginación
+    anterior en lugar de empezar por la primera página.
+    """
+    if ingestion is None:
+        ingestion = {}
+
+    for page_size, token in _page_requests(ingestion, max_tweets, max_pages, time_limit, next_token):
+        # Las consultas con since_id son sondeos de novedades: siempre van a la API
+        response = search_tweets(query, page_size, token, since_id, use_cache=since_id is None)
+        _record_page(ingestion, response)
+        yield response
+
+# Versión asíncrona de iter_search_pages: las páginas se piden sin bloquear el event loop
+async def iter_search_pages_async(query: str, max_tweets: int, max_pages: int = MAX_PAGES,
+                                  time_limit: Optional[float] = PAGINATION_TIME_LIMIT,
+                                  ingestion: Optional[Dict[str, Any]] = None, since_id: Optional[str] = None,
+                                  next_token: Optional[str] = None):
+    if ingestion is None:
+        ingestion = {}
+
+    for page_size, token in _page_requests(ingestion, max_tweets, max_pages, time_limit, next_token):
+        response = await search_tweets.run_async(query, page_size, token, since_id,
+                                                 use_cache=since_id is None)
+        _record_page(ingestion, response)
+        yield response
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+# Generador de páginas leídas del almacén local (sin llamadas a la API)
+def iter_stored_pages(query: str, max_tweets: int, max_pages: int = MAX_PAGES,
+                      ingestion: Optional[Dict[str, Any]] = None, since: Optional[datetime] = None,
+                      until: Optional[datetime] = None):
+    """Igual que iter_search_pages pero con los tweets guardados para ``query``.
+
+    ``since`` y ``until`` limitan la fecha de creación de los tweets.
+    """
+    if ingestion is None:
+        ingestion = {}
+
+    store = get_tweet_store()
+    if store is None:
+        raise HTTPException(status_code=400, detail="El almacén local de tweets está desactivado")
+
+    for page_size, token in _page_requests(ingestion, max_tweets, max_pages, None):
+        response = store.load_page(query, page_size, int(token) if token else None,
+                                   _timestamp(since), _timestamp(until))
+        _record_page(ingestion, response)
+        yield response
+
+# Versión asíncrona de iter_stored_pages: las lecturas de SQLite van al pool de hilos de E/S
+async def iter_stored_pages_async(query: str, max_tweets: int, max_pages: int = MAX_PAGES,
+                                  ingestion: Optional[Dict[str, Any]] = None, since: Optional[datetime] = None,
+                                  until: Optional[datetime] = None):
+    pages = iter_stored_pages(query, max_tweets, max_pages, ingestion, since, until)
+    loop = asyncio.get_running_loop()
+    while True:
+        response = await loop.run_in_executor(io_executor, next, pages, None)
+        if response is None:
+            return
+        yield response
+
+# Comprueba el origen de los tweets pedido
+def _ingestion_source(source: str) -> str:
+    if source not in INGESTION_SOURCES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Origen desconocido: {source}. Opciones: {', '.join(INGESTION_SOURCES)}"
+        )
+    if source == "store" and get_tweet_store() is None:
+        raise HTTPException(status_code=400, detail="El almacén local de tweets está desactivado")
+    return source
+
+# Hasta 100 tweets basta una página (límite de API v2); por encima se pagina
+def _ingestion_limits(max_tweets: int, max_pages: Optional[int],
+                      time_limit: Optional[float]) -> Tuple[int, float]:
+    if max_pages is None:
+        max_pages = MAX_PAGES if max_tweets > PAGE_SIZE else 1
+    if time_limit is None:
+        time_limit = PAGINATION_TIME_LIMIT
+    return max_pages, time_limit
+
+# Incorpora una página al grafo; devuelve True si se alcanzó el tamaño máximo
+def _add_page_to_graph(G: nx.Graph, response, ingestion: Dict[str, Any],
+                       max_nodes: Optional[int], index: 'GraphIndex',
+                       timings: Optional[Dict[str, float]] = None) -> bool:
+    if response and hasattr(response, 'data') and response.data:
+        with stage_timer("build", timings):
+            process_tweets(response, G, index)
+    
+    # Guardar la respuesta original (primera página); se serializa solo si se pide
+    if 'raw_response' not in G.graph:
+        G.graph['raw_response'] = RawResponse(response)
     
-    # Crear un grafo vacío
-    G = nx.Graph()
+    # Detener la ingesta si el grafo alcanza el tamaño máximo pedido
+    if max_nodes is not None and G.number_of_nodes() >= max_nodes:
+        ingestion["stop_reason"] = "max_nodes"
+        return True
+    return False
+
+# Registra las etapas de la ingesta: "build" es el tiempo en process_tweets y "fetch" el resto
+def _observe_ingestion(start: float, timings: Dict[str, float]):
+    build = timings.get("build", 0.0)
+    observe_stages({"fetch": max(0.0, time.perf_counter() - start - build), "build": build})
+
+def _log_ingestion(ingestion: Dict[str, Any]):
+    if ingestion.get("pages", 0) > 1:
+        logger.info("Ingesta paginada: %d páginas, %d tweets (motivo de parada: %s)",
+                    ingestion['pages'], ingestion['tweets'], ingestion['stop_reason'])
+
+# Función para obtener tweets y construir el grafo de relaciones
+def get_tweets_and_build_graph(query: str, max_tweets: int = 50, max_pages: Optional[int] = None,
+                               time_limit: Optional[float] = None, max_nodes: Optional[int] = None,
+                               source: str = "api", since: Optional[datetime] = None,
+                               until: Optional[datetime] = None) -> nx.Graph:
+    """Descarga los tweets de ``query`` y construye el grafo de interacciones.
+
+    Con ``source="store"`` los tweets se leen del almacén local (sin
+    llamadas a la API), opcionalmente limitados a la ventana ``since`` -
+    ``until`` de fecha de creación.
+    """
+    logger.info("Iniciando búsqueda y construcción de grafo para consulta: '%s' (max_tweets: %d, origen: %s)",
+                query, max_tweets, source)
     
-    # Si se solicitan demasiados tweets, limitar para prevenir errores
-    if max_tweets > 100:  # API v2 permite máximo 100 por solicitud
-        print(f"Limitando solicitud de {max_tweets} a 100 tweets (límite de API v2)")
-        max_tweets = 100
+    # Crear un grafo dirigido vacío (autor -> usuario con el que interactúa)
+    G = nx.DiGraph()
+    max_pages, time_limit = _ingestion_limits(max_tweets, max_pages, time_limit)
     
+    ingestion = {"source": source}
+    index = GraphIndex()
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
     try:
-        # Usar la función con caché y reintentos
-        response = search_tweets(query, max_tweets)
-        
-        # Procesar los resultados para construir el grafo
-        if response and hasattr(response, 'data') and response.data:
-            process_tweets(response, G)
+        if source == "store":
+            pages = iter_stored_pages(query, max_tweets, max_pages, ingestion, since, until)
+        else:
+            pages = iter_search_pages(query, max_tweets, max_pages, time_limit, ingestion)
         
-        # Agregar la respuesta original a los atributos del grafo
-        G.graph['raw_response'] = convert_tweepy_response_to_dict(response)
+        # Procesar cada página en cuanto llega; solo se conserva la primera respuesta
+        for response in pages:
+            if _add_page_to_graph(G, response, ingestion, max_nodes, index, timings):
+                break
+        _observe_ingestion(start, timings)
+        _log_ingestion(ingestion)
         
     except HTTPException as e:
         # Propagar errores HTTP
         raise e
     except Exception as e:
-        print(f"Error al buscar tweets o construir grafo: {str(e)}")
+        logger.error("Error al buscar tweets o construir grafo: %s", e)
         G.graph['error'] = str(e)
+    
+    G.graph['ingestion'] = ingestion
+        
+    return G
+
+# Versión asíncrona de get_tweets_and_build_graph para los endpoints de FastAPI
+async def get_tweets_and_build_graph_async(query: str, max_tweets: int = 50, max_pages: Optional[int] = None,
+                                           time_limit: Optional[float] = None, max_nodes: Optional[int] = None,
+                                           source: str = "api", since: Optional[datetime] = None,
+                                           until: Optional[datetime] = None) -> nx.Graph:
+    logger.info("Iniciando búsqueda y construcción de grafo para consulta: '%s' (max_tweets: %d, origen: %s)",
+                query, max_tweets, source)
+    
+    G = nx.DiGraph()
+    max_pages, time_limit = _ingestion_limits(max_tweets, max_pages, time_limit)
+    
+    ingestion = {"source": source}
+    index = GraphIndex()
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    try:
+        if source == "store":
+            pages = iter_stored_pages_async(query, max_tweets, max_pages, ingestion, since, until)
+        else:
+            pages = iter_search_pages_async(query, max_tweets, max_pages, time_limit, ingestion)
         
+        async for response in pages:
+            if _add_page_to_graph(G, response, ingestion, max_nodes, index, timings):
+                break
+        _observe_ingestion(start, timings)
+        _log_ingestion(ingestion)
+        
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error("Error al buscar tweets o construir grafo: %s", e)
+        G.graph['error'] = str(e)
+    
+    G.graph['ingestion'] = ingestion
+    
     return G
 
-def process_tweets(response, G):
+# Tipos de tweet referenciado y su relación en el grafo
+REFERENCE_EDGE_TYPES = {
+    'retweeted': 'retweet',
+    'quoted': 'quote',
+    'replied_to': 'reply'
+}
+
+class GraphIndex:
+    """Índices para construir el grafo sin búsquedas lineales.
+
+    Se comparte entre las páginas de una misma ingesta, de modo que las
+    menciones y los tweets referenciados se resuelven también cuando el
+    usuario o el tweet original llegaron en una página anterior.
+    """
+
+    def __init__(self):
+        self.users: Dict[Any, Tuple[str, str]] = {}  # id -> (username, name)
+        self.user_ids: Dict[str, Any] = {}  # username -> id
+        self.tweet_authors: Dict[Any, Any] = {}  # id de tweet -> id del autor
+
+    def add_users(self, users):
+        for user in users:
+            if user.id not in self.users:
+                self.users[user.id] = (user.username, user.name)
+            self.user_ids.setdefault(user.username, user.id)
+
+    def add_tweets(self, tweets):
+        for tweet in tweets:
+            self.tweet_authors[tweet.id] = tweet.author_id
+
+def process_tweets(response, G, index: Optional[GraphIndex] = None, interactions: Optional[set] = None,
+                   index_response: bool = True) -> set:
+    """Añade los tweets de una respuesta al grafo G.
+
+    Devuelve el conjunto de nodos nuevos o con interacciones nuevas, lo que
+    permite actualizar de forma incremental los análisis que dependen de G.
+    Si se pasa ``interactions``, se le añaden los pares (origen, destino) de
+    las aristas a las que contribuye esta respuesta. Con
+    ``index_response=False`` los usuarios y tweets de la respuesta no se
+    añaden a ``index``, que ya debe contenerlos.
+    """
     # Verificar que tenemos datos y usuarios
-    if not response.data or not response.includes.get('users'):
-        return
+    if not response.data or (index_response and not response.includes.get('users')):
+        return set()
+    
+    # Índices username -> id y tweet -> autor (O(1) por mención o referencia)
+    if index is None:
+        index = GraphIndex()
+    if index_response:
+        index.add_users(response.includes.get('users', []))
+        index.add_tweets(response.data)
+        # Los tweets referenciados que no están en la página llegan en includes
+        index.add_tweets(response.includes.get('tweets', []))
+    users = index.users
     
-    # Crear un diccionario para mapear IDs de usuarios a sus nombres
-    users_dict = {user.id: {'username': user.username, 'name': user.name} 
-                 for user in response.includes.get('users', [])}
+    # Acumular nodos e interacciones para insertarlos en bloque al final
+    new_nodes = {}
+    edge_counts = {}  # (origen, destino) -> {tipo: número de interacciones}
     
-    # Mapear tweets por ID para referencia rápida
-    tweets_dict = {tweet.id: tweet for tweet in response.data}
+    def add_interaction(source, target, edge_type):
+        counts = edge_counts.setdefault((source, target), {})
+        counts[edge_type] = counts.get(edge_type, 0) + 1
+    
+    def add_user_node(user_id, name=None):
+        if user_id not in new_nodes and not G.has_node(user_id):
+            username, full_name = users[user_id]
+            new_nodes[user_id] = {'name': name or username, 'full_name': full_name}
     
     # Procesar cada tweet
     for tweet in response.data:
         author_id = tweet.author_id
         
         # Añadir el autor al grafo si no existe
-        if not G.has_node(author_id) and author_id in users_dict:
-            G.add_node(author_id, 
-                      name=users_dict[author_id]['username'],
-                      full_name=users_dict[author_id]['name'])
+        if author_id in users:
+            add_user_node(author_id)
         
         # Procesar retweets y citas
-        if hasattr(tweet, 'referenced_tweets') and tweet.referenced_tweets:
-            for ref_tweet in tweet.referenced_tweets:
-                # Obtener el tweet referenciado
-                if ref_tweet.id in tweets_dict:
-                    ref_tweet_data = tweets_dict[ref_tweet.id]
-                    ref_author_id = ref_tweet_data.author_id
-                    
-                    # Añadir el autor del tweet referenciado al grafo
-                    if ref_author_id in users_dict and not G.has_node(ref_author_id):
-                        G.add_node(ref_author_id, 
-                                  name=users_dict[ref_author_id]['username'],
-                                  full_name=users_dict[ref_author_id]['name'])
-                    
-                    # Añadir la relación según el tipo
-                    if ref_author_id in users_dict:
-                        if ref_tweet.type == 'retweeted':
-                            G.add_edge(author_id, ref_author_id, type='retweet')
-                        elif ref_tweet.type == 'quoted':
-                            G.add_edge(author_id, ref_author_id, type='quote')
-                        elif ref_tweet.type == 'replied_to':
-                            G.add_edge(author_id, ref_author_id, type='reply')
+        for ref_tweet in tweet.referenced_tweets or []:
+            ref_author_id = index.tweet_authors.get(ref_tweet.id)
+            edge_type = REFERENCE_EDGE_TYPES.get(ref_tweet.type)
+            
+            # Añadir la relación según el tipo si conocemos al autor del tweet referenciado
+            if ref_author_id in users:
+                add_user_node(ref_author_id)
+                if edge_type:
+                    add_interaction(author_id, ref_author_id, edge_type)
         
         # Procesar menciones
-        if hasattr(tweet, 'entities') and 'mentions' in tweet.entities:
-            for mention in tweet.entities['mentions']:
-                mentioned_username = mention.get('username')
-                mentioned_id = None
-                
-                # Buscar el ID correspondiente a este username
-                for user_id, user_data in users_dict.items():
-                    if user_data['username'] == mentioned_username:
-                        mentioned_id = user_id
-                        break
-                
-                if mentioned_id and mentioned_id != author_id:  # Evitar auto-menciones
-                    # Añadir el usuario mencionado al grafo si no existe
-                    if not G.has_node(mentioned_id):
-                        G.add_node(mentioned_id, 
-                                  name=mentioned_username,
-                                  full_name=users_dict.get(mentioned_id, {}).get('name', mentioned_username))
-                    
-                    # Añadir la relación de mención
-                    G.add_edge(author_id, mentioned_id, type='mention')
+        entities = tweet.entities or {}
+        for mention in entities.get('mentions', []):
+            mentioned_username = mention.get('username')
+            mentioned_id = index.user_ids.get(mentioned_username)
+            
+            if mentioned_id and mentioned_id != author_id:  # Evitar auto-menciones
+                add_user_node(mentioned_id, name=mentioned_username)
+                add_interaction(author_id, mentioned_id, 'mention')
+    
+    G.add_nodes_from(new_nodes.items())
+    
+    # Una arista dirigida por par con el recuento de cada tipo de interacción
+    new_edges = []
+    for (source, target), counts in edge_counts.items():
+        if G.has_edge(source, target):
+            data = G[source][target]
+            for edge_type, count in counts.items():
+                data['counts'][edge_type] = data['counts'].get(edge_type, 0) + count
+            data['weight'] = sum(data['counts'].values())
+            data['type'] = dominant_edge_type(data['counts'])
+        else:
+            new_edges.append((source, target, {
+                'weight': sum(counts.values()),
+                'counts': counts,
+                'type': dominant_edge_type(counts)
+            }))
+    G.add_edges_from(new_edges)
+    
+    if interactions is not None:
+        interactions.update(edge_counts)
+    
+    touched = set(new_nodes)
+    for source, target in edge_counts:
+        touched.add(source)
+        touched.add(target)
+    return touched
+
+# Tipo de interacción más frecuente de una arista (en empate, el primero registrado)
+def dominant_edge_type(counts: Dict[str, int]) -> str:
+    return max(counts, key=counts.get)
+
+# Proyección no dirigida del grafo de interacciones, sumando los pesos de ambos sentidos
+def to_weighted_undirected(G: nx.Graph) -> nx.Graph:
+    if not G.is_directed():
+        return G
+    
+    U = nx.Graph()
+    U.add_nodes_from(G.nodes(data=True))
+    for u, v, data in G.edges(data=True):
+        weight = data.get('weight', 1)
+        if U.has_edge(u, v):
+            U[u][v]['weight'] += weight
+        else:
+            U.add_edge(u, v, weight=weight)
+    return U
+
+# Grupos de métricas que se pueden pedir por separado (por defecto se calculan todos)
+METRIC_GROUPS = ("influential_nodes", "edge_types", "connected_components")
+
+# Métricas ya calculadas de cada grafo (clave débil: desaparecen con el grafo). Una entrada se
+# descarta si cambia el número de nodos o aristas; quien modifique un grafo in situ debe llamar a
+# clear_metrics_cache. Las vistas de subgrafo son objetos distintos y tienen su propia entrada
+_metrics_memo: "weakref.WeakKeyDictionary[nx.Graph, Dict[Any, Any]]" = weakref.WeakKeyDictionary()
+_metrics_memo_lock = threading.Lock()
+
+def _memo_entry(G: nx.Graph) -> Dict[Any, Any]:
+    signature = (G.number_of_nodes(), G.number_of_edges())
+    with _metrics_memo_lock:
+        memo = _metrics_memo.get(G)
+        if memo is None or memo["signature"] != signature:
+            memo = _metrics_memo[G] = {"signature": signature}
+        return memo
+
+def _memoized(G: nx.Graph, key: Any, compute) -> Any:
+    memo = _memo_entry(G)
+    value = memo.get(key, MISSING)
+    if value is MISSING:
+        value = memo[key] = compute()
+    return value
+
+def clear_metrics_cache(G: nx.Graph):
+    with _metrics_memo_lock:
+        _metrics_memo.pop(G, None)
+
+def _metric_groups(metrics: Optional[List[str]]) -> Optional[List[str]]:
+    if metrics is None:
+        return None
+    unknown = [group for group in metrics if group not in METRIC_GROUPS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Métricas desconocidas: {', '.join(unknown)}. Opciones: {', '.join(METRIC_GROUPS)}"
+        )
+    return [group for group in METRIC_GROUPS if group in metrics]
+
+def _edge_type_counts(G: nx.Graph) -> Dict[str, int]:
+    edge_types = {}
+    for _, _, attr in G.edges(data=True):
+        for edge_type, count in attr.get("counts", {attr.get("type", "unknown"): 1}).items():
+            edge_types[edge_type] = edge_types.get(edge_type, 0) + count
+    return edge_types
 
 # Función para obtener métricas del grafo
-def get_network_metrics(G: nx.Graph) -> Dict[str, Any]:
+def get_network_metrics(G: nx.Graph, influence: Optional[List[str]] = None, accuracy: str = "balanced",
+                        influence_budget: Optional[float] = None,
+                        include: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Métricas del grafo: tamaño, nodos influyentes, tipos de interacción y componentes.
+
+    ``include`` limita el cálculo a algunos de ``METRIC_GROUPS`` (None =
+    todos); ``influence`` añade métricas de influencia, que necesitan los
+    nodos influyentes. Cada grupo se memoriza por grafo, de modo que pedir
+    otra combinación sobre el mismo grafo solo calcula lo que falta. El
+    núcleo compacto y la proyección no dirigida se construyen solo si
+    algún grupo pendiente los necesita.
+    """
     metrics = {}
     
     if len(G.nodes()) == 0:
         return {"error": "Grafo vacío"}
     
+    include = METRIC_GROUPS if include is None else include
+    
     # Métricas básicas
     metrics["num_nodes"] = len(G.nodes())
     metrics["num_edges"] = len(G.edges())
     
-    # Nodos más influyentes (por grado)
-    degree_centrality = nx.degree_centrality(G)
-    top_influential = sorted(degree_centrality.items(), key=lambda x: x[1], reverse=True)[:10]
-    metrics["influential_nodes"] = [
-        {"id": node_id, "name": G.nodes[node_id]["name"], "centrality": round(centrality, 4)}
-        for node_id, centrality in top_influential
-    ]
+    # Resumen de la ingesta paginada si existe
+    if 'ingestion' in G.graph:
+        metrics["ingestion"] = G.graph['ingestion']
     
-    # Tipos de conexiones
-    edge_types = {}
-    for _, _, attr in G.edges(data=True):
-        edge_type = attr.get("type", "unknown")
-        edge_types[edge_type] = edge_types.get(edge_type, 0) + 1
-    metrics["edge_types"] = edge_types
+    # Con grafos grandes las métricas se vectorizan sobre el núcleo compacto (CSR)
+    compact = use_compact_engine(G)
+    structures = {}
+    
+    def core():
+        if "core" not in structures:
+            from app.services import graph_core
+            structures["core"] = graph_core.CompactGraph.from_networkx(G)
+        return structures["core"]
+    
+    def undirected():
+        if "undirected" not in structures:
+            structures["undirected"] = to_weighted_undirected(G)
+        return structures["undirected"]
+    
+    def top_by_strength():
+        if compact:
+            return core().top_by_strength(10)
+        U = undirected()
+        strength = dict(U.degree(weight="weight"))
+        degree = dict(U.degree())
+        return [
+            (node_id, weighted_degree, degree[node_id])
+            for node_id, weighted_degree in sorted(strength.items(), key=lambda x: x[1], reverse=True)[:10]
+        ]
+    
+    # Nodos más influyentes (por grado ponderado con el número de interacciones). "centrality"
+    # sigue siendo la centralidad de grado, en [0, 1]; "weighted_centrality" puede pasar de 1
+    if "influential_nodes" in include or influence:
+        scale = 1.0 / (len(G) - 1) if len(G) > 1 else 1.0
+        top_influential = _memoized(G, "influential_nodes", top_by_strength)
+        metrics["influential_nodes"] = [
+            {
+                "id": node_id,
+                "name": G.nodes[node_id].get("name", ""),
+                "centrality": round(node_degree * scale, 4),
+                "weighted_centrality": round(weighted_degree * scale, 4),
+                "weighted_degree": weighted_degree,
+                "degree": node_degree
+            }
+            for node_id, weighted_degree, node_degree in top_influential
+        ]
+    
+    # Tipos de conexiones (número de interacciones de cada tipo)
+    if "edge_types" in include:
+        edge_types = dict(_memoized(
+            G, "edge_types", lambda: core().edge_type_histogram() if compact else _edge_type_counts(G)
+        ))
+        metrics["edge_types"] = edge_types
+        metrics["num_interactions"] = sum(edge_types.values())
+    if "influential_nodes" in metrics:
+        metrics["centrality_methods"] = {
+            "centrality": {"method": "degree", "accuracy": "exact"},
+            "weighted_centrality": {"method": "weighted_degree", "accuracy": "exact"}
+        }
+    
+    # Métricas de influencia adicionales (PageRank, intermediación, cercanía, vector propio)
+    if influence:
+        # Solo se memorizan las estimaciones que convergieron: esas no dependen del tiempo disponible
+        memo = _memo_entry(G)
+        results = {method: memo[("influence", method, accuracy)]
+                   for method in influence if ("influence", method, accuracy) in memo}
+        missing = [method for method in influence if method not in results]
+        if missing:
+            computed = influence_metrics.compute_influence(G, undirected(), missing, accuracy=accuracy,
+                                                           time_budget=influence_budget)
+            for method, result in computed.items():
+                if result.get("converged", True):
+                    memo[("influence", method, accuracy)] = result
+            results.update(computed)
+        rankings = {}
+        for method in influence:
+            if method not in results:
+                continue
+            result = dict(results[method])
+            scores = result.pop("scores")
+            for node in metrics["influential_nodes"]:
+                node[method] = round(scores.get(node["id"], 0.0), 6)
+            top = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:10]
+            rankings[method] = [
+                {"id": node_id, "name": G.nodes[node_id].get("name", ""), "score": round(score, 6)}
+                for node_id, score in top
+            ]
+            metrics["centrality_methods"][method] = result
+        metrics["influence_rankings"] = rankings
     
     # Otros análisis si el grafo es suficientemente grande
-    if len(G.nodes()) > 2:
+    if "connected_components" in include and len(G.nodes()) > 2:
+        def components():
+            # Componentes conectados (débilmente, si el grafo es dirigido)
+            result = core().connected_components() if compact else None
+            if result is None:
+                connected_components = list(nx.connected_components(undirected()))
+                result = (len(connected_components), len(max(connected_components, key=len)))
+            return result
+        
         try:
-            # Componentes conectados
-            connected_components = list(nx.connected_components(G))
-            metrics["connected_components"] = len(connected_components)
-            metrics["largest_component_size"] = len(max(connected_components, key=len))
+            metrics["connected_components"], metrics["largest_component_size"] = _memoized(
+                G, "connected_components", components
+            )
         except Exception as e:
             metrics["error_connected_components"] = str(e)
     
     return metrics
 
+# Decide si las métricas se calculan sobre el núcleo compacto de NumPy. El núcleo (y con él
+# NumPy y SciPy) solo se importa la primera vez que un grafo lo necesita
+def use_compact_engine(G: nx.Graph) -> bool:
+    if GRAPH_ENGINE == "networkx" or not G.is_directed():
+        return False
+    if GRAPH_ENGINE != "compact" and G.number_of_edges() < COMPACT_GRAPH_MIN_EDGES:
+        return False
+    from app.services import graph_core
+    return graph_core.is_available()
+
 # Función para obtener las comunidades en el grafo
-def detect_communities(G: nx.Graph) -> List[List[int]]:
+def detect_communities(G: nx.Graph, resolution: float = LOUVAIN_RESOLUTION,
+                       random_state: Optional[int] = LOUVAIN_RANDOM_STATE) -> List[List[int]]:
     if len(G.nodes()) == 0:
         return []
         
@@ -345,9 +1027,10 @@ def detect_communities(G: nx.Graph) -> List[List[int]]:
         if len(G.nodes()) < 3:
             return [list(G.nodes())]
             
-        # Para grafos más grandes, usamos el algoritmo de Louvain
+        # Para grafos más grandes, usamos el algoritmo de Louvain sobre los pesos de interacción
         import community as community_louvain
-        partition = community_louvain.best_partition(G)
+        partition = community_louvain.best_partition(to_weighted_undirected(G), weight='weight',
+                                                     resolution=resolution, random_state=random_state)
         
         # Reorganizar las comunidades
         communities = {}
@@ -361,24 +1044,229 @@ def detect_communities(G: nx.Graph) -> List[List[int]]:
         # Si no está disponible community, usar nx.community
         try:
             # Usamos componentes conectados como una alternativa básica
-            return list(nx.connected_components(G))
+            return list(nx.connected_components(to_weighted_undirected(G)))
         except Exception:
             # Último recurso: cada nodo es su propia comunidad
             return [[node] for node in G.nodes()]
 
-@with_retry_and_cache("get_user")
+# Índice nodo -> posición de su comunidad en la lista de comunidades
+def community_index(communities: List[List[int]]) -> Dict[Any, int]:
+    node_to_community = {}
+    for i, community in enumerate(communities):
+        for node in community:
+            node_to_community[node] = i
+    return node_to_community
+
+# Generadores de nodos y aristas serializados, para construir listas o emitirlos por partes
+def iter_node_elements(G: nx.Graph, node_to_community: Dict[Any, int]) -> Iterator[Dict[str, Any]]:
+    for node, node_data in G.nodes(data=True):
+        yield {
+            "id": node,
+            "name": node_data.get("name", ""),
+            "full_name": node_data.get("full_name", ""),
+            "community": node_to_community.get(node, -1)  # -1 significa sin comunidad
+        }
+
+def iter_edge_elements(G: nx.Graph) -> Iterator[Dict[str, Any]]:
+    for u, v, data in G.edges(data=True):
+        yield {
+            "source": u,
+            "target": v,
+            "type": data["type"],
+            "weight": data.get("weight", 1),
+            "counts": data.get("counts", {data["type"]: 1})
+        }
+
+# Función para serializar nodos y aristas del grafo con su comunidad
+def graph_to_elements(G: nx.Graph, communities: List[List[int]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    nodes = list(iter_node_elements(G, community_index(communities)))
+    edges = list(iter_edge_elements(G))
+    return nodes, edges
+
+# Parámetros de los algoritmos del análisis, validados y normalizados
+def _analysis_options(resolution: float, influence: Optional[List[str]], accuracy: str,
+                      influence_budget: Optional[float], metrics: Optional[List[str]] = None) -> Dict[str, Any]:
+    influence = sorted(set(influence or []))
+    unknown = [method for method in influence if method not in influence_metrics.METHODS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Métricas de influencia desconocidas: {', '.join(unknown)}. "
+                   f"Opciones: {', '.join(influence_metrics.METHODS)}"
+        )
+    if accuracy not in influence_metrics.ACCURACY_LEVELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Precisión desconocida: {accuracy}. Opciones: {', '.join(influence_metrics.ACCURACY_LEVELS)}"
+        )
+    
+    return {
+        "resolution": resolution,
+        "influence": influence,
+        "accuracy": accuracy,
+        "influence_budget": influence_budget,
+        "metrics": _metric_groups(metrics)
+    }
+
+# Clave de caché del análisis: consulta, límites de ingesta y parámetros del algoritmo
+def _analysis_key(query: str, max_tweets: int, max_pages: Optional[int], time_limit: Optional[float],
+                  max_nodes: Optional[int], options: Dict[str, Any], source: str = "api",
+                  since: Optional[datetime] = None, until: Optional[datetime] = None) -> str:
+    return (f"analysis:{query}:{max_tweets}:{max_pages}:{time_limit}:{max_nodes}:"
+            f"{options['resolution']}:{LOUVAIN_RANDOM_STATE}:{','.join(options['influence'])}:"
+            f"{options['accuracy']}:{options['influence_budget']}:{_metrics_key(options)}:{source}:"
+            f"{_timestamp(since)}:{_timestamp(until)}")
+
+def _metrics_key(options: Dict[str, Any]) -> str:
+    metrics = options.get("metrics")
+    return "all" if metrics is None else ",".join(metrics)
+
+# Detecta comunidades y calcula métricas de un grafo ya construido. Entre etapas se
+# comprueba el tiempo máximo del análisis; se ejecuta en el pool de procesos si el grafo es grande.
+# La duración de cada etapa se anota en ``timings`` (si se pasa) para registrarla en el proceso principal
+def analyze_graph(G: nx.Graph, options: Dict[str, Any], deadline: Optional[float] = None,
+                  timings: Optional[Dict[str, float]] = None) -> Tuple[List[List[int]], Dict[str, Any]]:
+    if timings is None:
+        timings = {}
+    
+    check_deadline(deadline, "detección de comunidades")
+    with stage_timer("communities", timings):
+        communities = detect_communities(G, resolution=options["resolution"])
+    
+    check_deadline(deadline, "métricas de red")
+    influence_budget = options["influence_budget"]
+    if options["influence"] and deadline is not None:
+        # Las métricas de influencia se reparten el tiempo que queda
+        remaining = max(0.0, deadline - time.time()) / len(options["influence"])
+        influence_budget = min(INFLUENCE_TIME_BUDGET if influence_budget is None else influence_budget, remaining)
+    with stage_timer("metrics", timings):
+        metrics = get_network_metrics(G, influence=options["influence"], accuracy=options["accuracy"],
+                                      influence_budget=influence_budget, include=options.get("metrics"))
+    
+    return communities, metrics
+
+# Guarda en caché el análisis terminado junto con el grafo. Los nodos y aristas no se
+# serializan aquí: la respuesta JSON los construye con graph_to_elements y NDJSON/msgpack
+# los generan directamente desde el grafo
+def _finish_analysis(key: str, graph: nx.Graph, communities: List[List[int]],
+                     metrics: Dict[str, Any]) -> Dict[str, Any]:
+    observe_graph(graph)
+    
+    result = {
+        "graph": graph,
+        "communities": communities,
+        "metrics": metrics,
+        "raw_response": graph.graph.get('raw_response')
+    }
+    
+    # No guardar análisis incompletos por errores al construir el grafo
+    if 'error' not in graph.graph:
+        analysis_cache.set(key, result, ttl=ANALYSIS_CACHE_DURATION)
+    
+    return result
+
+# Respuesta original de un análisis: completa, reducida a los campos de raw_fields u omitida
+def analysis_raw_response(analysis: Dict[str, Any], include_raw: bool = True,
+                          raw_fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    raw = analysis.get("raw_response")
+    if not include_raw or raw is None:
+        return None
+    return raw.to_dict(raw_fields)
+
+# Valida los parámetros de un análisis y devuelve su clave de caché, las opciones de los
+# algoritmos y los argumentos de la construcción del grafo
+def _prepare_analysis(query: str, max_tweets: int, max_pages: Optional[int], time_limit: Optional[float],
+                      max_nodes: Optional[int], resolution: float, influence: Optional[List[str]],
+                      accuracy: str, influence_budget: Optional[float], source: str,
+                      since: Optional[datetime], until: Optional[datetime],
+                      metrics: Optional[List[str]]) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+    options = _analysis_options(resolution, influence, accuracy, influence_budget, metrics)
+    source = _ingestion_source(source)
+    key = _analysis_key(query, max_tweets, max_pages, time_limit, max_nodes, options, source, since, until)
+    build = {"max_pages": max_pages, "time_limit": time_limit, "max_nodes": max_nodes,
+             "source": source, "since": since, "until": until}
+    return key, options, build
+
+def _cached_analysis(key: str, log: bool = True) -> Any:
+    cached = analysis_cache.get(key)
+    if cached is not MISSING and log:
+        logger.debug("Usando análisis en caché para: %s", key)
+    return cached
+
+# Función que ejecuta el análisis completo de una consulta, cacheando el resultado final
+def analyze_query(query: str, max_tweets: int = 50, max_pages: Optional[int] = None,
+                  time_limit: Optional[float] = None, max_nodes: Optional[int] = None,
+                  resolution: float = LOUVAIN_RESOLUTION, influence: Optional[List[str]] = None,
+                  accuracy: str = "balanced", influence_budget: Optional[float] = None,
+                  source: str = "api", since: Optional[datetime] = None,
+                  until: Optional[datetime] = None, metrics: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Construye el grafo, detecta comunidades y calcula métricas para una consulta.
+
+    El resultado se guarda en ``analysis_cache`` con clave en la consulta y en
+    los parámetros del algoritmo, de modo que ``/analyze_tweets/`` y
+    ``/network_metrics/`` comparten el trabajo ya hecho. El diccionario
+    devuelto es compartido: quien lo use no debe modificarlo. Con
+    ``source="store"`` el análisis se repite sobre los tweets ya guardados,
+    sin gastar cupo de la API. ``metrics`` limita los grupos de métricas
+    calculados (ver ``METRIC_GROUPS``).
+    """
+    key, options, build = _prepare_analysis(query, max_tweets, max_pages, time_limit, max_nodes, resolution,
+                                            influence, accuracy, influence_budget, source, since, until, metrics)
+    cached = _cached_analysis(key)
+    if cached is not MISSING:
+        return cached
+    
+    def run():
+        # Otra llamada pudo terminar el mismo análisis mientras esperábamos
+        cached = _cached_analysis(key, log=False)
+        if cached is not MISSING:
+            return cached
+        graph = get_tweets_and_build_graph(query, max_tweets, **build)
+        communities, metrics = analysis_pool.run(graph, options, analyze_graph)
+        return _finish_analysis(key, graph, communities, metrics)
+    
+    # Las peticiones idénticas simultáneas comparten una única descarga y un único análisis
+    return analysis_flights.do(key, run)
+
+# Versión asíncrona de analyze_query: la descarga de tweets no bloquea el event loop
+async def analyze_query_async(query: str, max_tweets: int = 50, max_pages: Optional[int] = None,
+                              time_limit: Optional[float] = None, max_nodes: Optional[int] = None,
+                              resolution: float = LOUVAIN_RESOLUTION, influence: Optional[List[str]] = None,
+                              accuracy: str = "balanced", influence_budget: Optional[float] = None,
+                              source: str = "api", since: Optional[datetime] = None,
+                              until: Optional[datetime] = None,
+                              metrics: Optional[List[str]] = None) -> Dict[str, Any]:
+    key, options, build = _prepare_analysis(query, max_tweets, max_pages, time_limit, max_nodes, resolution,
+                                            influence, accuracy, influence_budget, source, since, until, metrics)
+    cached = _cached_analysis(key)
+    if cached is not MISSING:
+        return cached
+    
+    async def run():
+        cached = _cached_analysis(key, log=False)
+        if cached is not MISSING:
+            return cached
+        graph = await get_tweets_and_build_graph_async(query, max_tweets, **build)
+        # Comunidades y métricas fuera del event loop (pool de procesos) para grafos grandes
+        communities, metrics = await analysis_pool.run_async(graph, options, analyze_graph)
+        return _finish_analysis(key, graph, communities, metrics)
+    
+    return await analysis_flights.do_async(key, run)
+
+@with_retry_and_cache("get_user", endpoint="/2/users/by/username/:username")
 def get_user_by_username(username):
-    if not client:
+    twitter_client = get_client()
+    if not twitter_client:
         raise HTTPException(status_code=500, detail="Cliente de Twitter no inicializado")
         
-    return client.get_user(
+    return twitter_client.get_user(
         username=username,
         user_fields=['description', 'public_metrics', 'profile_image_url']
     )
 
 # Función para obtener información de usuario
 def get_user_info(username):
-    if not client:
+    if not get_client():
         return {"error": "Cliente de Twitter no inicializado. Verifique las credenciales."}
     
     try:
@@ -419,5 +1307,125 @@ def get_user_info(username):
         # Propagar errores HTTP
         return {"error": str(e.detail), "status_code": e.status_code}
     except Exception as e:
-        print(f"Error al obtener información del usuario: {str(e)}")
-        return {"error": f"Error al obtener información: {str(e)}"}
\ No newline at end of file
+        logger.error("Error al obtener información del usuario: %s", e)
+        return {"error": f"Error al obtener información: {str(e)}"}
+
+# Consulta de perfiles por lotes: tamaño de cada llamada a get_users (límite de la API v2)
+# y máximo de usuarios por petición
+USER_BATCH_SIZE = 100
+MAX_BATCH_USERS = 1000
+USER_FIELDS = ['description', 'public_metrics', 'profile_image_url']
+
+# Perfil resumido de un usuario de tweepy
+def user_profile(user) -> Dict[str, Any]:
+    metrics = getattr(user, 'public_metrics', None) or {}
+    return {
+        "id": user.id,
+        "username": user.username,
+        "name": user.name,
+        "description": getattr(user, 'description', None),
+        "profile_image_url": getattr(user, 'profile_image_url', None),
+        "followers_count": metrics.get('followers_count', 0),
+        "following_count": metrics.get('following_count', 0),
+        "tweet_count": metrics.get('tweet_count', 0)
+    }
+
+# Guarda los perfiles en user_cache con clave en el id y en el username (sin distinguir mayúsculas)
+def remember_users(users) -> List[Dict[str, Any]]:
+    profiles = []
+    for user in users:
+        profile = user_profile(user)
+        user_cache.set(f"id:{user.id}", profile, ttl=CACHE_DURATION)
+        user_cache.set(f"username:{user.username.lower()}", profile, ttl=CACHE_DURATION)
+        profiles.append(profile)
+    return profiles
+
+@with_retry_and_cache("get_users_by_ids", endpoint="/2/users")
+def get_users_by_ids(ids: List[int]):
+    twitter_client = get_client()
+    if not twitter_client:
+        raise HTTPException(status_code=500, detail="Cliente de Twitter no inicializado")
+    
+    return twitter_client.get_users(ids=ids, user_fields=USER_FIELDS)
+
+@with_retry_and_cache("get_users_by_usernames", endpoint="/2/users/by")
+def get_users_by_usernames(usernames: List[str]):
+    twitter_client = get_client()
+    if not twitter_client:
+        raise HTTPException(status_code=500, detail="Cliente de Twitter no inicializado")
+    
+    return twitter_client.get_users(usernames=usernames, user_fields=USER_FIELDS)
+
+def _unique(values) -> List[Any]:
+    return list(dict.fromkeys(values))
+
+def _chunks(values: List[Any], size: int = USER_BATCH_SIZE) -> List[List[Any]]:
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+# Función para obtener los perfiles de muchos usuarios en pocas llamadas a la API
+async def get_users_info_async(usernames: Optional[List[str]] = None,
+                               ids: Optional[List[Any]] = None) -> Dict[str, Any]:
+    """Devuelve los perfiles de ``usernames`` e ``ids`` en una sola respuesta.
+
+    Primero se usan los perfiles ya conocidos (``includes`` de búsquedas
+    anteriores y lotes previos, en ``user_cache``); el resto se piden con
+    ``get_users`` en lotes de 100, todos los lotes a la vez. Los usuarios
+    que la API no devuelve aparecen en ``not_found``.
+    """
+    try:
+        ids = _unique(int(user_id) for user_id in ids or [])
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Los ids de usuario deben ser numéricos")
+    usernames = _unique(username.lstrip('@') for username in usernames or [] if username.strip('@'))
+    if len(ids) + len(usernames) > MAX_BATCH_USERS:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_BATCH_USERS} usuarios por petición")
+    
+    # Perfiles ya conocidos
+    by_id = {}
+    by_username = {}
+    for user_id in ids:
+        profile = user_cache.get(f"id:{user_id}")
+        if profile is not MISSING:
+            by_id[user_id] = profile
+    for username in usernames:
+        profile = user_cache.get(f"username:{username.lower()}")
+        if profile is not MISSING:
+            by_username[username.lower()] = profile
+    from_cache = len(by_id) + len(by_username)
+    
+    # El resto, en lotes de 100 ids o usernames pedidos en paralelo
+    missing_ids = [user_id for user_id in ids if user_id not in by_id]
+    missing_usernames = [username for username in usernames if username.lower() not in by_username]
+    calls = ([get_users_by_ids.run_async(chunk, use_cache=False) for chunk in _chunks(missing_ids)]
+             + [get_users_by_usernames.run_async(chunk, use_cache=False) for chunk in _chunks(missing_usernames)])
+    responses = await asyncio.gather(*calls)
+    
+    for response in responses:
+        for profile in remember_users(response.data or []):
+            by_id[profile["id"]] = profile
+            by_username[profile["username"].lower()] = profile
+    
+    users = []
+    seen = set()
+    not_found = {"ids": [], "usernames": []}
+    for user_id in ids:
+        profile = by_id.get(user_id)
+        if profile is None:
+            not_found["ids"].append(user_id)
+        elif profile["id"] not in seen:
+            seen.add(profile["id"])
+            users.append(profile)
+    for username in usernames:
+        profile = by_username.get(username.lower())
+        if profile is None:
+            not_found["usernames"].append(username)
+        elif profile["id"] not in seen:
+            seen.add(profile["id"])
+            users.append(profile)
+    
+    return {
+        "users": users,
+        "not_found": not_found,
+        "from_cache": from_cache,
+        "api_calls": len(calls)
+    }
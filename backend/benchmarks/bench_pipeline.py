@@ -0,0 +1,247 @@
+"""Benchmark de las etapas del análisis: construcción, comunidades, métricas, serialización y endpoint.
+
+Uso: python benchmarks/bench_pipeline.py [--sizes 1000,10000,100000] [--repeat 5]
+     python benchmarks/bench_pipeline.py --fixture tweets.json --output resultados.json
+     python benchmarks/bench_pipeline.py --store-query "python" [--store-path tweets.sqlite3]
+     python benchmarks/bench_pipeline.py --compare base.json --output actual.json
+
+Los tweets salen de ``FakeTwitterClient`` (sintéticos con menciones en ley
+de potencias, o grabados con --fixture o --store-query), así que no hace
+falta Bearer Token. Para cada tamaño y etapa se informa de los percentiles de latencia,
+el rendimiento en tweets por segundo y el pico de memoria (tracemalloc, en
+una pasada aparte para no distorsionar los tiempos). Con --output los
+resultados se guardan en JSON; con --compare se comparan con una ejecución
+anterior y el proceso termina con código 1 si alguna etapa empeora más del
+umbral.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+# Los mensajes informativos del servicio no forman parte de la medida
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Las ejecuciones no deben escribir en el almacén local real ni medir su E/S
+os.environ.setdefault("TWEET_STORE_ENABLED", "false")
+
+import networkx as nx
+
+from fake_client import FakeTwitterClient, install
+from app.services import twitter_service as ts
+
+# Versión del formato de resultados
+RESULTS_VERSION = 1
+
+STAGES = ("build", "communities", "metrics", "serialize", "endpoint")
+
+
+def percentile(values: List[float], q: float) -> float:
+    # Percentil por rango más cercano
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def pages_of(client: FakeTwitterClient, page_size: int = ts.PAGE_SIZE):
+    pages = []
+    next_token = None
+    while True:
+        response = client.search_recent_tweets("benchmark", page_size, next_token)
+        if not response.data:
+            return pages
+        pages.append(response)
+        next_token = response.meta.get("next_token")
+        if not next_token:
+            return pages
+
+
+def build_graph(pages) -> nx.DiGraph:
+    G = nx.DiGraph()
+    index = ts.GraphIndex()
+    for response in pages:
+        ts.process_tweets(response, G, index)
+    return G
+
+
+def metrics(G: nx.DiGraph):
+    # Sin las métricas memorizadas de la repetición anterior: se mide el cálculo
+    ts.clear_metrics_cache(G)
+    return ts.get_network_metrics(G)
+
+
+def serialize(G: nx.DiGraph, communities) -> int:
+    nodes, edges = ts.graph_to_elements(G, communities)
+    return len(json.dumps({"nodes": nodes, "edges": edges, "communities": communities}, default=str))
+
+
+def endpoint_runner(client: FakeTwitterClient, n_tweets: int) -> Callable[[], Any]:
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    test_client = TestClient(app)
+    payload = {"query": "benchmark", "max_tweets": n_tweets,
+               "max_pages": math.ceil(n_tweets / ts.PAGE_SIZE), "time_limit": 3600}
+
+    def run():
+        # Sin cachés: cada repetición descarga, construye y analiza de nuevo
+        ts.cache.clear()
+        ts.analysis_cache.clear()
+        response = test_client.post("/analyze_tweets/", json=payload)
+        response.raise_for_status()
+        return len(response.content)
+
+    return run
+
+
+def measure(func: Callable[[], Any], repeat: int, memory: bool) -> Dict[str, Any]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    result = {
+        "repeat": repeat,
+        "min": min(times),
+        "mean": sum(times) / len(times),
+        "p50": percentile(times, 50),
+        "p90": percentile(times, 90),
+        "p99": percentile(times, 99)
+    }
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_size(client: FakeTwitterClient, stages: List[str], repeat: int, memory: bool) -> List[Dict[str, Any]]:
+    n_tweets = len(client.tweets)
+    pages = pages_of(client)
+    G = build_graph(pages)
+    communities = ts.detect_communities(G)
+
+    funcs = {
+        "build": lambda: build_graph(pages),
+        "communities": lambda: ts.detect_communities(G),
+        "metrics": lambda: metrics(G),
+        "serialize": lambda: serialize(G, communities),
+    }
+    if "endpoint" in stages:
+        install(client)
+        funcs["endpoint"] = endpoint_runner(client, n_tweets)
+
+    results = []
+    for stage in stages:
+        result = measure(funcs[stage], repeat, memory)
+        result.update({
+            "stage": stage,
+            "tweets": n_tweets,
+            "nodes": G.number_of_nodes(),
+            "edges": G.number_of_edges(),
+            "throughput": n_tweets / result["p50"] if result["p50"] else None
+        })
+        results.append(result)
+        print(format_row(result))
+    return results
+
+
+def format_row(result: Dict[str, Any]) -> str:
+    peak = f"{result['peak_mb']:>9.1f}" if "peak_mb" in result else f"{'-':>9}"
+    return (f"{result['stage']:<12} {result['tweets']:>8} {result['nodes']:>8} {result['edges']:>8} "
+            f"{result['p50'] * 1000:>10.2f} {result['p90'] * 1000:>10.2f} {result['p99'] * 1000:>10.2f} "
+            f"{result['throughput'] or 0:>12.0f} {peak}")
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, threshold: float) -> bool:
+    """Compara la mediana de cada etapa con la de ``baseline_path``; devuelve True si hay regresiones."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["stage"], r["tweets"]): r for r in json.load(f)["results"]}
+
+    regressions = False
+    print(f"\n{'etapa':<12} {'tweets':>8} {'base ms':>10} {'actual ms':>10} {'ratio':>7}")
+    for result in results:
+        base = baseline.get((result["stage"], result["tweets"]))
+        if base is None:
+            continue
+        ratio = result["p50"] / base["p50"] if base["p50"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESIÓN"
+            regressions = True
+        print(f"{result['stage']:<12} {result['tweets']:>8} {base['p50'] * 1000:>10.2f} "
+              f"{result['p50'] * 1000:>10.2f} {ratio:>7.2f}{flag}")
+    return regressions
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "networkx": nx.__version__,
+        "graph_engine": ts.GRAPH_ENGINE
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="número de tweets sintéticos por ejecución")
+    parser.add_argument("--users", type=int, help="número de usuarios (por defecto tweets / 5)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fixture", help="fichero JSON con tweets grabados (en lugar de sintéticos)")
+    parser.add_argument("--store-query", help="consulta guardada en el almacén local de tweets")
+    parser.add_argument("--store-path", help="ruta del almacén (por defecto TWEET_STORE_PATH)")
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-memory", action="store_true", help="no medir el pico de memoria")
+    parser.add_argument("--output", help="guardar los resultados en este fichero JSON")
+    parser.add_argument("--compare", help="resultados anteriores con los que comparar")
+    parser.add_argument("--threshold", type=float, default=1.2, help="ratio de la mediana que cuenta como regresión")
+    args = parser.parse_args()
+
+    stages = [stage for stage in args.stages.split(",") if stage]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"etapas desconocidas: {', '.join(unknown)}. Opciones: {', '.join(STAGES)}")
+
+    if args.fixture:
+        clients = [FakeTwitterClient.from_fixture(args.fixture)]
+    elif args.store_query:
+        clients = [FakeTwitterClient.from_store(args.store_query, args.store_path)]
+    else:
+        clients = (FakeTwitterClient.synthetic(int(size), args.users, seed=args.seed)
+                   for size in args.sizes.split(","))
+
+    print(f"{'etapa':<12} {'tweets':>8} {'nodos':>8} {'aristas':>8} {'p50 ms':>10} {'p90 ms':>10} "
+          f"{'p99 ms':>10} {'tweets/s':>12} {'pico MB':>9}")
+    results = []
+    for client in clients:
+        results.extend(run_size(client, stages, args.repeat, not args.no_memory))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": RESULTS_VERSION,
+                "created": datetime.now(timezone.utc).isoformat(),
+                "environment": environment(),
+                "fixture": args.fixture or args.store_query,
+                "results": results
+            }, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Mide el tiempo de construcción del grafo con process_tweets.
+
+Uso: python benchmarks/bench_process_tweets.py [--sizes 1000,2000,4000,8000,16000]
+     python benchmarks/bench_process_tweets.py --store-query "python" [--store-path tweets.sqlite3]
+
+Con índices username -> id y tweet -> autor el coste por tweet debe
+mantenerse aproximadamente constante al crecer el número de tweets. Con
+--store-query se mide sobre las páginas guardadas en el almacén local de
+tweets para esa consulta, sin llamadas a la API.
+"""
+import argparse
+import time
+from typing import Optional
+
+import networkx as nx
+
+from synthetic import make_tweets, make_response
+from app.services.twitter_service import process_tweets, GraphIndex
+from app.services.tweet_store import TweetStore
+
+
+def bench(n_tweets: int, repeat: int = 3) -> float:
+    tweets, users = make_tweets(n_tweets, seed=n_tweets)
+    response = make_response(tweets, users)
+
+    best = float("inf")
+    for _ in range(repeat):
+        G = nx.DiGraph()
+        start = time.perf_counter()
+        process_tweets(response, G, GraphIndex())
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load_store_pages(query: str, path: Optional[str] = None):
+    store = TweetStore(path) if path else TweetStore()
+    pages = []
+    before_id = None
+    while True:
+        response = store.load_page(query, 100, before_id)
+        if not response.data:
+            break
+        pages.append(response)
+        if "next_token" not in response.meta:
+            break
+        before_id = int(response.meta["next_token"])
+    return pages
+
+
+def bench_pages(pages, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        G = nx.DiGraph()
+        index = GraphIndex()
+        start = time.perf_counter()
+        for response in pages:
+            process_tweets(response, G, index)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,2000,4000,8000,16000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--store-query", help="consulta guardada en el almacén local de tweets")
+    parser.add_argument("--store-path", help="ruta del almacén (por defecto TWEET_STORE_PATH)")
+    args = parser.parse_args()
+
+    if args.store_query:
+        pages = load_store_pages(args.store_query, args.store_path)
+        size = sum(len(response.data) for response in pages)
+        if not size:
+            print(f"No hay tweets guardados para: {args.store_query}")
+            return
+        elapsed = bench_pages(pages, args.repeat)
+        print(f"{'tweets':>8} {'páginas':>8} {'segundos':>10} {'us/tweet':>10}")
+        print(f"{size:>8} {len(pages):>8} {elapsed:>10.4f} {elapsed / size * 1e6:>10.2f}")
+        return
+
+    print(f"{'tweets':>8} {'segundos':>10} {'us/tweet':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        elapsed = bench(size, args.repeat)
+        print(f"{size:>8} {elapsed:>10.4f} {elapsed / size * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
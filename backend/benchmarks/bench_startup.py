@@ -0,0 +1,167 @@
+"""Benchmark del arranque en frío: importar la aplicación, arrancarla y servir la primera petición.
+
+Uso: python benchmarks/bench_startup.py [--repeat 10] [--top 15]
+     python benchmarks/bench_startup.py --output arranque.json
+     python benchmarks/bench_startup.py --compare base.json --output actual.json
+
+Cada repetición se mide en un intérprete nuevo (sin módulos ya importados
+ni cachés en memoria). Se informa de los percentiles de cada fase:
+``process`` (el proceso completo, incluido el arranque de Python),
+``import`` (``import app.main``), ``startup`` (el lifespan de la
+aplicación) y ``first_request`` (el primer ``GET /health``). Con --top
+se listan los módulos cuya importación más tarda (``python -X
+importtime``). Con --compare el proceso termina con código 1 si alguna
+fase empeora más del umbral.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Versión del formato de resultados
+RESULTS_VERSION = 1
+
+PHASES = ("process", "import", "startup", "first_request")
+
+# Programa que ejecuta cada proceso hijo; escribe la duración de cada fase en JSON
+CHILD = """
+import json, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    started = time.perf_counter()
+    client.get("/health").raise_for_status()
+    served = time.perf_counter()
+print(json.dumps({"import": imported - start, "startup": started - imported, "first_request": served - started}))
+"""
+
+
+def percentile(values: List[float], q: float) -> float:
+    # Percentil por rango más cercano
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    # Los mensajes informativos no forman parte de la medida
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return env
+
+
+def run_once() -> Dict[str, float]:
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", CHILD], cwd=BACKEND_DIR, env=child_env(),
+                               capture_output=True, text=True, check=True)
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    timings["process"] = time.perf_counter() - start
+    return timings
+
+
+def slowest_imports(top: int) -> List[Dict[str, Any]]:
+    """Módulos con más tiempo acumulado de importación (``-X importtime``)."""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=BACKEND_DIR,
+                               env=child_env(), capture_output=True, text=True, check=True)
+    modules = []
+    for line in completed.stderr.splitlines():
+        # Formato: "import time: <propio us> | <acumulado us> | <módulo>"
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        try:
+            modules.append({"module": name.strip(), "self_ms": int(self_us) / 1000,
+                            "cumulative_ms": int(cumulative_us) / 1000})
+        except ValueError:
+            # Cabecera de la salida
+            continue
+    modules.sort(key=lambda module: module["cumulative_ms"], reverse=True)
+    return modules[:top]
+
+
+def summarize(runs: List[Dict[str, float]]) -> List[Dict[str, Any]]:
+    results = []
+    for phase in PHASES:
+        times = [run[phase] for run in runs]
+        results.append({
+            "phase": phase,
+            "repeat": len(times),
+            "min": min(times),
+            "mean": sum(times) / len(times),
+            "p50": percentile(times, 50),
+            "p90": percentile(times, 90),
+            "p99": percentile(times, 99)
+        })
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, threshold: float) -> bool:
+    """Compara la mediana de cada fase con la de ``baseline_path``; devuelve True si hay regresiones."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["phase"]: r for r in json.load(f)["results"]}
+
+    regressions = False
+    print(f"\n{'fase':<14} {'base ms':>10} {'actual ms':>10} {'ratio':>7}")
+    for result in results:
+        base = baseline.get(result["phase"])
+        if base is None:
+            continue
+        ratio = result["p50"] / base["p50"] if base["p50"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESIÓN"
+            regressions = True
+        print(f"{result['phase']:<14} {base['p50'] * 1000:>10.2f} {result['p50'] * 1000:>10.2f} {ratio:>7.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15, help="módulos más lentos de importar (0 = no listar)")
+    parser.add_argument("--output", help="guardar los resultados en este fichero JSON")
+    parser.add_argument("--compare", help="resultados anteriores con los que comparar")
+    parser.add_argument("--threshold", type=float, default=1.2, help="ratio de la mediana que cuenta como regresión")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.repeat)]
+    results = summarize(runs)
+
+    print(f"{'fase':<14} {'min ms':>10} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10}")
+    for result in results:
+        print(f"{result['phase']:<14} {result['min'] * 1000:>10.2f} {result['p50'] * 1000:>10.2f} "
+              f"{result['p90'] * 1000:>10.2f} {result['p99'] * 1000:>10.2f}")
+
+    imports = slowest_imports(args.top) if args.top else []
+    if imports:
+        print(f"\n{'módulo':<50} {'propio ms':>10} {'acumulado ms':>13}")
+        for module in imports:
+            print(f"{module['module']:<50} {module['self_ms']:>10.2f} {module['cumulative_ms']:>13.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": RESULTS_VERSION,
+                "created": datetime.now(timezone.utc).isoformat(),
+                "environment": {"python": platform.python_version(), "platform": platform.platform()},
+                "results": results,
+                "slowest_imports": imports
+            }, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Sustituto de tweepy.Client para medir el backend sin Bearer Token.
+
+Sirve tweets sintéticos (``synthetic.make_tweets``, menciones con ley de
+potencias) o grabados (un fichero JSON o el almacén local de tweets) con
+la misma forma que la API v2: páginas del más reciente al más antiguo,
+``next_token``, usuarios y tweets referenciados en ``includes``. Se instala con ``install(client)``.
+"""
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import tweepy
+
+from synthetic import make_tweets
+
+
+def _users_from_raw(raw: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return (raw.get("includes") or {}).get("users", [])
+
+
+def load_fixture(path: str):
+    """Lee tweets y usuarios grabados.
+
+    Acepta ``{"tweets": [...], "users": [...]}`` (``save_fixture``) o una
+    lista de respuestas JSON de la API v2 tal como llegan por HTTP (con
+    ``data`` e ``includes.users``).
+    """
+    with open(path, encoding="utf-8") as f:
+        payload = json.load(f)
+
+    if isinstance(payload, dict) and "tweets" in payload:
+        return payload["tweets"], payload.get("users", [])
+
+    pages = payload if isinstance(payload, list) else [payload]
+    tweets: Dict[Any, Dict[str, Any]] = {}
+    users: Dict[Any, Dict[str, Any]] = {}
+    for raw in pages:
+        data = raw.get("data") or []
+        for tweet in (data if isinstance(data, list) else [data]):
+            tweets.setdefault(tweet["id"], tweet)
+        for user in _users_from_raw(raw):
+            users[user["id"]] = user
+    return list(tweets.values()), list(users.values())
+
+
+def load_store(query: str, path: Optional[str] = None):
+    """Lee los tweets y usuarios guardados para ``query`` en el almacén local."""
+    from app.services.tweet_store import TweetStore
+
+    store = TweetStore(path) if path else TweetStore()
+    tweets: Dict[Any, Dict[str, Any]] = {}
+    users: Dict[Any, Dict[str, Any]] = {}
+    before_id = None
+    while True:
+        response = store.load_page(query, 100, before_id)
+        if not response.data:
+            break
+        for tweet in list(response.data) + list(response.includes.get("tweets", [])):
+            tweets.setdefault(tweet.id, tweet.data)
+        for user in response.includes.get("users", []):
+            users[user.id] = user.data
+        if "next_token" not in response.meta:
+            break
+        before_id = int(response.meta["next_token"])
+    return list(tweets.values()), list(users.values())
+
+
+def save_fixture(path: str, tweets: List[Dict[str, Any]], users: List[Dict[str, Any]]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"tweets": tweets, "users": users}, f, default=str)
+
+
+class FakeTwitterClient:
+    """Cliente sin red con los métodos de tweepy.Client que usa el backend.
+
+    Todas las consultas devuelven el mismo corpus. ``latency`` simula el
+    tiempo de red de cada llamada y ``calls`` cuenta las llamadas por
+    método.
+    """
+
+    def __init__(self, tweets: List[Dict[str, Any]], users: List[Dict[str, Any]], latency: float = 0.0):
+        # La API devuelve los resultados del más reciente al más antiguo
+        self.tweets = sorted(tweets, key=lambda tweet: int(tweet["id"]), reverse=True)
+        self.users = users
+        self.latency = latency
+        self.calls: Counter = Counter()
+
+        self._tweet_by_id = {int(tweet["id"]): tweet for tweet in self.tweets}
+        self._user_by_id = {int(user["id"]): user for user in users}
+        self._user_by_username = {user["username"].lower(): user for user in users}
+
+    @classmethod
+    def synthetic(cls, n_tweets: int, n_users: Optional[int] = None, seed: int = 0, **kwargs):
+        tweets, users = make_tweets(n_tweets, n_users, seed=seed)
+        return cls(tweets, users, **kwargs)
+
+    @classmethod
+    def from_fixture(cls, path: str, **kwargs):
+        tweets, users = load_fixture(path)
+        return cls(tweets, users, **kwargs)
+
+    @classmethod
+    def from_store(cls, query: str, path: Optional[str] = None, **kwargs):
+        tweets, users = load_store(query, path)
+        return cls(tweets, users, **kwargs)
+
+    def _call(self, method: str):
+        self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _includes(self, page: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+        referenced = [
+            self._tweet_by_id[int(ref["id"])]
+            for tweet in page for ref in tweet.get("referenced_tweets", [])
+            if int(ref["id"]) in self._tweet_by_id
+        ]
+        user_ids = {int(tweet["author_id"]) for tweet in page + referenced if tweet.get("author_id") is not None}
+        usernames = {
+            mention["username"].lower()
+            for tweet in page for mention in (tweet.get("entities") or {}).get("mentions", [])
+        }
+        users = {user_id: self._user_by_id[user_id] for user_id in user_ids if user_id in self._user_by_id}
+        for username in usernames:
+            user = self._user_by_username.get(username)
+            if user is not None:
+                users[int(user["id"])] = user
+
+        includes = {"users": [tweepy.User(user) for user in users.values()]}
+        if referenced:
+            includes["tweets"] = [tweepy.Tweet(tweet) for tweet in referenced]
+        return includes
+
+    def search_recent_tweets(self, query: str, max_results: int = 10, next_token: Optional[str] = None,
+                             since_id: Optional[str] = None, **kwargs) -> tweepy.Response:
+        self._call("search_recent_tweets")
+        tweets = self.tweets
+        if since_id is not None:
+            tweets = [tweet for tweet in tweets if int(tweet["id"]) > int(since_id)]
+
+        start = int(next_token or 0)
+        page = tweets[start:start + max_results]
+        if not page:
+            return tweepy.Response(None, {}, [], {"result_count": 0})
+
+        meta = {"result_count": len(page), "newest_id": str(page[0]["id"]), "oldest_id": str(page[-1]["id"])}
+        if start + max_results < len(tweets):
+            meta["next_token"] = str(start + max_results)
+        return tweepy.Response([tweepy.Tweet(tweet) for tweet in page], self._includes(page), [], meta)
+
+    def get_user(self, username: Optional[str] = None, id: Optional[int] = None, **kwargs) -> tweepy.Response:
+        self._call("get_user")
+        user = (self._user_by_id.get(int(id)) if id is not None
+                else self._user_by_username.get((username or "").lower()))
+        return tweepy.Response(tweepy.User(user) if user else None, {}, [], {})
+
+    def get_users(self, ids: Optional[List[int]] = None, usernames: Optional[List[str]] = None,
+                  **kwargs) -> tweepy.Response:
+        self._call("get_users")
+        if ids:
+            found = [self._user_by_id.get(int(user_id)) for user_id in ids]
+        else:
+            found = [self._user_by_username.get(username.lower()) for username in usernames or []]
+        return tweepy.Response([tweepy.User(user) for user in found if user], {}, [], {})
+
+    def get_me(self, **kwargs) -> tweepy.Response:
+        self._call("get_me")
+        return tweepy.Response(tweepy.User({"id": 0, "username": "benchmark", "name": "Benchmark"}), {}, [], {})
+
+
+def install(client: FakeTwitterClient):
+    """Sustituye el cliente de twitter_service por ``client``."""
+    from app.services import twitter_service
+    twitter_service.client = client
@@ -0,0 +1,69 @@
+import itertools
+import random
+import sys
+from pathlib import Path
+from typing import List
+
+import tweepy
+
+# Añadir la ruta raíz del backend al path de Python
+backend_dir = Path(__file__).parent.parent.absolute()
+if str(backend_dir) not in sys.path:
+    sys.path.append(str(backend_dir))
+
+
+# Elige usuarios con una distribución de ley de potencias (pocos usuarios muy activos)
+def _power_law_picker(n_users: int, rnd: random.Random, exponent: float = 1.2):
+    cum_weights = list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, n_users + 1)))
+    population = list(range(1, n_users + 1))
+
+    def pick(k: int = 1) -> List[int]:
+        return rnd.choices(population, cum_weights=cum_weights, k=k)
+
+    return pick
+
+
+def make_tweets(n_tweets: int, n_users: int = None, seed: int = 0,
+                reference_ratio: float = 0.5, max_mentions: int = 3):
+    """Genera tweets y usuarios sintéticos (dicts con el formato de la API v2)."""
+    rnd = random.Random(seed)
+    n_users = n_users or max(10, n_tweets // 5)
+    pick = _power_law_picker(n_users, rnd)
+
+    users = [{"id": i, "username": f"user{i}", "name": f"User {i}"} for i in range(1, n_users + 1)]
+    tweets = []
+    for t in range(1, n_tweets + 1):
+        tweet_id = 10 ** 9 + t
+        tweet = {
+            "id": tweet_id,
+            "text": f"tweet {t}",
+            "author_id": pick()[0],
+            "edit_history_tweet_ids": [str(tweet_id)],
+            "entities": {"mentions": [{"username": f"user{u}"} for u in pick(rnd.randint(0, max_mentions))]}
+        }
+        if t > 1 and rnd.random() < reference_ratio:
+            tweet["referenced_tweets"] = [{
+                "type": rnd.choice(["retweeted", "quoted", "replied_to"]),
+                "id": 10 ** 9 + rnd.randint(1, t - 1)
+            }]
+        tweets.append(tweet)
+
+    return tweets, users
+
+
+def make_response(tweets, users, next_token: str = None) -> tweepy.Response:
+    """Construye una respuesta de tweepy a partir de dicts de tweets y usuarios."""
+    author_ids = {tweet["author_id"] for tweet in tweets}
+    mentioned = {m["username"] for tweet in tweets for m in tweet.get("entities", {}).get("mentions", [])}
+    included = [u for u in users if u["id"] in author_ids or u["username"] in mentioned]
+
+    meta = {"result_count": len(tweets)}
+    if next_token:
+        meta["next_token"] = next_token
+
+    return tweepy.Response(
+        [tweepy.Tweet(t) for t in tweets],
+        {"users": [tweepy.User(u) for u in included]},
+        [],
+        meta
+    )
@@ -1,4 +1,3 @@
-from dotenv import load_dotenv
 import os
 import sys
 from pathlib import Path
@@ -8,16 +7,16 @@ current_dir = Path(__file__).parent.absolute()
 # Obtener la ruta raíz del monorepo (subir un nivel)
 root_dir = current_dir.parent.absolute()
 
-# Intenta cargar .env desde la raíz del monorepo
-if os.path.exists(os.path.join(root_dir, ".env")):
-    load_dotenv(os.path.join(root_dir, ".env"))
-    print(f"Cargando variables de entorno desde: {os.path.join(root_dir, '.env')}")
-# Si no existe, intenta cargar desde backend
-elif os.path.exists(os.path.join(current_dir, ".env")):
-    load_dotenv(os.path.join(current_dir, ".env"))
-    print(f"Cargando variables de entorno desde: {os.path.join(current_dir, '.env')}")
-else:
-    print("No se encontró el archivo .env")
+# Intenta cargar .env desde la raíz del monorepo y, si no existe, desde backend.
+# Los mensajes de diagnóstico se registran al arrancar la aplicación (ENV_FILE).
+# python-dotenv solo se importa si hay un .env que leer
+ENV_FILE = None
+for env_dir in (root_dir, current_dir):
+    if os.path.exists(os.path.join(env_dir, ".env")):
+        from dotenv import load_dotenv
+        ENV_FILE = os.path.join(env_dir, ".env")
+        load_dotenv(ENV_FILE)
+        break
 
 # Verificar que las variables necesarias estén disponibles
 TWITTER_API_KEY = os.getenv("TWITTER_API_KEY")
@@ -26,9 +25,77 @@ BEARER_TOKEN = os.getenv("BEARER_TOKEN")
 TWITTER_ACCESS_TOKEN = os.getenv("TWITTER_ACCESS_TOKEN")
 TWITTER_ACCESS_SECRET = os.getenv("TWITTER_ACCESS_SECRET")
 
-# Imprimir información de diagnóstico (no incluye valores sensibles)
-print(f"BEARER_TOKEN definido: {'Sí' if BEARER_TOKEN else 'No'}")
-print(f"TWITTER_API_KEY definido: {'Sí' if TWITTER_API_KEY else 'No'}")
-print(f"TWITTER_API_SECRET definido: {'Sí' if TWITTER_API_SECRET else 'No'}")
-print(f"TWITTER_ACCESS_TOKEN definido: {'Sí' if TWITTER_ACCESS_TOKEN else 'No'}")
-print(f"TWITTER_ACCESS_SECRET definido: {'Sí' if TWITTER_ACCESS_SECRET else 'No'}")
\ No newline at end of file
+# Información de diagnóstico (no incluye valores sensibles)
+CREDENTIALS_DEFINED = {
+    "BEARER_TOKEN": bool(BEARER_TOKEN),
+    "TWITTER_API_KEY": bool(TWITTER_API_KEY),
+    "TWITTER_API_SECRET": bool(TWITTER_API_SECRET),
+    "TWITTER_ACCESS_TOKEN": bool(TWITTER_ACCESS_TOKEN),
+    "TWITTER_ACCESS_SECRET": bool(TWITTER_ACCESS_SECRET)
+}
+
+# Registro: nivel (DEBUG, INFO, WARNING...) y fracción de los mensajes por
+# debajo de WARNING que se escriben (1 = todos)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1"))
+
+# Configuración de la caché (memory, sqlite o redis). memory es propia de cada proceso;
+# sqlite y redis se comparten entre todos los workers que usen el mismo fichero o servidor
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", os.path.join(current_dir, ".cache", "cache.sqlite3"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Segundos que un proceso espera el bloqueo de un fichero SQLite compartido con otros workers
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))
+
+# Número máximo de llamadas simultáneas a la API de Twitter desde los endpoints asíncronos
+TWITTER_IO_WORKERS = int(os.getenv("TWITTER_IO_WORKERS", "8"))
+
+# Sesión HTTP compartida de las llamadas a la API de Twitter: conexiones máximas del
+# pool (por defecto una por hilo de E/S), si al llenarse se espera a una conexión libre
+# en lugar de abrir una de más, keep-alive, tiempos máximos (segundos) de conexión y de
+# lectura de cada llamada y HTTP/2 opcional (requiere httpx[http2])
+TWITTER_HTTP_POOL_SIZE = int(os.getenv("TWITTER_HTTP_POOL_SIZE", str(TWITTER_IO_WORKERS)))
+TWITTER_HTTP_POOL_BLOCK = os.getenv("TWITTER_HTTP_POOL_BLOCK", "false").lower() in ("1", "true", "yes")
+TWITTER_HTTP_KEEPALIVE = os.getenv("TWITTER_HTTP_KEEPALIVE", "true").lower() in ("1", "true", "yes")
+TWITTER_HTTP_CONNECT_TIMEOUT = float(os.getenv("TWITTER_HTTP_CONNECT_TIMEOUT", "5"))
+TWITTER_HTTP_READ_TIMEOUT = float(os.getenv("TWITTER_HTTP_READ_TIMEOUT", "30"))
+TWITTER_HTTP2 = os.getenv("TWITTER_HTTP2", "false").lower() in ("1", "true", "yes")
+
+# Planificador de cupo de la API: espera máxima hasta el reinicio de la ventana
+# y unidades de cupo reservadas para peticiones interactivas
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "30"))
+RATE_LIMIT_RESERVE = int(os.getenv("RATE_LIMIT_RESERVE", "1"))
+
+# Dónde se guarda el cupo de la API (memory, sqlite o redis). Con varios workers de
+# uvicorn/gunicorn, sqlite (en CACHE_SQLITE_PATH) o redis (en REDIS_URL) lo comparten
+# entre procesos; por defecto se usa el mismo backend que la caché
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", CACHE_BACKEND)
+
+# Motor de métricas: "auto" usa el núcleo compacto (NumPy/SciPy) a partir de
+# COMPACT_GRAPH_MIN_EDGES aristas, "compact" siempre y "networkx" nunca
+GRAPH_ENGINE = os.getenv("GRAPH_ENGINE", "auto")
+COMPACT_GRAPH_MIN_EDGES = int(os.getenv("COMPACT_GRAPH_MIN_EDGES", "20000"))
+
+# Tiempo máximo (segundos) de cada métrica de influencia (PageRank, intermediación...)
+INFLUENCE_TIME_BUDGET = float(os.getenv("INFLUENCE_TIME_BUDGET", "2"))
+
+# Consultas seguidas: fracción de nodos modificados a partir de la cual se
+# recalcula Louvain completo (con arranque en caliente) y refrescos entre recálculos completos
+TRACKING_FULL_REFRESH_FRACTION = float(os.getenv("TRACKING_FULL_REFRESH_FRACTION", "0.2"))
+TRACKING_FULL_REFRESH_EVERY = int(os.getenv("TRACKING_FULL_REFRESH_EVERY", "20"))
+TRACKING_MAX_QUERIES = int(os.getenv("TRACKING_MAX_QUERIES", "50"))
+
+# Análisis (comunidades y métricas) en un pool de procesos: número de procesos
+# (0 = en el propio proceso), aristas mínimas para enviar el grafo al pool y
+# tiempo máximo (segundos) de cada análisis
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(os.cpu_count() or 1)))
+ANALYSIS_POOL_MIN_EDGES = int(os.getenv("ANALYSIS_POOL_MIN_EDGES", "2000"))
+ANALYSIS_TIMEOUT = float(os.getenv("ANALYSIS_TIMEOUT", "120"))
+
+# Almacén local de tweets (SQLite, solo se añaden filas): guarda cada página descargada
+# por search_tweets para repetir análisis sin llamar a la API (source="store"). Desactivado por
+# defecto: el fichero no tiene límite de tamaño ni caducidad
+TWEET_STORE_ENABLED = os.getenv("TWEET_STORE_ENABLED", "false").lower() in ("1", "true", "yes")
+TWEET_STORE_PATH = os.getenv("TWEET_STORE_PATH", os.path.join(current_dir, ".cache", "tweets.sqlite3"))
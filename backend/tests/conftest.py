@@ -0,0 +1,39 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Añadir la raíz del backend y los benchmarks (cliente de Twitter sin red) al path de Python
+backend_dir = Path(__file__).parent.parent.absolute()
+for path in (backend_dir, backend_dir / "benchmarks"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+# Sin credenciales, caché en memoria y sin almacén de tweets en disco
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("CACHE_BACKEND", "memory")
+os.environ.setdefault("TWEET_STORE_ENABLED", "false")
+
+
+@pytest.fixture
+def fake_twitter():
+    """Cliente de Twitter sin red (tweets sintéticos) instalado en twitter_service."""
+    from fake_client import FakeTwitterClient, install
+    from app.services import twitter_service
+
+    previous = twitter_service.client
+    fake = FakeTwitterClient.synthetic(1000, seed=1)
+    install(fake)
+    for cache in twitter_service.CACHES.values():
+        cache.clear()
+    yield fake
+    twitter_service.client = previous
+
+
+@pytest.fixture
+def api(fake_twitter):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
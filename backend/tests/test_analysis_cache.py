@@ -0,0 +1,32 @@
+from app.services import twitter_service as ts
+
+
+def test_repeated_analysis_is_served_from_cache(fake_twitter):
+    first = ts.analyze_query("python", 100)
+    second = ts.analyze_query("python", 100)
+
+    assert second is first
+    assert fake_twitter.calls["search_recent_tweets"] == 1
+    assert len(ts.analysis_cache) == 1
+
+
+def test_algorithm_parameters_are_part_of_the_key(fake_twitter):
+    default = ts.analyze_query("python", 100)
+    other = ts.analyze_query("python", 100, resolution=2.0)
+
+    assert other is not default
+    assert len(ts.analysis_cache) == 2
+    # El grafo se reconstruye, pero la página de tweets sale de la caché de respuestas
+    assert fake_twitter.calls["search_recent_tweets"] == 1
+
+
+def test_graph_endpoints_share_the_analysis(api, fake_twitter):
+    response = api.post("/analyze_tweets/", json={"query": "python", "max_tweets": 100})
+    assert response.status_code == 200
+    hits = ts.analysis_cache.stats.hits
+
+    response = api.get("/network_metrics/", params={"query": "python", "max_tweets": 100})
+    assert response.status_code == 200
+    assert ts.analysis_cache.stats.hits == hits + 1
+    assert len(ts.analysis_cache) == 1
+    assert fake_twitter.calls["search_recent_tweets"] == 1
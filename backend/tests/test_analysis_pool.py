@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+import networkx as nx
+
+from app.services.analysis_pool import AnalysisPool
+
+
+def _slow_analysis(G, options, deadline, timings):
+    # Trabajo de CPU que no cede el event loop
+    end = time.perf_counter() + 0.3
+    while time.perf_counter() < end:
+        pass
+    return [list(G.nodes())], {"num_nodes": G.number_of_nodes()}
+
+
+def test_inline_analysis_keeps_event_loop_responsive():
+    pool = AnalysisPool(workers=0)
+    G = nx.DiGraph([(1, 2), (2, 3)])
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        result = await pool.run_async(G, {}, _slow_analysis)
+        task.cancel()
+        return result, ticks
+
+    (communities, metrics), ticks = asyncio.run(main())
+    assert metrics == {"num_nodes": 3}
+    # Con el análisis en el event loop el ticker no avanzaría hasta el final
+    assert ticks >= 5
+    assert pool.info()["inline"] == 1
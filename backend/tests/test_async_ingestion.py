@@ -0,0 +1,41 @@
+import asyncio
+
+from app.services import twitter_service as ts
+
+
+def test_async_ingestion_does_not_block_event_loop(fake_twitter):
+    fake_twitter.latency = 0.1
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        graph = await ts.get_tweets_and_build_graph_async("python", 300)
+        task.cancel()
+        return graph, ticks
+
+    graph, ticks = asyncio.run(main())
+    assert graph.graph["ingestion"]["pages"] == 3
+    # Tres llamadas de 0.1 s: el loop sigue atendiendo otras tareas mientras tanto
+    assert ticks >= 10
+
+
+def test_async_analysis_matches_sync(fake_twitter):
+    expected = ts.analyze_query("python", 250)
+    for cache in ts.CACHES.values():
+        cache.clear()
+
+    result = asyncio.run(ts.analyze_query_async("python", 250))
+    assert result is not expected
+    assert set(result["graph"].edges) == set(expected["graph"].edges)
+    assert result["graph"].graph["ingestion"] == expected["graph"].graph["ingestion"]
+    # Louvain no tiene semilla fija: solo se compara que las comunidades cubran el mismo grafo
+    assert sorted(node for community in result["communities"] for node in community) == sorted(expected["graph"])
+    for metric in ("num_nodes", "num_edges", "num_interactions", "edge_types"):
+        assert result["metrics"][metric] == expected["metrics"][metric]
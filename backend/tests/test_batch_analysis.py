@@ -0,0 +1,59 @@
+import networkx as nx
+
+from app.services import batch_analysis
+from app.services import twitter_service as ts
+
+
+def _pages(fake, tweets):
+    fake.tweets = tweets
+    responses, next_token = [], None
+    while True:
+        page = fake.search_recent_tweets("q", 100, next_token)
+        responses.append(page)
+        next_token = page.meta.get("next_token")
+        if not next_token:
+            return responses
+
+
+def _edges(G):
+    return {(u, v): w for u, v, w in G.edges(data="weight")}
+
+
+def test_union_graph_tracks_each_query_edges(fake_twitter, monkeypatch):
+    all_tweets = fake_twitter.tweets
+    try:
+        # Dos consultas que comparten 60 tweets
+        first = _pages(fake_twitter, all_tweets[:150])
+        second = _pages(fake_twitter, all_tweets[90:250])
+        union = _pages(fake_twitter, all_tweets[:250])
+    finally:
+        fake_twitter.tweets = all_tweets
+
+    registered = []
+    add_users = ts.GraphIndex.add_users
+    monkeypatch.setattr(ts.GraphIndex, "add_users",
+                        lambda self, users: registered.append(1) or add_users(self, users))
+    G, views = batch_analysis.build_union_graph(["a", "b"], [(first, {}), (second, {})])
+    # Los usuarios se registran una vez en el índice compartido, no una vez por grupo de tweets
+    assert len(registered) == 1
+    monkeypatch.undo()
+
+    expected = nx.DiGraph()
+    index = ts.GraphIndex()
+    for page in union:
+        ts.process_tweets(page, expected, index)
+    assert _edges(G) == _edges(expected)
+
+    # Cada consulta ve las aristas de sus propios tweets (las compartidas, en ambas)
+    for view, pages in zip(views, (first, second)):
+        alone = nx.DiGraph()
+        alone_index = ts.GraphIndex()
+        for page in union:
+            alone_index.add_users(page.includes.get("users", []))
+            alone_index.add_tweets(page.includes.get("tweets", []))
+            alone_index.add_tweets(page.data)
+        for page in pages:
+            ts.process_tweets(page, alone, alone_index, index_response=False)
+        assert view.edges == set(alone.edges())
+    assert views[0].edges & views[1].edges
+    assert len(views[0].tweets & views[1].tweets) == 60
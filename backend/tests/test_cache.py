@@ -0,0 +1,77 @@
+import networkx as nx
+
+from app.services import cache
+
+
+def _graph(n: int) -> nx.DiGraph:
+    G = nx.DiGraph()
+    for i in range(n):
+        G.add_node(i, name=f"user{i}", full_name=f"User {i}")
+    for i in range(n):
+        G.add_edge(i, (i * 7 + 1) % n, weight=1, counts={"mention": 1}, type="mention")
+    return G
+
+
+def test_approximate_size_does_not_serialize(monkeypatch):
+    value = {"graph": _graph(2000), "communities": [list(range(2000))], "metrics": {"density": 0.1}}
+    expected = len(cache.serialize(value))
+
+    def fail(value):
+        raise AssertionError("approximate_size no debe serializar")
+
+    monkeypatch.setattr(cache, "serialize", fail)
+    estimate = cache.approximate_size(value)
+    assert expected / 3 < estimate < expected * 3
+
+
+def test_approximate_size_grows_with_graph():
+    assert cache.approximate_size(_graph(4000)) > 1.5 * cache.approximate_size(_graph(1000))
+
+
+def test_memory_cache_evicts_by_estimated_bytes():
+    small = cache.approximate_size(_graph(100))
+    memory = cache.MemoryCache(max_entries=None, max_bytes=int(small * 2.5))
+    for key in ("a", "b", "c"):
+        memory.set(key, _graph(100))
+    assert memory.get("a") is cache.MISSING
+    assert memory.get("c") is not cache.MISSING
+    assert memory.size_bytes() <= memory.max_bytes
+
+
+def test_memory_cache_evicts_least_recently_used():
+    memory = cache.MemoryCache(max_entries=3, max_bytes=None)
+    for key in ("a", "b", "c"):
+        memory.set(key, key)
+    assert memory.get("a") == "a"
+    memory.set("d", "d")
+    assert memory.get("b") is cache.MISSING
+    assert [memory.get(key) for key in ("a", "c", "d")] == ["a", "c", "d"]
+    assert memory.stats.evictions == 1
+
+
+def test_memory_cache_expires_lazily_on_get(monkeypatch):
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(cache.time, "time", lambda: clock["now"])
+    memory = cache.MemoryCache(max_entries=None, max_bytes=None)
+    memory.set("old", 1, ttl=10)
+    clock["now"] += 20
+    # Insertar no recorre las entradas buscando las expiradas
+    memory.set("new", 2)
+    assert len(memory) == 2
+    assert memory.get("old") is cache.MISSING
+    assert len(memory) == 1
+    assert memory.stats.expirations == 1
+
+
+def test_sqlite_caches_on_one_file_share_entries(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = cache.SQLiteCache(path)
+    second = cache.SQLiteCache(path)
+
+    first.set("analysis:python", {"graph": _graph(10)}, ttl=60)
+    value = second.get("analysis:python")
+    assert value is not cache.MISSING
+    assert value["graph"].number_of_edges() == 10
+
+    second.delete("analysis:python")
+    assert first.get("analysis:python") is cache.MISSING
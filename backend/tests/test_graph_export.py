@@ -0,0 +1,29 @@
+import pytest
+
+msgpack = pytest.importorskip("msgpack")
+
+from app.services import graph_export
+
+QUERY = {"query": "python", "max_tweets": 500}
+
+
+def test_msgpack_round_trip_matches_json(api):
+    as_json = api.post("/analyze_tweets/", json={**QUERY, "format": "json"})
+    as_msgpack = api.post("/analyze_tweets/", json={**QUERY, "format": "msgpack"})
+    assert as_json.status_code == 200
+    assert as_msgpack.status_code == 200
+    assert as_msgpack.headers["content-type"] == graph_export.MSGPACK_MEDIA_TYPE
+
+    expected = as_json.json()
+    decoded = graph_export.decode_msgpack(as_msgpack.content)
+    assert expected["nodes"]
+    assert decoded["nodes"] == expected["nodes"]
+    assert decoded["edges"] == expected["edges"]
+    assert decoded["communities"] == expected["communities"]
+    assert decoded["metrics"] == expected["metrics"]
+
+
+def test_msgpack_selected_by_accept_header(api):
+    response = api.post("/analyze_tweets/", json=QUERY, headers={"Accept": graph_export.MSGPACK_MEDIA_TYPE})
+    assert response.status_code == 200
+    assert graph_export.decode_msgpack(response.content)["nodes"]
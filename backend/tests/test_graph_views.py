@@ -0,0 +1,97 @@
+import networkx as nx
+import pytest
+from fastapi import HTTPException
+
+from app.services.graph_views import reduce_analysis
+
+
+def _analysis():
+    # Dos comunidades: un triángulo (1, 2, 3) y un clique de cuatro (4 a 7) unidos por 3 -> 4
+    G = nx.DiGraph()
+    for node in range(1, 8):
+        G.add_node(node, name=f"user{node}", full_name=f"User {node}")
+
+    def edge(u, v, weight, edge_type="mention"):
+        G.add_edge(u, v, weight=weight, counts={edge_type: weight}, type=edge_type)
+
+    edge(1, 2, 1)
+    edge(2, 3, 1)
+    edge(3, 1, 1)
+    for u in range(4, 8):
+        for v in range(u + 1, 8):
+            edge(u, v, 5)
+    edge(3, 4, 2, "retweet")
+    return {"graph": G, "communities": [[1, 2, 3], [4, 5, 6, 7]], "metrics": {"num_nodes": 7}}
+
+
+def test_full_view_returns_the_analysis_itself():
+    analysis = _analysis()
+    assert reduce_analysis(analysis) is analysis
+
+
+def test_topk_keeps_the_heaviest_nodes():
+    analysis = _analysis()
+    reduced = reduce_analysis(analysis, "topk", view_size=4)
+
+    assert set(reduced["graph"]) == {4, 5, 6, 7}
+    # Las comunidades conservan su posición aunque queden vacías
+    assert reduced["communities"] == [[], [4, 5, 6, 7]]
+    assert reduced["metrics"]["view"]["total_nodes"] == 7
+    assert reduced["metrics"]["view"]["num_nodes"] == 4
+    # El análisis en caché no se modifica
+    assert analysis["graph"].number_of_nodes() == 7
+    assert "view" not in analysis["metrics"]
+
+
+def test_kcore_picks_largest_core_within_budget():
+    reduced = reduce_analysis(_analysis(), "kcore", view_size=5)
+    assert set(reduced["graph"]) == {4, 5, 6, 7}
+    assert reduced["metrics"]["view"]["core_k"] == 3
+
+    reduced = reduce_analysis(_analysis(), "kcore", core_k=2)
+    assert set(reduced["graph"]) == set(range(1, 8))
+
+
+def test_communities_view_builds_supergraph():
+    reduced = reduce_analysis(_analysis(), "communities")
+    S = reduced["graph"]
+
+    assert set(S) == {0, 1}
+    assert S[0][1]["weight"] == 2
+    assert S[0][1]["counts"] == {"retweet": 2}
+    details = {item["id"]: item for item in reduced["metrics"]["view"]["communities"]}
+    assert details[0]["internal_weight"] == 3
+    assert details[1]["internal_weight"] == 30
+    assert details[1]["size"] == 4
+
+
+def test_community_drill_down():
+    reduced = reduce_analysis(_analysis(), community=0)
+    assert set(reduced["graph"]) == {1, 2, 3}
+    assert reduced["graph"].number_of_edges() == 3
+    assert reduced["communities"] == [[1, 2, 3], []]
+
+    reduced = reduce_analysis(_analysis(), "topk", view_size=2, community=1)
+    assert len(reduced["graph"]) == 2
+    assert set(reduced["graph"]) <= {4, 5, 6, 7}
+
+
+@pytest.mark.parametrize("kwargs, status", [
+    ({"view": "unknown"}, 400),
+    ({"view": "topk", "view_size": 0}, 400),
+    ({"view": "communities", "community": 0}, 400),
+    ({"community": 2}, 404),
+])
+def test_invalid_views(kwargs, status):
+    with pytest.raises(HTTPException) as error:
+        reduce_analysis(_analysis(), **kwargs)
+    assert error.value.status_code == status
+
+
+def test_analyze_tweets_returns_reduced_view(api):
+    response = api.post("/analyze_tweets/", json={"query": "python", "max_tweets": 100,
+                                                   "view": "topk", "view_size": 20})
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["nodes"]) == 20
+    assert body["metrics"]["view"]["total_nodes"] > 20
@@ -0,0 +1,90 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from app.services import http_session
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 para que el servidor mantenga la conexión abierta entre peticiones
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        # Puerto del cliente: uno distinto por cada conexión abierta
+        self.server.client_ports.append(self.client_address[1])
+        if self.path == "/slow":
+            time.sleep(0.5)
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    httpd.client_ports = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_requests_reuse_one_pooled_connection(server):
+    session = http_session.PooledSession(pool_size=4)
+    for _ in range(5):
+        assert session.get(f"{server.url}/").json() == {"ok": True}
+
+    info = session.info()
+    assert info["requests"] == 5
+    assert len(set(server.client_ports)) == 1
+    assert info["connections_opened"] == 1
+    assert info["idle_connections"] == 1
+    assert info["in_flight"] == 0
+    assert info["errors"] == 0
+    session.close()
+
+
+def test_without_keepalive_each_request_opens_a_connection(server):
+    session = http_session.PooledSession(pool_size=4, keepalive=False)
+    for _ in range(3):
+        session.get(f"{server.url}/")
+
+    assert len(set(server.client_ports)) == 3
+    session.close()
+
+
+def test_request_timeout_overrides_session_timeouts(server):
+    session = http_session.PooledSession(connect_timeout=2, read_timeout=10)
+    assert session.current_timeout() == (2, 10)
+
+    with http_session.request_timeout(read=0.1):
+        assert session.current_timeout() == (2, 0.1)
+        with pytest.raises(requests.ReadTimeout):
+            session.get(f"{server.url}/slow")
+    assert session.current_timeout() == (2, 10)
+    assert session.info()["errors"] == 1
+
+    # Un tiempo explícito en la llamada tiene prioridad sobre el del bloque
+    with http_session.request_timeout(read=0.1):
+        assert session.get(f"{server.url}/slow", timeout=5).status_code == 200
+    session.close()
+
+
+def test_create_session_falls_back_to_http1(monkeypatch):
+    monkeypatch.setattr(http_session, "available_http2", lambda: False)
+    session = http_session.create_session(http2=True)
+    assert type(session) is http_session.PooledSession
+    assert session.info()["http2"] is False
+    session.close()
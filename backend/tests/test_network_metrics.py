@@ -0,0 +1,36 @@
+import networkx as nx
+
+from app.services import twitter_service as ts
+
+
+def _graph() -> nx.DiGraph:
+    # Muchas interacciones repetidas entre pocos usuarios: el grado ponderado supera n - 1
+    G = nx.DiGraph()
+    for node in range(4):
+        G.add_node(node, name=f"user{node}")
+    G.add_edge(0, 1, type="mention", weight=20, counts={"mention": 20})
+    G.add_edge(1, 0, type="reply", weight=5, counts={"reply": 5})
+    G.add_edge(0, 2, type="retweet", weight=3, counts={"retweet": 3})
+    G.add_edge(3, 2, type="mention", weight=1, counts={"mention": 1})
+    return G
+
+
+def test_centrality_is_degree_and_weighted_centrality_is_strength():
+    metrics = ts.get_network_metrics(_graph())
+    nodes = {node["id"]: node for node in metrics["influential_nodes"]}
+
+    assert all(0 <= node["centrality"] <= 1 for node in nodes.values())
+    # Nodo 0: vecinos 1 y 2 en la proyección no dirigida; grado ponderado 20 + 5 + 3
+    assert nodes[0]["centrality"] == round(2 / 3, 4)
+    assert nodes[0]["weighted_degree"] == 28
+    assert nodes[0]["weighted_centrality"] == round(28 / 3, 4)
+    assert metrics["influential_nodes"][0]["id"] == 0
+    assert set(metrics["centrality_methods"]) >= {"centrality", "weighted_centrality"}
+
+
+def test_compact_engine_reports_the_same_centralities(monkeypatch):
+    G = _graph()
+    expected = ts.get_network_metrics(G)["influential_nodes"]
+    ts.clear_metrics_cache(G)
+    monkeypatch.setattr(ts, "use_compact_engine", lambda G: True)
+    assert ts.get_network_metrics(G)["influential_nodes"] == expected
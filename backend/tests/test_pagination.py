@@ -0,0 +1,52 @@
+from app.services import twitter_service as ts
+
+
+def _ids(pages):
+    return [tweet.id for page in pages for tweet in page.data]
+
+
+def test_pages_follow_next_token_until_max_tweets(fake_twitter):
+    ingestion = {}
+    pages = list(ts.iter_search_pages("python", 250, max_pages=10, time_limit=None, ingestion=ingestion))
+
+    ids = _ids(pages)
+    assert len(pages) == 3
+    assert len(ids) == len(set(ids)) == 250
+    # Las páginas llegan en orden: del tweet más reciente al más antiguo, sin saltos
+    assert ids == [int(tweet["id"]) for tweet in fake_twitter.tweets[:250]]
+    assert ingestion["pages"] == 3
+    assert ingestion["tweets"] == 250
+    assert ingestion["stop_reason"] == "max_tweets"
+    assert ingestion["newest_id"] == str(fake_twitter.tweets[0]["id"])
+
+
+def test_max_pages_stops_with_next_token_to_resume(fake_twitter):
+    ingestion = {}
+    first = list(ts.iter_search_pages("python", 1000, max_pages=2, time_limit=None, ingestion=ingestion))
+    assert ingestion["stop_reason"] == "max_pages"
+    assert ingestion["next_token"]
+
+    rest = list(ts.iter_search_pages("python", 100, max_pages=1, time_limit=None,
+                                     next_token=ingestion["next_token"]))
+    assert _ids(first) + _ids(rest) == [int(tweet["id"]) for tweet in fake_twitter.tweets[:300]]
+
+
+def test_exhausted_results_stop_without_next_token(fake_twitter):
+    fake_twitter.tweets = fake_twitter.tweets[:150]
+    ingestion = {}
+    pages = list(ts.iter_search_pages("python", 1000, max_pages=10, time_limit=None, ingestion=ingestion))
+
+    assert len(pages) == 2
+    assert ingestion["tweets"] == 150
+    assert ingestion["stop_reason"] == "exhausted"
+    assert ingestion["next_token"] is None
+
+
+def test_graph_ingestion_reports_pages(fake_twitter):
+    G = ts.get_tweets_and_build_graph("python", 250)
+
+    ingestion = G.graph["ingestion"]
+    assert ingestion["source"] == "api"
+    assert ingestion["pages"] == 3
+    assert ingestion["tweets"] == 250
+    assert fake_twitter.calls["search_recent_tweets"] == 3
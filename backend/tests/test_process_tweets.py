@@ -0,0 +1,47 @@
+import networkx as nx
+import tweepy
+
+from app.services import twitter_service as ts
+
+USERS = [
+    {"id": 1, "username": "ana", "name": "Ana"},
+    {"id": 2, "username": "luis", "name": "Luis"},
+    {"id": 3, "username": "marta", "name": "Marta"},
+]
+
+
+def _response(tweets, referenced=()):
+    includes = {"users": [tweepy.User(user) for user in USERS]}
+    if referenced:
+        includes["tweets"] = [tweepy.Tweet(tweet) for tweet in referenced]
+    return tweepy.Response([tweepy.Tweet(tweet) for tweet in tweets], includes, [], {})
+
+
+def _tweet(tweet_id, author_id, text, references=()):
+    tweet = {"id": tweet_id, "author_id": author_id, "text": text, "edit_history_tweet_ids": [str(tweet_id)]}
+    if references:
+        tweet["referenced_tweets"] = [{"type": ref_type, "id": ref_id} for ref_type, ref_id in references]
+    return tweet
+
+
+def test_references_resolve_through_included_tweets():
+    # El tweet original (de Marta) no está en la página: solo llega en includes
+    original = _tweet(100, 3, "original")
+    page = [
+        _tweet(201, 1, "RT original", [("retweeted", 100)]),
+        _tweet(202, 2, "cita", [("quoted", 100)]),
+    ]
+    G = nx.DiGraph()
+    touched = ts.process_tweets(_response(page, [original]), G, ts.GraphIndex())
+
+    assert G.has_edge(1, 3) and G[1][3]["type"] == "retweet"
+    assert G.has_edge(2, 3) and G[2][3]["type"] == "quote"
+    assert touched == {1, 2, 3}
+
+
+def test_included_tweets_are_remembered_for_later_pages():
+    index = ts.GraphIndex()
+    G = nx.DiGraph()
+    ts.process_tweets(_response([_tweet(201, 1, "hola")], [_tweet(100, 3, "original")]), G, index)
+    ts.process_tweets(_response([_tweet(202, 2, "respuesta", [("replied_to", 100)])]), G, index)
+    assert G.has_edge(2, 3) and G[2][3]["type"] == "reply"
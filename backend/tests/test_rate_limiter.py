@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.rate_limiter import MemoryQuotaStore, RateLimitScheduler
+
+ENDPOINT = "/2/tweets/search/recent"
+
+
+def _scheduler(remaining: int, reset_in: float = 600, max_wait: float = 30) -> RateLimitScheduler:
+    scheduler = RateLimitScheduler(max_wait=max_wait, reserve=0, store=MemoryQuotaStore())
+    scheduler.update(ENDPOINT, {"x-rate-limit-remaining": str(remaining), "x-rate-limit-limit": "450",
+                                "x-rate-limit-reset": str(time.time() + reset_in)})
+    return scheduler
+
+
+def test_waits_for_release_when_quota_is_held_in_flight():
+    scheduler = _scheduler(remaining=2)
+    scheduler.acquire(ENDPOINT)
+    scheduler.acquire(ENDPOINT)
+
+    threading.Timer(0.1, scheduler.release, args=(ENDPOINT,)).start()
+    start = time.monotonic()
+    scheduler.acquire(ENDPOINT)
+    # Sale al liberarse la llamada, no al reinicio de la ventana (10 minutos)
+    assert time.monotonic() - start < 0.9
+    assert scheduler.snapshot()["endpoints"][ENDPOINT]["in_flight"] == 2
+
+
+def test_async_waits_for_release_when_quota_is_held_in_flight():
+    scheduler = _scheduler(remaining=1)
+
+    async def main():
+        await scheduler.acquire_async(ENDPOINT)
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.1, lambda: threading.Thread(target=scheduler.release, args=(ENDPOINT,)).start())
+        start = time.monotonic()
+        await scheduler.acquire_async(ENDPOINT)
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) < 0.9
+    assert scheduler.throttled == 1
+
+
+def test_exhausted_window_still_fails_fast():
+    scheduler = _scheduler(remaining=0, max_wait=5)
+    with pytest.raises(HTTPException) as error:
+        scheduler.acquire(ENDPOINT)
+    assert error.value.status_code == 429
+
+
+def test_dead_worker_reservations_expire_under_traffic(tmp_path, monkeypatch):
+    from app.services import rate_limiter
+
+    clock = {"now": 1_000_000.0}
+    monkeypatch.setattr(rate_limiter.time, "time", lambda: clock["now"])
+    path = str(tmp_path / "quota.sqlite3")
+    dead = RateLimitScheduler(max_wait=0, reserve=0, store=rate_limiter.SQLiteQuotaStore(path), owner="dead")
+    live = RateLimitScheduler(max_wait=0, reserve=0, store=rate_limiter.SQLiteQuotaStore(path), owner="live")
+
+    def headers():
+        return {"x-rate-limit-remaining": "2", "x-rate-limit-limit": "450",
+                "x-rate-limit-reset": str(clock["now"] + 600)}
+
+    live.update(ENDPOINT, headers())
+    # El worker "dead" reserva todo el cupo que queda y cae sin liberarlo
+    dead.acquire(ENDPOINT)
+    dead.acquire(ENDPOINT)
+
+    # Mientras, el otro worker sigue recibiendo respuestas y tocando el cupo cada 10 segundos
+    while clock["now"] < 1_000_000.0 + rate_limiter.IN_FLIGHT_TTL - 10:
+        clock["now"] += 10
+        live.update(ENDPOINT, headers())
+        with pytest.raises(HTTPException):
+            live.acquire(ENDPOINT)
+
+    clock["now"] += 20
+    live.acquire(ENDPOINT)
+    endpoint = live.snapshot()["endpoints"][ENDPOINT]
+    assert endpoint["in_flight"] == 1
+
+    live.release(ENDPOINT)
+    assert live.snapshot()["endpoints"][ENDPOINT]["in_flight"] == 0
+
+
+def test_workers_on_one_sqlite_file_share_the_quota(tmp_path):
+    from app.services.rate_limiter import SQLiteQuotaStore
+
+    path = str(tmp_path / "quota.sqlite3")
+    first = RateLimitScheduler(max_wait=0, reserve=0, store=SQLiteQuotaStore(path), owner="first")
+    second = RateLimitScheduler(max_wait=0, reserve=0, store=SQLiteQuotaStore(path), owner="second")
+
+    # Solo el primer worker recibe las cabeceras; el segundo ve el mismo cupo
+    first.update(ENDPOINT, {"x-rate-limit-remaining": "3", "x-rate-limit-limit": "450",
+                            "x-rate-limit-reset": str(time.time() + 600)})
+    assert second.snapshot()["endpoints"][ENDPOINT]["remaining"] == 3
+
+    first.acquire(ENDPOINT)
+    first.acquire(ENDPOINT)
+    second.acquire(ENDPOINT)
+    # El cupo que queda está reservado por las llamadas en curso de ambos workers
+    with pytest.raises(HTTPException):
+        second.acquire(ENDPOINT)
+    assert first.snapshot()["endpoints"][ENDPOINT]["in_flight"] == 3
+
+    # Lo que libera un worker queda disponible para el otro
+    first.release(ENDPOINT)
+    second.acquire(ENDPOINT)
+    assert second.snapshot()["endpoints"][ENDPOINT]["in_flight"] == 3
@@ -0,0 +1,53 @@
+import tweepy
+
+from app.services.raw_response import RawResponse, convert_tweepy_response_to_dict
+
+TWEETS = [
+    {"id": "3000", "text": "tweet 3000", "author_id": "1"},
+    {"id": "2999", "text": "tweet 2999", "author_id": "2"},
+]
+USERS = [
+    {"id": "1", "username": "ana", "name": "Ana"},
+    {"id": "2", "username": "luis", "name": "Luis"},
+]
+
+
+def make_response() -> tweepy.Response:
+    return tweepy.Response(
+        [tweepy.Tweet(tweet) for tweet in TWEETS],
+        {"users": [tweepy.User(user) for user in USERS]},
+        [],
+        {"result_count": 2, "newest_id": "3000", "oldest_id": "2999"},
+    )
+
+
+def test_full_conversion_keeps_model_fields():
+    raw = convert_tweepy_response_to_dict(make_response())
+    assert raw["data"] == TWEETS
+    assert raw["includes"]["users"] == USERS
+
+
+def test_projection_selects_fields_of_models():
+    raw = RawResponse(make_response()).to_dict(["meta", "data.id", "includes.users.username"])
+    assert raw["meta"]["result_count"] == 2
+    assert raw["data"] == [{"id": "3000"}, {"id": "2999"}]
+    assert raw["includes"] == {"users": [{"username": "ana"}, {"username": "luis"}]}
+
+
+def test_single_object_response():
+    raw = RawResponse(tweepy.Response(tweepy.User(USERS[0]), {}, [], {})).to_dict(["data.username"])
+    assert raw["data"] == {"username": "ana"}
+
+
+def test_pickled_raw_response_keeps_only_the_payload():
+    from app.services.cache import deserialize, serialize
+
+    raw = RawResponse(make_response())
+    empty_size = len(serialize(raw))
+    expected = raw.to_dict()
+    raw.to_dict(["meta", "data.id"])
+    # Las secciones convertidas y las proyecciones no viajan con el objeto
+    assert len(serialize(raw)) == empty_size
+
+    restored = deserialize(serialize(raw))
+    assert restored.to_dict() == expected
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.observability import render_prometheus
+from app.services.singleflight import SingleFlight
+
+
+def test_sync_caller_waits_for_async_flight():
+    flight = SingleFlight("test-sync-on-async")
+    executions = []
+    results = []
+
+    async def fetch():
+        executions.append("async")
+        await asyncio.sleep(0.2)
+        return "async"
+
+    def sync_caller():
+        results.append(flight.do("key", lambda: executions.append("sync") or "sync"))
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("key", fetch))
+        await asyncio.sleep(0.05)
+        thread = threading.Thread(target=sync_caller)
+        thread.start()
+        result = await leader
+        await asyncio.get_running_loop().run_in_executor(None, thread.join)
+        return result
+
+    assert asyncio.run(main()) == "async"
+    assert results == ["async"]
+    assert executions == ["async"]
+    assert flight.info()["coalesced"] == 1
+
+
+def test_async_caller_waits_for_sync_flight():
+    flight = SingleFlight("test-async-on-sync")
+    started = threading.Event()
+    executions = []
+
+    def fetch():
+        executions.append("sync")
+        started.set()
+        time.sleep(0.2)
+        return "sync"
+
+    def never():
+        executions.append("async")
+        return "async"
+
+    async def fetch_async():
+        return never()
+
+    thread = threading.Thread(target=lambda: flight.do("key", fetch))
+    thread.start()
+    started.wait()
+    assert asyncio.run(flight.do_async("key", fetch_async)) == "sync"
+    thread.join()
+    assert executions == ["sync"]
+    assert flight.info() == {"calls": 2, "executions": 1, "coalesced": 1, "in_flight": 0}
+
+
+def test_errors_reach_waiters_of_both_kinds():
+    flight = SingleFlight("test-errors")
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("fallo")
+
+    async def unused():
+        return None
+
+    thread = threading.Thread(target=lambda: pytest.raises(ValueError, flight.do, "key", fail))
+    thread.start()
+    started.wait()
+    with pytest.raises(ValueError):
+        asyncio.run(flight.do_async("key", unused))
+    thread.join()
+
+
+def test_coalesced_counter_is_exported():
+    flight = SingleFlight("test-export")
+    flight.do("key", lambda: 1)
+    assert 'sna_singleflight_coalesced_total{flight="test-export"} 0' in render_prometheus()
+    assert 'sna_singleflight_calls_total{flight="test-export"} 1' in render_prometheus()
@@ -0,0 +1,32 @@
+import json
+
+from app.services import twitter_service as ts
+
+QUERY = {"query": "python", "max_tweets": 500}
+
+
+def _sections(content: bytes):
+    sections = {}
+    for line in content.decode("utf-8").splitlines():
+        record = json.loads(line)
+        sections.setdefault(record["section"], []).append(record)
+    return sections
+
+
+def test_ndjson_stream_matches_json(api):
+    expected = api.post("/analyze_tweets/", json={**QUERY, "format": "json"}).json()
+    response = api.post("/analyze_tweets/", json={**QUERY, "format": "ndjson"})
+    assert response.status_code == 200
+
+    sections = _sections(response.content)
+    assert [item for record in sections["nodes"] for item in record["items"]] == expected["nodes"]
+    assert [item for record in sections["edges"] for item in record["items"]] == expected["edges"]
+    assert sections["metrics"][0]["data"] == expected["metrics"]
+    assert "end" in sections
+
+
+def test_cached_analysis_keeps_graph_not_elements(api):
+    assert api.post("/analyze_tweets/", json={**QUERY, "format": "ndjson"}).status_code == 200
+    analysis = ts.analyze_query(QUERY["query"], QUERY["max_tweets"])
+    assert analysis["graph"].number_of_nodes() > 0
+    assert "nodes" not in analysis and "edges" not in analysis
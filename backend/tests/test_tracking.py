@@ -0,0 +1,100 @@
+import asyncio
+import threading
+
+import networkx as nx
+
+from app.services import tracking
+from app.services import twitter_service as ts
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def test_refresh_and_summary_run_off_the_event_loop(api, monkeypatch):
+    calls = []
+    process_tweets = ts.process_tweets
+    get_network_metrics = ts.get_network_metrics
+
+    def spy_process(*args, **kwargs):
+        calls.append(("process_tweets", _on_event_loop()))
+        return process_tweets(*args, **kwargs)
+
+    def spy_metrics(*args, **kwargs):
+        calls.append(("metrics", _on_event_loop()))
+        return get_network_metrics(*args, **kwargs)
+
+    monkeypatch.setattr(ts, "process_tweets", spy_process)
+    monkeypatch.setattr(ts, "get_network_metrics", spy_metrics)
+
+    response = api.post("/tracked_queries/", json={"query": "python", "max_tweets": 200})
+    assert response.status_code == 200
+    body = response.json()
+    try:
+        assert body["num_nodes"] > 0
+        assert body["communities"]
+        assert api.post(f"/tracked_queries/{body['id']}/refresh").status_code == 200
+    finally:
+        tracking.remove_tracked_query(body["id"])
+
+    assert {name for name, _ in calls} == {"process_tweets", "metrics"}
+    assert not any(on_loop for _, on_loop in calls)
+
+
+def test_summary_waits_for_refresh_lock(api):
+    response = api.post("/tracked_queries/", json={"query": "python", "max_tweets": 200})
+    tracked = tracking.get_tracked_query(response.json()["id"])
+    try:
+        summaries = []
+        with tracked.lock:
+            reader = threading.Thread(target=lambda: summaries.append(tracking.tracked_query_summary(tracked)))
+            reader.start()
+            reader.join(0.2)
+            # Mientras el refresco tiene el cerrojo el resumen no puede leer el grafo
+            assert reader.is_alive()
+        reader.join(5)
+        assert summaries and summaries[0]["num_nodes"] == tracked.graph.number_of_nodes()
+    finally:
+        tracking.remove_tracked_query(tracked.id)
+
+
+def test_refresh_reads_every_new_tweet_beyond_max_tweets(api, fake_twitter):
+    all_tweets = fake_twitter.tweets
+    # 120 tweets llegan después del registro: más que max_tweets
+    fake_twitter.tweets = all_tweets[120:]
+    response = api.post("/tracked_queries/", json={"query": "python", "max_tweets": 50})
+    tracked = tracking.get_tracked_query(response.json()["id"])
+    try:
+        fake_twitter.tweets = all_tweets
+        first = api.post(f"/tracked_queries/{tracked.id}/refresh").json()["last_refresh"]
+        assert first["new_tweets"] == 50
+        assert first["backlog_tweets"] == 50
+        assert first["pending_gaps"] == 1
+
+        second = api.post(f"/tracked_queries/{tracked.id}/refresh").json()["last_refresh"]
+        assert second["new_tweets"] == 0
+        assert second["backlog_tweets"] == 20
+        assert second["pending_gaps"] == 0
+        assert tracked.newest_id == str(all_tweets[0]["id"])
+
+        # El grafo incremental es el mismo que el construido de una vez con los 170 tweets leídos
+        fake_twitter.tweets = all_tweets[:170]
+        expected = nx.DiGraph()
+        index = ts.GraphIndex()
+        next_token = None
+        while True:
+            page = fake_twitter.search_recent_tweets("python", 100, next_token)
+            ts.process_tweets(page, expected, index)
+            next_token = page.meta.get("next_token")
+            if not next_token:
+                break
+        assert set(tracked.graph.nodes()) == set(expected.nodes())
+        assert dict(((u, v), w) for u, v, w in tracked.graph.edges(data="weight")) == \
+            dict(((u, v), w) for u, v, w in expected.edges(data="weight"))
+    finally:
+        fake_twitter.tweets = all_tweets
+        tracking.remove_tracked_query(tracked.id)
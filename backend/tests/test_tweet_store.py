@@ -0,0 +1,63 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from app.services import twitter_service as ts
+from app.services.tweet_store import TweetStore
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+
+def test_import_does_not_open_store(tmp_path):
+    path = tmp_path / "tweets.db"
+    code = ("import app.services.twitter_service as ts, os, sys; "
+            "assert ts.tweet_store is None; "
+            "assert not os.path.exists(sys.argv[1]); "
+            "assert ts.get_tweet_store() is not None; "
+            "assert os.path.exists(sys.argv[1])")
+    env = {"TWEET_STORE_ENABLED": "true", "TWEET_STORE_PATH": str(path), "LOG_LEVEL": "WARNING",
+           "CACHE_BACKEND": "memory", "PATH": ""}
+    subprocess.run([sys.executable, "-c", code, str(path)], cwd=BACKEND_DIR, env=env, check=True)
+
+
+def test_get_tweet_store_opens_once(tmp_path, monkeypatch):
+    opened = []
+
+    def open_store():
+        opened.append(True)
+        return TweetStore(str(tmp_path / "tweets.db"))
+
+    monkeypatch.setattr(ts, "TweetStore", open_store)
+    monkeypatch.setattr(ts, "TWEET_STORE_ENABLED", True)
+    monkeypatch.setattr(ts, "tweet_store", None)
+    monkeypatch.setattr(ts, "_tweet_store_initialized", False)
+
+    store = ts.get_tweet_store()
+    assert store is not None
+    assert ts.get_tweet_store() is store
+    assert len(opened) == 1
+
+
+def test_disabled_store_is_none(monkeypatch):
+    monkeypatch.setattr(ts, "TWEET_STORE_ENABLED", False)
+    monkeypatch.setattr(ts, "tweet_store", None)
+    monkeypatch.setattr(ts, "_tweet_store_initialized", False)
+    assert ts.get_tweet_store() is None
+
+
+def test_store_source_with_store_disabled_is_a_clear_error(monkeypatch):
+    import pytest
+    from fastapi import HTTPException
+
+    monkeypatch.setattr(ts, "TWEET_STORE_ENABLED", False)
+    monkeypatch.setattr(ts, "tweet_store", None)
+    monkeypatch.setattr(ts, "_tweet_store_initialized", False)
+    with pytest.raises(HTTPException) as error:
+        ts.get_tweets_and_build_graph("python", 50, source="store")
+    assert error.value.status_code == 400
+
+
+def test_store_is_opt_in():
+    code = "import config; assert not config.TWEET_STORE_ENABLED"
+    env = {"PATH": "", "LOG_LEVEL": "WARNING"}
+    subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, check=True)
@@ -0,0 +1,40 @@
+import asyncio
+
+from app.services import twitter_service as ts
+
+
+def test_uncached_users_are_fetched_in_batches_of_100(fake_twitter):
+    ids = [user["id"] for user in fake_twitter.users[:150]]
+    result = asyncio.run(ts.get_users_info_async(ids=ids + [999999], usernames=["user199", "nobody"]))
+
+    assert result["api_calls"] == 3
+    assert fake_twitter.calls["get_users"] == 3
+    assert result["from_cache"] == 0
+    assert [user["id"] for user in result["users"]] == ids + [199]
+    assert result["not_found"] == {"ids": [999999], "usernames": ["nobody"]}
+
+
+def test_users_seen_in_searches_need_no_api_call(fake_twitter):
+    ts.get_tweets_and_build_graph("python", 100)
+    authors = sorted({int(tweet["author_id"]) for tweet in fake_twitter.tweets[:100]})
+
+    result = asyncio.run(ts.get_users_info_async(ids=authors))
+    assert result["api_calls"] == 0
+    assert fake_twitter.calls["get_users"] == 0
+    assert result["from_cache"] == len(authors)
+    assert sorted(user["id"] for user in result["users"]) == authors
+
+
+def test_duplicate_lookups_return_each_user_once(fake_twitter):
+    result = asyncio.run(ts.get_users_info_async(ids=[1, "1"], usernames=["@user1", "USER1"]))
+
+    assert [user["id"] for user in result["users"]] == [1]
+    assert result["not_found"] == {"ids": [], "usernames": []}
+
+
+def test_batch_endpoint_limits_request_size(api):
+    response = api.post("/user-info/batch", json={"ids": list(range(1, ts.MAX_BATCH_USERS + 2))})
+    assert response.status_code == 400
+
+    response = api.post("/user-info/batch", json={"ids": ["abc"]})
+    assert response.status_code == 400